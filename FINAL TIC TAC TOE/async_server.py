@@ -0,0 +1,185 @@
+"""
+Asyncio serving mode for the Tic-Tac-Toe AI
+Same routes, requests and responses as server.py; pending AI moves are
+micro-batched (TICTACTOE_BATCH_WINDOW_MS, default 2 ms) into one policy lookup
+"""
+
+import asyncio
+import os
+
+from aiohttp import web
+
+from session_store import GameStore
+from serving import (load_agent, apply_human_move, apply_ai_move, MoveBatcher,
+                     parse_boards, evaluate_boards, render_metrics, open_trajectory_logger)
+import metrics
+
+
+CORS_HEADERS = {
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Headers": "Content-Type",
+    "Access-Control-Allow-Methods": "GET, POST, OPTIONS"
+}
+
+
+@web.middleware
+async def cors_middleware(request, handler):
+    if request.method == "OPTIONS":
+        response = web.Response()
+    else:
+        response = await handler(request)
+    response.headers.update(CORS_HEADERS)
+    return response
+
+
+async def home(request):
+    return web.Response(text="✅ Tic-Tac-Toe AI Server is running!")
+
+
+async def reset(request):
+    session = request.app["games"].create()
+    async with session.lock:
+        state = session.env.reset()
+    return web.json_response({
+        "game_id": session.game_id,
+        "board": state.flatten().tolist()
+    })
+
+
+async def move(request):
+    try:
+        data = await request.json()
+        human_action = int(data["action"])
+
+        session = request.app["games"].get(data.get("game_id"))
+        if session is None:
+            return web.json_response({"error": "unknown or expired game_id"}, status=404)
+
+        async with session.lock:
+            env = session.env
+
+            timed = metrics.ENABLED
+            if timed:
+                start = metrics.perf_counter()
+
+            # ---- Human move ----
+            response, state, valid_actions = apply_human_move(env, human_action,
+                                                              request.app["trajectories"])
+
+            if timed:
+                human_done = metrics.perf_counter()
+                metrics.observe("server_move_seconds", human_done - start, phase="human")
+
+            if response is not None:
+                return _encode(response, timed)
+
+            # ---- AI move (batched with other pending requests) ----
+            ai_action = await request.app["batcher"].choose_action(
+                state.flatten(), valid_actions
+            )
+
+            if timed:
+                agent_done = metrics.perf_counter()
+                metrics.observe("server_move_seconds", agent_done - human_done, phase="agent")
+
+            response = apply_ai_move(env, ai_action, request.app["trajectories"])
+
+            if timed:
+                metrics.observe("server_move_seconds", metrics.perf_counter() - agent_done, phase="ai")
+            return _encode(response, timed)
+
+    except Exception as e:
+        return web.json_response({"error": str(e)}, status=500)
+
+
+def _encode(body, timed):
+    """web.json_response, timed as the "encode" phase"""
+    if not timed:
+        return web.json_response(body)
+    start = metrics.perf_counter()
+    response = web.json_response(body)
+    metrics.observe("server_move_seconds", metrics.perf_counter() - start, phase="encode")
+    return response
+
+
+async def _evaluate(batcher, boards, with_values):
+    """evaluate_boards, off the event loop for agents that search every move"""
+    if batcher.blocking:
+        return await asyncio.get_running_loop().run_in_executor(
+            None, evaluate_boards, batcher.agent, boards, with_values)
+    return evaluate_boards(batcher.agent, boards, with_values)
+
+
+async def move_batch(request):
+    try:
+        boards = parse_boards(await request.json())
+        return web.json_response(await _evaluate(request.app["batcher"], boards, False))
+    except ValueError as e:
+        return web.json_response({"error": str(e)}, status=400)
+    except NotImplementedError as e:
+        return web.json_response({"error": str(e)}, status=501)
+    except Exception as e:
+        return web.json_response({"error": str(e)}, status=500)
+
+
+async def evaluate(request):
+    try:
+        boards = parse_boards(await request.json())
+        return web.json_response(await _evaluate(request.app["batcher"], boards, True))
+    except ValueError as e:
+        return web.json_response({"error": str(e)}, status=400)
+    except NotImplementedError as e:
+        return web.json_response({"error": str(e)}, status=501)
+    except Exception as e:
+        return web.json_response({"error": str(e)}, status=500)
+
+
+async def games_stats(request):
+    stats = request.app["games"].get_stats()
+    stats["batcher"] = request.app["batcher"].get_stats()
+    return web.json_response(stats)
+
+
+async def metrics_route(request):
+    return web.Response(text=render_metrics(request.app["games"], request.app["batcher"]),
+                        content_type="text/plain")
+
+
+async def _start_batcher(app):
+    await app["batcher"].start()
+
+
+async def _stop_batcher(app):
+    await app["batcher"].stop()
+    if app["trajectories"] is not None:
+        app["trajectories"].close()
+
+
+def create_app(agent=None, window: float = None) -> web.Application:
+    if window is None:
+        window = float(os.environ.get("TICTACTOE_BATCH_WINDOW_MS", 2)) / 1000
+
+    app = web.Application(middlewares=[cors_middleware])
+    app["games"] = GameStore(
+        max_games=int(os.environ.get("TICTACTOE_MAX_GAMES", 10000)),
+        ttl=float(os.environ.get("TICTACTOE_GAME_TTL", 1800)),
+        lock_factory=asyncio.Lock
+    )
+    app["batcher"] = MoveBatcher(agent if agent is not None else load_agent(), window=window)
+    app["trajectories"] = open_trajectory_logger()
+    app.on_startup.append(_start_batcher)
+    app.on_cleanup.append(_stop_batcher)
+
+    app.router.add_get("/", home)
+    app.router.add_post("/reset", reset)
+    app.router.add_post("/move", move)
+    app.router.add_post("/move_batch", move_batch)
+    app.router.add_post("/evaluate", evaluate)
+    app.router.add_get("/games/stats", games_stats)
+    app.router.add_get("/metrics", metrics_route)
+    app.router.add_route("OPTIONS", "/{tail:.*}", home)
+    return app
+
+
+if __name__ == "__main__":
+    web.run_app(create_app(), port=int(os.environ.get("PORT", 5000)))
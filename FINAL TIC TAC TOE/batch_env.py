@@ -0,0 +1,134 @@
+"""
+Environnement Tic-Tac-Toe vectorisé
+
+N parties tenues dans un seul tableau (N, 9) int8 et jouées en parallèle.
+Même convention que TicTacToeEnvironment: 0 = vide, 1 = X, -1 = O, X commence.
+"""
+
+import numpy as np
+from typing import Dict, Optional, Tuple
+
+from bitboard import WIN_MASKS
+
+
+# Matrice (9, 8): LINE_MASKS[i, k] = 1 si la case i appartient à la ligne k
+LINE_MASKS = np.array(
+    [[(mask >> i) & 1 for mask in WIN_MASKS] for i in range(9)],
+    dtype=np.int8
+)
+
+
+class BatchTicTacToeEnvironment:
+    """
+    N parties de Tic-Tac-Toe avancées d'un coup à la fois en une seule opération.
+
+    Les parties terminées sont automatiquement réinitialisées après chaque step;
+    leur position finale est disponible dans info['terminal_state'].
+    """
+
+    def __init__(self, n: int = 1):
+        """
+        Initialise l'environnement.
+
+        Args:
+            n: Nombre de parties simultanées
+        """
+        self.n = 0
+        self.boards = np.zeros((0, 9), dtype=np.int8)
+        self.current_player = np.zeros(0, dtype=np.int8)
+        self.move_count = np.zeros(0, dtype=np.int8)
+        self.game_count = 0
+        self.reset(n)
+
+    def reset(self, n: Optional[int] = None) -> np.ndarray:
+        """
+        Réinitialise toutes les parties.
+
+        Args:
+            n: Nouveau nombre de parties (garde le nombre actuel si None)
+
+        Returns:
+            np.ndarray: États initiaux (N, 9)
+        """
+        if n is not None:
+            self.n = n
+        self.boards = np.zeros((self.n, 9), dtype=np.int8)
+        self.current_player = np.ones(self.n, dtype=np.int8)
+        self.move_count = np.zeros(self.n, dtype=np.int8)
+        self.game_count += self.n
+        return self.boards.copy()
+
+    def get_state(self) -> np.ndarray:
+        """
+        Retourne l'état de toutes les parties.
+
+        Returns:
+            np.ndarray: Copie des plateaux (N, 9)
+        """
+        return self.boards.copy()
+
+    def get_available_actions_mask(self) -> np.ndarray:
+        """
+        Retourne le masque des coups valides.
+
+        Returns:
+            np.ndarray: Booléens (N, 9), True si la case est vide
+        """
+        return self.boards == 0
+
+    def step_flat(self, actions: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, Dict]:
+        """
+        Joue une action (indice 0-8) dans chaque partie.
+
+        Args:
+            actions: Tableau (N,) d'indices de cases
+
+        Returns:
+            Tuple contenant:
+                - states (np.ndarray): Nouveaux états (N, 9), après réinitialisation auto
+                - rewards (np.ndarray): Récompense du joueur qui vient de jouer (N,)
+                - dones (np.ndarray): True si la partie s'est terminée à ce coup (N,)
+                - info (dict): 'winner' (N,) (0 si aucun), 'player' (N,) joueur ayant
+                  joué, 'invalid' (N,) coups invalides, 'terminal_state' (N, 9)
+        """
+        actions = np.asarray(actions, dtype=np.intp)
+        rows = np.arange(self.n)
+        player = self.current_player.copy()
+
+        # Coup invalide: -10 et fin de partie, comme TicTacToeEnvironment.step
+        invalid = (actions < 0) | (actions > 8)
+        safe_actions = np.where(invalid, 0, actions)
+        invalid |= self.boards[rows, safe_actions] != 0
+        valid = ~invalid
+
+        self.boards[rows[valid], safe_actions[valid]] = player[valid]
+        self.move_count += valid
+
+        # Sommes des 8 lignes en un seul produit matriciel
+        line_sums = self.boards @ LINE_MASKS
+        winner = np.where((line_sums == 3).any(axis=1), 1,
+                          np.where((line_sums == -3).any(axis=1), -1, 0)).astype(np.int8)
+        draw = (winner == 0) & (self.move_count == 9)
+
+        # Même sémantique que _calculate_reward: +1 victoire, -1 défaite, 0 sinon
+        rewards = (winner * player).astype(np.float32)
+        rewards[invalid] = -10.0
+        dones = invalid | (winner != 0) | draw
+
+        self.current_player = np.where(valid, -player, player).astype(np.int8)
+
+        terminal_state = self.boards.copy()
+        if dones.any():
+            self.boards[dones] = 0
+            self.current_player[dones] = 1
+            self.move_count[dones] = 0
+            self.game_count += int(dones.sum())
+
+        info = {
+            'winner': winner,
+            'is_draw': draw,
+            'player': player,
+            'invalid': invalid,
+            'terminal_state': terminal_state
+        }
+        return self.boards.copy(), rewards, dones, info
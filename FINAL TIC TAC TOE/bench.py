@@ -0,0 +1,239 @@
+"""
+Benchmark suite for the environment, rules, agent and server hot paths
+
+Usage:
+    python bench.py                      run, write bench_results.json, compare to bench_baseline.json
+    python bench.py --threshold 0.3      allowed relative regression (default 0.25)
+    python bench.py --update-baseline    run and store the results as the new baseline
+
+Exit code 1 if any benchmark regressed past the threshold.
+"""
+
+import json
+import os
+import random
+import sys
+import time
+import timeit
+
+import numpy as np
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+RESULTS_FILE = os.path.join(HERE, "bench_results.json")
+BASELINE_FILE = os.path.join(HERE, "bench_baseline.json")
+DEFAULT_THRESHOLD = 0.25
+
+# Mid-game position used by the micro-benchmarks
+SAMPLE_STATE = np.array([1, 0, -1, 0, 1, 0, 0, -1, 0])
+SAMPLE_VALID = [1, 3, 5, 6, 8]
+
+
+def _best_rate(func, number: int, repeat: int = 5) -> float:
+    """Calls per second of func, best of repeat runs"""
+    best = min(timeit.repeat(func, number=number, repeat=repeat))
+    return number / best
+
+
+# --------------------------------------------------
+# BENCHMARKS
+# --------------------------------------------------
+
+def bench_rules() -> dict:
+    from rules import RulesChecker
+
+    grid = SAMPLE_STATE.reshape(3, 3)
+    return {
+        "rules.check_winner": ("ops/s", _best_rate(lambda: RulesChecker.check_winner(grid), 20000)),
+        "rules.get_game_status": ("ops/s", _best_rate(lambda: RulesChecker.get_game_status(grid), 20000)),
+    }
+
+
+def bench_env() -> dict:
+    from game import TicTacToeEnvironment
+
+    env = TicTacToeEnvironment()
+    rng = random.Random(0)
+
+    # Pre-drawn random games so the timed loop only measures step_flat
+    games = []
+    for _ in range(200):
+        moves = list(range(9))
+        rng.shuffle(moves)
+        games.append(moves)
+
+    def run():
+        steps = 0
+        for moves in games:
+            env.reset()
+            for action in moves:
+                steps += 1
+                if env.step_flat(action)[2]:
+                    break
+        return steps
+
+    def run_fast():
+        steps = 0
+        for moves in games:
+            env.reset()
+            for action in moves:
+                steps += 1
+                if env.step_fast(action)[2]:
+                    break
+        return steps
+
+    steps = run()
+    best = min(timeit.repeat(run, number=1, repeat=5))
+    fast_steps = run_fast()
+    fast_best = min(timeit.repeat(run_fast, number=1, repeat=5))
+    return {
+        "env.step_flat": ("steps/s", steps / best),
+        "env.step_fast": ("steps/s", fast_steps / fast_best),
+    }
+
+
+def bench_agent() -> dict:
+    from qlearning_agent import QLearningAgent
+
+    agent = QLearningAgent(player=-1)
+    agent.load(os.path.join(HERE, "trained_agent.pkl"))
+
+    choose = 1e6 / _best_rate(
+        lambda: agent.choose_action(SAMPLE_STATE, SAMPLE_VALID, training=False), 20000)
+
+    episode = [(SAMPLE_STATE, 1), (SAMPLE_STATE, 3), (SAMPLE_STATE, 5), (SAMPLE_STATE, 6)]
+
+    def record_and_learn():
+        for state, action in episode:
+            agent.record_move(state, action)
+        agent.learn(0)
+
+    learn = 1e6 / _best_rate(record_and_learn, 5000)
+
+    return {
+        "agent.choose_action": ("us", choose),
+        "agent.record_move+learn (4 moves)": ("us", learn),
+    }
+
+
+def bench_play_game() -> dict:
+    from game import TicTacToeEnvironment
+    from qlearning_agent import QLearningAgent
+    from train import play_game
+
+    random.seed(0)
+    env = TicTacToeEnvironment()
+    agent1 = QLearningAgent(player=1, epsilon=0.3)
+    agent2 = QLearningAgent(player=-1, epsilon=0.3)
+
+    return {"train.play_game": ("episodes/s", _best_rate(
+        lambda: play_game(agent1, agent2, env, training=True), 1000))}
+
+
+def bench_server() -> dict:
+    import server
+
+    server.init()
+    client = server.app.test_client()
+    latencies = []
+
+    # First 20 games warm up Flask and the model; only the rest are kept
+    for game in range(220):
+        if game == 20:
+            latencies = []
+        game_id = client.post("/reset").json["game_id"]
+        board = [0] * 9
+        done = False
+        while not done:
+            action = board.index(0)
+            start = time.perf_counter()
+            data = client.post("/move", json={"game_id": game_id, "action": action}).json
+            latencies.append(time.perf_counter() - start)
+            board, done = data["board"], data["done"]
+
+    latencies = np.array(latencies) * 1e6
+    return {
+        "server./move p50": ("us", float(np.percentile(latencies, 50))),
+        "server./move p99": ("us", float(np.percentile(latencies, 99))),
+    }
+
+
+BENCHMARKS = [bench_rules, bench_env, bench_agent, bench_play_game, bench_server]
+
+# Units where a larger value is better; everything else is a latency
+HIGHER_IS_BETTER = {"ops/s", "steps/s", "episodes/s"}
+
+
+# --------------------------------------------------
+# RUN / COMPARE
+# --------------------------------------------------
+
+def run_benchmarks() -> dict:
+    results = {}
+    for bench in BENCHMARKS:
+        for name, (unit, value) in bench().items():
+            results[name] = {"unit": unit, "value": value}
+            print(f"  {name:<36} {value:>14.2f} {unit}")
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Names of the benchmarks that regressed by more than threshold"""
+    regressions = []
+
+    print(f"\n{'benchmark':<36} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        old, new = baseline[name]["value"], result["value"]
+        if result["unit"] in HIGHER_IS_BETTER:
+            change = new / old - 1
+        else:
+            change = old / new - 1  # positive = faster
+        flag = ""
+        if change < -threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<36} {old:>12.2f} {new:>12.2f} {change:>+7.1%}{flag}")
+
+    return regressions
+
+
+def main(argv) -> int:
+    threshold = DEFAULT_THRESHOLD
+    if "--threshold" in argv:
+        threshold = float(argv[argv.index("--threshold") + 1])
+
+    # server.py loads its model from the working directory
+    os.chdir(HERE)
+
+    print("Running benchmarks...")
+    results = run_benchmarks()
+
+    with open(RESULTS_FILE, "w") as f:
+        json.dump(results, f, indent=2)
+
+    if "--update-baseline" in argv:
+        with open(BASELINE_FILE, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nBaseline written to {BASELINE_FILE}")
+        return 0
+
+    if not os.path.exists(BASELINE_FILE):
+        print(f"\nNo baseline ({BASELINE_FILE}); run with --update-baseline")
+        return 0
+
+    with open(BASELINE_FILE) as f:
+        baseline = json.load(f)
+
+    regressions = compare(results, baseline, threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) past {threshold:.0%}: {', '.join(regressions)}")
+        return 1
+
+    print(f"\nNo regression past {threshold:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
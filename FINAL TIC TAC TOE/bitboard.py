@@ -0,0 +1,356 @@
+"""
+Noyau bitboard du Tic-Tac-Toe
+
+Une position = deux entiers de 9 bits (un par joueur), bit i = case i = row * 3 + col.
+Les victoires, le match nul et les coups légaux se lisent dans des tables
+précalculées (512 entrées), donc en temps constant.
+
+Position est le moteur commun aux deux plateaux: board.Board (1 / -1) en
+hérite, tictactoe_game.Board (1 / 2, clés texte) l'enveloppe. Les clés des
+deux mondes (code base 3 de state_graph, clé texte "120000000") se
+calculent depuis les bitboards, sans copier la grille.
+"""
+
+import numpy as np
+from typing import Optional, Tuple
+
+
+FULL_MASK = 0x1FF
+
+# Bit de chaque case (index 0-8)
+CELL_MASKS = tuple(1 << i for i in range(9))
+
+# Les 8 lignes gagnantes: 3 lignes, 3 colonnes, 2 diagonales
+WIN_MASKS = (
+    0b000000111, 0b000111000, 0b111000000,  # lignes
+    0b001001001, 0b010010010, 0b100100100,  # colonnes
+    0b100010001, 0b001010100,               # diagonales (\ et /)
+)
+
+# CELL_LINES[i] = indices (dans WIN_MASKS) des 2 à 4 lignes passant par la case i
+CELL_LINES = tuple(
+    tuple(line for line, mask in enumerate(WIN_MASKS) if mask >> i & 1)
+    for i in range(9)
+)
+
+# WIN_TABLE[bits] == 1 si les cases occupées par un joueur contiennent une ligne
+WIN_TABLE = bytes(
+    1 if any(bits & mask == mask for mask in WIN_MASKS) else 0
+    for bits in range(1 << 9)
+)
+
+# MOVES_TABLE[occupied] = tuple des cases libres
+MOVES_TABLE = tuple(
+    tuple(i for i in range(9) if not (occupied >> i) & 1)
+    for occupied in range(1 << 9)
+)
+
+# Poids 2^i pour convertir une grille NumPy en bits
+_WEIGHTS = np.array(CELL_MASKS, dtype=np.int64)
+
+# TERNARY[bits] = somme des 3^i des cases de bits: code = TERNARY[x] + 2 * TERNARY[o]
+TERNARY = tuple(sum(3 ** i for i in range(9) if bits >> i & 1) for bits in range(1 << 9))
+
+# DECIMAL[bits] = chiffres 1 aux cases de bits, case 0 en tête: clé = DECIMAL[x] + 2 * DECIMAL[o]
+DECIMAL = tuple(sum(10 ** (8 - i) for i in range(9) if bits >> i & 1) for bits in range(1 << 9))
+
+
+def is_win(bits: int) -> bool:
+    """
+    Vérifie si un ensemble de cases contient une ligne gagnante.
+
+    Args:
+        bits: Cases occupées par un joueur (9 bits)
+
+    Returns:
+        bool: True si au moins une ligne est complète
+    """
+    return WIN_TABLE[bits] == 1
+
+
+def winner(x_bits: int, o_bits: int) -> Optional[int]:
+    """
+    Retourne le gagnant d'une position.
+
+    Args:
+        x_bits: Cases de X
+        o_bits: Cases de O
+
+    Returns:
+        int: 1 si X gagne, -1 si O gagne, None sinon
+    """
+    if WIN_TABLE[x_bits]:
+        return 1
+    if WIN_TABLE[o_bits]:
+        return -1
+    return None
+
+
+def is_full(x_bits: int, o_bits: int) -> bool:
+    """True si toutes les cases sont occupées."""
+    return (x_bits | o_bits) == FULL_MASK
+
+
+def is_draw(x_bits: int, o_bits: int) -> bool:
+    """True si le plateau est plein sans gagnant."""
+    return ((x_bits | o_bits) == FULL_MASK
+            and not WIN_TABLE[x_bits] and not WIN_TABLE[o_bits])
+
+
+def is_legal(x_bits: int, o_bits: int, action_idx: int) -> bool:
+    """True si la case action_idx (0-8) est libre."""
+    return 0 <= action_idx < 9 and not ((x_bits | o_bits) >> action_idx) & 1
+
+
+def legal_actions(x_bits: int, o_bits: int) -> Tuple[int, ...]:
+    """Retourne les indices (0-8) des cases libres."""
+    return MOVES_TABLE[x_bits | o_bits]
+
+
+def from_grid(grid: np.ndarray) -> Tuple[int, int]:
+    """
+    Convertit une grille (1 = X, -1 = O, 0 = vide) en bitboards.
+
+    Args:
+        grid: Plateau 3x3 ou vecteur de 9 éléments
+
+    Returns:
+        Tuple[int, int]: (x_bits, o_bits)
+    """
+    flat = np.asarray(grid).ravel()
+    return int(_WEIGHTS @ (flat == 1)), int(_WEIGHTS @ (flat == -1))
+
+
+def to_flat(x_bits: int, o_bits: int) -> np.ndarray:
+    """
+    Convertit des bitboards en vecteur de 9 éléments (1 / -1 / 0).
+
+    Returns:
+        np.ndarray: Vecteur de 9 entiers
+    """
+    flat = np.zeros(9, dtype=int)
+    for i in range(9):
+        if (x_bits >> i) & 1:
+            flat[i] = 1
+        elif (o_bits >> i) & 1:
+            flat[i] = -1
+    return flat
+
+
+def code(x_bits: int, o_bits: int) -> int:
+    """
+    Code base 3 d'une position (celui de state_graph.encode: X = 1, O = 2,
+    case i au rang 3^i).
+
+    Returns:
+        int: Code dans [0, 3^9)
+    """
+    return TERNARY[x_bits] + 2 * TERNARY[o_bits]
+
+
+def state_key(x_bits: int, o_bits: int) -> str:
+    """
+    Clé texte de tictactoe_game.Board.get_state_key (X = "1", O = "2",
+    case 0 en tête): les chiffres du code base 3 lus à l'envers.
+
+    Returns:
+        str: Clé de 9 caractères
+    """
+    return f"{DECIMAL[x_bits] + 2 * DECIMAL[o_bits]:09d}"
+
+
+def from_state_key(key: str) -> Tuple[int, int]:
+    """
+    Inverse de state_key.
+
+    Args:
+        key: Clé texte de 9 caractères "0" / "1" / "2"
+
+    Returns:
+        Tuple[int, int]: (x_bits, o_bits)
+    """
+    digits = key[::-1]
+    return (int(digits.replace("2", "0"), 2),
+            int(digits.replace("1", "0").replace("2", "1"), 2))
+
+
+def game_status(x_bits: int, o_bits: int) -> dict:
+    """
+    Statut complet au même format que RulesChecker.get_game_status.
+
+    Returns:
+        dict: is_terminal, winner, is_draw, game_over
+    """
+    win = winner(x_bits, o_bits)
+    draw = win is None and (x_bits | o_bits) == FULL_MASK
+    terminal = win is not None or draw
+    return {
+        'is_terminal': terminal,
+        'winner': win,
+        'is_draw': draw,
+        'game_over': terminal
+    }
+
+
+class Position:
+    """
+    Position 3x3 tenue à jour coup par coup: bitboards, grille NumPy
+    (1 = X, -1 = O, 0 = vide), sommes des 8 lignes et pile des coups.
+    make / undo / last_move_won coûtent O(1); les deux classes Board
+    n'ajoutent que leur interface.
+    """
+
+    def __init__(self):
+        """Initialise une position vide, X au trait"""
+        self.reset()
+
+    def reset(self) -> np.ndarray:
+        """
+        Revient à la position vide.
+
+        Returns:
+            np.ndarray: Le plateau vide
+        """
+        self.grid = np.zeros((3, 3), dtype=int)
+        # Vue plate de la grille (même mémoire), indexée par case
+        self.cells = self.grid.reshape(9)
+        self.current_player = 1
+        self.x_bits = 0
+        self.o_bits = 0
+        # Sommes des 8 lignes (ordre de WIN_MASKS): ±3 = ligne gagnante
+        self.line_sums = [0] * 8
+        self.empty_count = 9
+        # Pile des coups (row, col, player) pour undo
+        self.move_stack = []
+        return self.grid.copy()
+
+    def set_position(self, grid: np.ndarray, current_player: int):
+        """
+        Place une position complète (les compteurs sont recalculés et la
+        pile de coups est vidée).
+
+        Args:
+            grid: Grille 3x3 ou vecteur de 9 éléments (1 / -1 / 0)
+            current_player: Joueur au trait
+        """
+        self.grid = np.asarray(grid).reshape(3, 3).astype(int)
+        self.cells = self.grid.reshape(9)
+        self.current_player = current_player
+        self.x_bits, self.o_bits = from_grid(self.grid)
+        flat = self.cells.tolist()
+        self.line_sums = [
+            sum(flat[i] for i in range(9) if mask >> i & 1)
+            for mask in WIN_MASKS
+        ]
+        self.empty_count = flat.count(0)
+        self.move_stack = []
+
+    def is_legal(self, idx: int) -> bool:
+        """True si la case idx (0-8) est libre."""
+        return 0 <= idx < 9 and not ((self.x_bits | self.o_bits) >> idx) & 1
+
+    def make(self, idx: int, player: Optional[int] = None):
+        """
+        Joue la case idx, supposée libre (voir is_legal).
+
+        Args:
+            idx: Case (0-8)
+            player: Joueur (1 ou -1), utilise current_player si None
+        """
+        if player is None:
+            player = self.current_player
+
+        self.cells[idx] = player
+        if player == 1:
+            self.x_bits |= 1 << idx
+        else:
+            self.o_bits |= 1 << idx
+        line_sums = self.line_sums
+        for line in CELL_LINES[idx]:
+            line_sums[line] += player
+        self.empty_count -= 1
+        self.move_stack.append((idx // 3, idx % 3, player))
+        self.current_player = -self.current_player  # Change de joueur
+
+    def undo(self) -> Optional[int]:
+        """
+        Annule le dernier coup.
+
+        Returns:
+            Optional[int]: Case libérée, None si aucun coup à annuler
+        """
+        if not self.move_stack:
+            return None
+
+        row, col, player = self.move_stack.pop()
+        idx = row * 3 + col
+        self.cells[idx] = 0
+        if player == 1:
+            self.x_bits &= ~(1 << idx)
+        else:
+            self.o_bits &= ~(1 << idx)
+        line_sums = self.line_sums
+        for line in CELL_LINES[idx]:
+            line_sums[line] -= player
+        self.empty_count += 1
+        self.current_player = -self.current_player
+        return idx
+
+    def last_move_won(self) -> bool:
+        """
+        Vérifie en O(1) si le dernier coup a complété une ligne: seules les
+        2 à 4 lignes passant par la case jouée sont lues.
+
+        Returns:
+            bool: True si le dernier coup est gagnant
+        """
+        if not self.move_stack:
+            return False
+        row, col, player = self.move_stack[-1]
+        target = 3 * player
+        line_sums = self.line_sums
+        for line in CELL_LINES[row * 3 + col]:
+            if line_sums[line] == target:
+                return True
+        return False
+
+    def winner(self) -> Optional[int]:
+        """1 si X a une ligne, -1 si O en a une, None sinon."""
+        return winner(self.x_bits, self.o_bits)
+
+    def is_full(self) -> bool:
+        """True si toutes les cases sont occupées."""
+        return self.empty_count == 0
+
+    def get_bits(self) -> Tuple[int, int]:
+        """
+        Retourne la position sous forme de bitboards.
+
+        Returns:
+            Tuple[int, int]: (x_bits, o_bits)
+        """
+        return self.x_bits, self.o_bits
+
+    def code(self) -> int:
+        """Code base 3 de la position (clé des tables de state_graph)."""
+        return TERNARY[self.x_bits] + 2 * TERNARY[self.o_bits]
+
+    def state_key(self) -> str:
+        """Clé texte 1 / 2 de la position (clé de tictactoe_game)."""
+        return f"{DECIMAL[self.x_bits] + 2 * DECIMAL[self.o_bits]:09d}"
+
+    def copy_from(self, other: 'Position'):
+        """
+        Recopie l'état complet d'une autre position.
+
+        Args:
+            other: Position source
+        """
+        self.grid = other.grid.copy()
+        self.cells = self.grid.reshape(9)
+        self.current_player = other.current_player
+        self.x_bits = other.x_bits
+        self.o_bits = other.o_bits
+        self.line_sums = other.line_sums.copy()
+        self.empty_count = other.empty_count
+        self.move_stack = other.move_stack.copy()
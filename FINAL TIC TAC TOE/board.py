@@ -6,30 +6,18 @@ Responsable: INES
 import numpy as np
 from typing import Tuple, List, Optional
 
+import bitboard
 
-class Board:
+
+class Board(bitboard.Position):
     """
     Classe représentant le plateau de jeu 3x3.
     Gère l'état du plateau et les opérations de base.
+    Convention: 0 = vide, 1 = joueur X, -1 = joueur O. L'état (grille,
+    bitboards, sommes des lignes, pile des coups) est celui de
+    bitboard.Position; cette classe ajoute l'interface (row, col).
     """
     
-    def __init__(self):
-        """Initialise un plateau vide 3x3"""
-        self.grid = np.zeros((3, 3), dtype=int)
-        # Convention: 0 = vide, 1 = joueur X, -1 = joueur O
-        self.current_player = 1  # X commence
-        
-    def reset(self) -> np.ndarray:
-        """
-        Réinitialise le plateau à l'état initial.
-        
-        Returns:
-            np.ndarray: Le plateau vide
-        """
-        self.grid = np.zeros((3, 3), dtype=int)
-        self.current_player = 1
-        return self.grid.copy()
-    
     def get_state(self) -> np.ndarray:
         """
         Retourne l'état actuel du plateau.
@@ -46,7 +34,7 @@ class Board:
         Returns:
             List[Tuple[int, int]]: Liste des positions (row, col) disponibles
         """
-        return [(i, j) for i in range(3) for j in range(3) if self.grid[i, j] == 0]
+        return [divmod(idx, 3) for idx in bitboard.legal_actions(self.x_bits, self.o_bits)]
     
     def is_valid_action(self, row: int, col: int) -> bool:
         """
@@ -59,9 +47,7 @@ class Board:
         Returns:
             bool: True si le coup est valide
         """
-        if not (0 <= row < 3 and 0 <= col < 3):
-            return False
-        return self.grid[row, col] == 0
+        return 0 <= row < 3 and 0 <= col < 3 and self.is_legal(row * 3 + col)
     
     def make_move(self, row: int, col: int, player: Optional[int] = None) -> bool:
         """
@@ -78,13 +64,20 @@ class Board:
         if not self.is_valid_action(row, col):
             return False
         
-        if player is None:
-            player = self.current_player
-            
-        self.grid[row, col] = player
-        self.current_player = -self.current_player  # Change de joueur
+        self.make(row * 3 + col, player)
         return True
     
+    def undo_move(self) -> Optional[Tuple[int, int]]:
+        """
+        Annule le dernier coup joué avec make_move (exploration sans copie).
+        
+        Returns:
+            Optional[Tuple[int, int]]: Position (row, col) libérée, None si
+            aucun coup à annuler
+        """
+        idx = self.undo()
+        return None if idx is None else divmod(idx, 3)
+    
     def __str__(self) -> str:
         """
         Représentation en chaîne du plateau pour debug/console.
@@ -0,0 +1,216 @@
+"""
+Append-only delta checkpoints for resumable training
+
+A checkpoint log (checkpoint.log in the checkpoint directory) is a
+sequence of records:
+    header  12 bytes: magic b"TTCK", payload length, CRC32 of the payload
+    payload pickled dict: training state (episode, epsilons, win counts,
+            RNG states...) and, per agent, the Q-table rows changed since
+            the previous record as (codes, values, visits) arrays
+
+Only changed rows are written, so a checkpoint costs a few KB once the
+table has settled. Rows are keyed by state code (state_graph.encode), the
+same key as the .qtb model format, for both dense and dict agents.
+
+A record cut short by a crash fails its length or CRC check: loading stops
+there, and the next logger truncates it before appending. compact()
+folds the log into a single full record (written to a temporary file and
+renamed, so the log is never left half-compacted).
+"""
+
+import os
+import pickle
+import struct
+import zlib
+from typing import List, Optional
+
+import numpy as np
+
+from state_graph import encode, decode
+
+
+LOG_NAME = "checkpoint.log"
+MAGIC = b"TTCK"
+_RECORD = struct.Struct("<4sII")
+
+
+def _table_rows(agent, keys=None):
+    """(codes, values, visits) of an agent's rows: every row, or only `keys`"""
+    if agent.dense:
+        ids = np.flatnonzero(agent.visits) if keys is None else keys
+        return (agent.graph.codes[ids].astype(np.int64), agent.q_values[ids].copy(),
+                agent.visits[ids].copy())
+
+    keys = list(agent.q_table) if keys is None else keys
+    codes = np.array([encode(np.frombuffer(key, dtype=int)) for key in keys], dtype=np.int64)
+    values = np.array([agent.q_table[key] for key in keys], dtype=float).reshape(len(codes), -1)
+    return codes, values, None
+
+
+def _apply_rows(agent, rows):
+    codes, values, visits = rows
+    if agent.dense:
+        ids = agent.graph.code_to_id[codes].astype(np.intp)
+        agent.q_values[ids] = values
+        agent.visits[ids] = visits if visits is not None else 1
+    else:
+        for code, row in zip(codes.tolist(), values):
+            agent.q_table[decode(code).tobytes()] = row.astype(float)
+
+
+def _merge_rows(old, new):
+    """Rows of old overwritten by new (later records win)"""
+    if old is None:
+        return new
+    codes = np.concatenate([new[0], old[0]])
+    _, first = np.unique(codes, return_index=True)  # new rows come first
+    values = np.concatenate([new[1], old[1]])[first]
+    visits = None if new[2] is None else np.concatenate([new[2], old[2]])[first]
+    return codes[first], values, visits
+
+
+class CheckpointLog:
+    """
+    Delta checkpoints of a set of agents (e.g. [agent1, agent2]) plus the
+    training loop state.
+
+    save() diffs each table against a private copy taken at the previous
+    save/restore, appends the changed rows and fsyncs, so a checkpoint
+    survives a preempted machine. Every compact_every records the log is
+    compacted.
+    """
+
+    def __init__(self, directory: str, compact_every: int = 50):
+        self.directory = directory
+        self.filename = os.path.join(directory, LOG_NAME)
+        self.compact_every = compact_every
+        self._snapshots: List[object] = []
+
+        os.makedirs(directory, exist_ok=True)
+        records, end = self._scan()
+        self.records = len(records)
+        if os.path.exists(self.filename) and os.path.getsize(self.filename) > end:
+            with open(self.filename, "r+b") as f:
+                f.truncate(end)  # torn record from a crash
+
+    # ---------- READING ----------
+
+    def _scan(self):
+        """Valid payloads in order, and the offset after the last one"""
+        if not os.path.exists(self.filename):
+            return [], 0
+        with open(self.filename, "rb") as f:
+            data = f.read()
+
+        payloads = []
+        offset = 0
+        while offset + _RECORD.size <= len(data):
+            magic, length, checksum = _RECORD.unpack_from(data, offset)
+            start = offset + _RECORD.size
+            payload = data[start:start + length]
+            if magic != MAGIC or len(payload) != length or zlib.crc32(payload) != checksum:
+                break
+            payloads.append(payload)
+            offset = start + length
+        return payloads, offset
+
+    def load(self):
+        """
+        (rows per agent, latest training state), with every record folded
+        in, or None if the log is empty
+        """
+        payloads, _ = self._scan()
+        if not payloads:
+            return None
+
+        tables = None
+        state = None
+        for payload in payloads:
+            record = pickle.loads(payload)
+            if tables is None:
+                tables = [None] * len(record["rows"])
+            tables = [_merge_rows(old, new) for old, new in zip(tables, record["rows"])]
+            state = record["state"]
+        return tables, state
+
+    def restore(self, agents) -> Optional[dict]:
+        """Load the latest checkpoint into agents; returns its training state"""
+        loaded = self.load()
+        if loaded is None:
+            return None
+        tables, state = loaded
+        for agent, rows in zip(agents, tables):
+            _apply_rows(agent, rows)
+        self.track(agents)
+        return state
+
+    # ---------- WRITING ----------
+
+    def start_new(self) -> Optional[str]:
+        """
+        Start an empty log for a fresh (not resumed) run, so its deltas are
+        never folded into another run's tables. A previous log is kept as
+        checkpoint.log.old; returns its name, or None if there was none.
+        """
+        self._snapshots = []
+        self.records = 0
+        if not os.path.exists(self.filename):
+            return None
+        previous = self.filename + ".old"
+        os.replace(self.filename, previous)
+        return previous
+
+    def track(self, agents):
+        """Take the reference copies the next save() diffs against"""
+        self._snapshots = [
+            (agent.q_values.copy(), agent.visits.copy()) if agent.dense
+            else {key: np.array(values) for key, values in agent.q_table.items()}
+            for agent in agents
+        ]
+
+    def _changed_rows(self, agent, snapshot):
+        if snapshot is None:
+            return _table_rows(agent)
+        if agent.dense:
+            q_values, visits = snapshot
+            changed = np.flatnonzero((agent.q_values != q_values).any(axis=1)
+                                     | (agent.visits != visits))
+            return _table_rows(agent, changed)
+        changed = [key for key, values in agent.q_table.items()
+                   if key not in snapshot or not np.array_equal(values, snapshot[key])]
+        return _table_rows(agent, changed)
+
+    def save(self, agents, state: dict) -> int:
+        """Append the rows changed since the last save; returns the bytes written"""
+        snapshots = self._snapshots or [None] * len(agents)
+        rows = [self._changed_rows(agent, snapshot) for agent, snapshot in zip(agents, snapshots)]
+        written = self._append({"rows": rows, "state": state})
+        self.track(agents)
+
+        if self.records >= self.compact_every:
+            self.compact()
+        return written
+
+    def _append(self, record: dict, filename: Optional[str] = None) -> int:
+        payload = pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)
+        with open(filename or self.filename, "ab") as f:
+            f.write(_RECORD.pack(MAGIC, len(payload), zlib.crc32(payload)))
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        self.records += 1
+        return _RECORD.size + len(payload)
+
+    def compact(self):
+        """Rewrite the log as one record holding the folded tables"""
+        loaded = self.load()
+        if loaded is None:
+            return
+        tables, state = loaded
+
+        temporary = self.filename + ".tmp"
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        self.records = 0
+        self._append({"rows": tables, "state": state}, temporary)
+        os.replace(temporary, self.filename)
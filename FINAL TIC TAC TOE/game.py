@@ -9,6 +9,11 @@ import numpy as np
 from typing import Tuple, List, Optional, Dict
 from board import Board
 from rules import RulesChecker
+from mnk_board import MNKBoard
+from mnk_rules import MNKRules
+import bitboard
+from state_graph import load_state_graph, bits_to_code, StateGraph, STATUS_ONGOING, STATUS_DRAW
+import metrics
 
 
 class TicTacToeEnvironment:
@@ -19,12 +24,57 @@ class TicTacToeEnvironment:
     Inspiré des environnements Gym pour compatibilité avec le RL.
     """
     
-    def __init__(self):
-        """Initialise l'environnement de jeu."""
-        self.board = Board()
-        self.rules = RulesChecker()
+    def __init__(self, use_bitboard: bool = True, compiled: bool = False,
+                 record_history: bool = False, board: Optional[MNKBoard] = None):
+        """
+        Initialise l'environnement de jeu.
+        
+        Args:
+            use_bitboard: Si True, le statut est lu dans les bitboards du plateau
+                          (temps constant); sinon il est recalculé depuis la grille
+            compiled: Si True, la partie avance par indexation dans les tables
+                      du graphe compilé (state_graph); le plateau n'est
+                      reconstruit que lorsqu'on accède à self.board
+            record_history: Si True, step_fast() écrit chaque coup dans le
+                            tampon préalloué history_buffer
+            board: Plateau m,n,k à utiliser à la place du 3x3 (les actions
+                   plates deviennent row * width + col; compiled et
+                   step_fast restent réservés au 3x3)
+        """
+        self.mnk = board is not None
+        if self.mnk and compiled:
+            raise ValueError("le mode compilé n'existe que pour le plateau 3x3")
+        self._board = board if self.mnk else Board()
+        self._board_stale = False
+        self.rules = MNKRules(board.width, board.height, board.k) if self.mnk else RulesChecker()
+        self.width = self._board.width if self.mnk else 3
+        self.use_bitboard = use_bitboard
+        self.compiled = compiled
+        self.graph = load_state_graph() if compiled else None
+        self.state_id = 0
         self.move_history = []
         self.game_count = 0
+        self.record_history = record_history
+        self.history_buffer = bytearray(9)
+        self.history_length = 0
+    
+    @property
+    def board(self) -> Board:
+        """Plateau courant (resynchronisé depuis le graphe en mode compilé)."""
+        if self._board_stale:
+            self._sync_board()
+        return self._board
+    
+    @board.setter
+    def board(self, board: Board):
+        self._board = board
+        self._board_stale = False
+    
+    def _sync_board(self):
+        """Reconstruit le plateau à partir de state_id (mode compilé)."""
+        self._board.set_position(self.graph.boards[self.state_id],
+                                 int(self.graph.to_move[self.state_id]))
+        self._board_stale = False
         
     def reset(self) -> np.ndarray:
         """
@@ -33,8 +83,11 @@ class TicTacToeEnvironment:
         Returns:
             np.ndarray: État initial du plateau
         """
-        self.board.reset()
+        self._board.reset()
+        self._board_stale = False
+        self.state_id = 0
         self.move_history = []
+        self.history_length = 0
         self.game_count += 1
         return self.get_state()
     
@@ -45,6 +98,8 @@ class TicTacToeEnvironment:
         Returns:
             np.ndarray: Grille 3x3 représentant l'état
         """
+        if self.compiled:
+            return self.graph.boards[self.state_id].reshape(3, 3).astype(int)
         return self.board.get_state()
     
     def get_state_flat(self) -> np.ndarray:
@@ -54,6 +109,8 @@ class TicTacToeEnvironment:
         Returns:
             np.ndarray: Vecteur de 9 éléments
         """
+        if self.compiled:
+            return self.graph.boards[self.state_id].astype(int)
         return self.board.get_state().flatten()
     
     def get_available_actions(self) -> List[Tuple[int, int]]:
@@ -67,11 +124,16 @@ class TicTacToeEnvironment:
     
     def get_available_actions_flat(self) -> List[int]:
         """
-        Retourne les actions sous forme d'indices 0-8 (utile pour l'IA).
+        Retourne les actions sous forme d'indices 0-8 (utile pour l'IA);
+        row * width + col pour un plateau m,n,k.
         
         Returns:
             List[int]: Liste des indices disponibles
         """
+        if self.mnk:
+            return self.board.get_available_actions_flat()
+        if self.compiled:
+            return list(bitboard.MOVES_TABLE[int(self.graph.occupied[self.state_id])])
         return [row * 3 + col for row, col in self.get_available_actions()]
     
     def step(self, action: Tuple[int, int]) -> Tuple[np.ndarray, float, bool, Dict]:
@@ -90,6 +152,18 @@ class TicTacToeEnvironment:
         """
         row, col = action
         
+        if self.compiled:
+            if metrics.ENABLED:
+                start = metrics.perf_counter()
+                result = self._step_compiled(row, col)
+                metrics.observe("env_step_seconds", metrics.perf_counter() - start, phase="compiled")
+                return result
+            return self._step_compiled(row, col)
+        
+        timed = metrics.ENABLED
+        if timed:
+            start = metrics.perf_counter()
+        
         # Vérifier si l'action est valide
         if not self.board.is_valid_action(row, col):
             return self.get_state(), -10.0, True, {'error': 'invalid_move'}
@@ -101,34 +175,170 @@ class TicTacToeEnvironment:
         self.board.make_move(row, col)
         self.move_history.append((row, col, current_player))
         
+        if timed:
+            moved = metrics.perf_counter()
+            metrics.observe("env_step_seconds", moved - start, phase="move")
+        
         # Vérifier le statut du jeu
-        status = self.rules.get_game_status(self.board.grid)
+        status = self._get_status()
         
         # Calculer la récompense
         reward = self._calculate_reward(status, current_player)
         
+        if timed:
+            checked = metrics.perf_counter()
+            metrics.observe("env_step_seconds", checked - moved, phase="status")
+        
         # Préparer les informations
         info = {
             'status': status,
             'move_count': len(self.move_history),
             'current_player': self.board.current_player
         }
+        state = self.get_state()
+        
+        if timed:
+            metrics.observe("env_step_seconds", metrics.perf_counter() - checked, phase="state")
         
-        return self.get_state(), reward, status['is_terminal'], info
+        return state, reward, status['is_terminal'], info
     
     def step_flat(self, action_idx: int) -> Tuple[np.ndarray, float, bool, Dict]:
         """
-        Version avec action sous forme d'indice 0-8.
+        Version avec action sous forme d'indice 0-8 (row * width + col
+        pour un plateau m,n,k).
         
         Args:
-            action_idx: Indice de 0 à 8
+            action_idx: Indice de la case
             
         Returns:
             Même format que step()
         """
-        row = action_idx // 3
-        col = action_idx % 3
-        return self.step((row, col))
+        return self.step(divmod(action_idx, self.width))
+    
+    def step_id(self, action_idx: int) -> Tuple[int, float, bool]:
+        """
+        Pas du mode compilé: uniquement de l'indexation dans les tables,
+        sans tableau, dict ni historique.
+        
+        Args:
+            action_idx: Indice de 0 à 8
+            
+        Returns:
+            Tuple (state_id, reward, done) avec la même récompense que step()
+        """
+        graph = self.graph
+        next_id = int(graph.next_state[self.state_id, action_idx]) if 0 <= action_idx < 9 else -1
+        if next_id < 0:
+            return self.state_id, -10.0, True
+        self.state_id = next_id
+        self._board_stale = True
+        status = graph.status[next_id]
+        # Seul le joueur qui vient de jouer peut avoir gagné
+        return next_id, (1.0 if status == 1 or status == -1 else 0.0), status != STATUS_ONGOING
+    
+    def get_graph(self) -> StateGraph:
+        """
+        Graphe compilé des positions, chargé à la première utilisation.
+        Les state_id renvoyés par step_fast() indexent ses tables.
+        """
+        if self.mnk:
+            raise ValueError("le graphe compilé n'existe que pour le plateau 3x3")
+        if self.graph is None:
+            self.graph = load_state_graph()
+        return self.graph
+    
+    def step_fast(self, action_idx: int) -> Tuple[int, float, bool]:
+        """
+        Pas sans allocation, disponible dans tous les modes: indexation dans
+        le graphe compilé, sans tableau, dict ni move_history. Le plateau
+        n'est reconstruit que si on accède ensuite à self.board. Comme en
+        mode compilé, tout coup après la fin de la partie est invalide.
+        
+        Args:
+            action_idx: Indice de 0 à 8
+            
+        Returns:
+            Tuple (state_id, reward, done) avec la même récompense que step();
+            graph.boards[state_id] donne le plateau
+        """
+        graph = self.graph if self.graph is not None else self.get_graph()
+        
+        if not self.compiled and not self._board_stale:
+            # Le plateau est à jour (reset, step...): state_id part de lui
+            self._sync_state_id()
+        
+        next_id = int(graph.next_state[self.state_id, action_idx]) if 0 <= action_idx < 9 else -1
+        if next_id < 0:
+            return self.state_id, -10.0, True
+        
+        if self.record_history:
+            self.history_buffer[self.history_length] = action_idx
+            self.history_length += 1
+        
+        self.state_id = next_id
+        self._board_stale = True
+        status = graph.status[next_id]
+        return next_id, (1.0 if status == 1 or status == -1 else 0.0), status != STATUS_ONGOING
+    
+    def get_fast_history(self) -> List[int]:
+        """
+        Coups joués par step_fast() depuis reset() (si record_history).
+        
+        Returns:
+            List[int]: Indices 0-8, X jouant les coups pairs
+        """
+        return list(self.history_buffer[:self.history_length])
+    
+    def _sync_state_id(self):
+        """Recalcule state_id depuis les bitboards du plateau (mode normal)."""
+        board = self._board
+        state_id = int(self.graph.code_to_id[bits_to_code(board.x_bits, board.o_bits)])
+        if state_id < 0:
+            raise ValueError("position non atteignable")
+        self.state_id = state_id
+        self._board_stale = True
+    
+    def _step_compiled(self, row: int, col: int) -> Tuple[np.ndarray, float, bool, Dict]:
+        """
+        step() en mode compilé. Contrairement au mode normal, tout coup
+        après la fin de la partie est invalide.
+        """
+        if not (0 <= row < 3 and 0 <= col < 3) or self.graph.next_state[self.state_id, row * 3 + col] < 0:
+            return self.get_state(), -10.0, True, {'error': 'invalid_move'}
+        
+        current_player = int(self.graph.to_move[self.state_id])
+        next_id, reward, done = self.step_id(row * 3 + col)
+        self.move_history.append((row, col, current_player))
+        
+        info = {
+            'status': self._get_status(),
+            'move_count': len(self.move_history),
+            'current_player': -current_player
+        }
+        return self.get_state(), reward, done, info
+    
+    def _get_status(self) -> Dict:
+        """
+        Statut du jeu via les bitboards ou via la grille selon use_bitboard
+        (compteurs incrémentaux du plateau pour un plateau m,n,k).
+        
+        Returns:
+            dict: Statut au format RulesChecker.get_game_status
+        """
+        if self.mnk:
+            return self.rules.get_game_status_board(self.board)
+        if self.compiled:
+            status = int(self.graph.status[self.state_id])
+            terminal = status != STATUS_ONGOING
+            return {
+                'is_terminal': terminal,
+                'winner': status if status in (1, -1) else None,
+                'is_draw': status == STATUS_DRAW,
+                'game_over': terminal
+            }
+        if self.use_bitboard:
+            return self.rules.get_game_status_bits(self.board.x_bits, self.board.o_bits)
+        return self.rules.get_game_status(self.board.grid)
     
     def _calculate_reward(self, status: Dict, player: int) -> float:
         """
@@ -165,7 +375,7 @@ class TicTacToeEnvironment:
             print(f"  Game #{self.game_count}")
             print("="*15)
             print(self.board)
-            status = self.rules.get_game_status(self.board.grid)
+            status = self._get_status()
             if status['winner']:
                 winner_name = 'X' if status['winner'] == 1 else 'O'
                 print(f"\n🏆 Winner: {winner_name}")
@@ -186,6 +396,13 @@ class TicTacToeEnvironment:
         Returns:
             int: 1 (X), -1 (O), ou None
         """
+        if self.compiled:
+            status = int(self.graph.status[self.state_id])
+            return status if status in (1, -1) else None
+        if self.mnk:
+            return self.board.winner
+        if self.use_bitboard:
+            return bitboard.winner(self.board.x_bits, self.board.o_bits)
         return self.rules.check_winner(self.board.grid)
     
     def is_game_over(self) -> bool:
@@ -195,7 +412,9 @@ class TicTacToeEnvironment:
         Returns:
             bool: True si terminé
         """
-        return self.rules.is_terminal(self.board.grid)
+        if self.compiled:
+            return self.graph.status[self.state_id] != STATUS_ONGOING
+        return self._get_status()['is_terminal']
     
     def get_game_info(self) -> Dict:
         """
@@ -204,7 +423,7 @@ class TicTacToeEnvironment:
         Returns:
             dict: Informations complètes
         """
-        status = self.rules.get_game_status(self.board.grid)
+        status = self._get_status()
         return {
             'state': self.get_state(),
             'state_flat': self.get_state_flat(),
@@ -0,0 +1,76 @@
+"""
+Load test for server.py / async_server.py
+N concurrent clients play random games; reports /move throughput and latency
+
+Usage: python loadtest.py [url] [clients ...] [--duration SECONDS]
+"""
+
+import asyncio
+import random
+import sys
+import time
+
+import aiohttp
+import numpy as np
+
+
+async def _client(session, url, deadline, latencies):
+    while time.perf_counter() < deadline:
+        async with session.post(f"{url}/reset") as response:
+            data = await response.json()
+        game_id, board = data["game_id"], data["board"]
+
+        done = False
+        while not done and time.perf_counter() < deadline:
+            action = random.choice([i for i, cell in enumerate(board) if cell == 0])
+
+            start = time.perf_counter()
+            async with session.post(f"{url}/move",
+                                    json={"game_id": game_id, "action": action}) as response:
+                data = await response.json()
+            latencies.append(time.perf_counter() - start)
+
+            if "error" in data:
+                raise RuntimeError(data["error"])
+            board, done = data["board"], data["done"]
+
+
+async def run_load(url: str, clients: int, duration: float = 10.0) -> dict:
+    latencies = []
+    connector = aiohttp.TCPConnector(limit=0)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        start = time.perf_counter()
+        deadline = start + duration
+        await asyncio.gather(*(_client(session, url, deadline, latencies)
+                               for _ in range(clients)))
+        elapsed = time.perf_counter() - start
+
+    lat = np.array(latencies) * 1000
+    return {
+        "clients": clients,
+        "moves": len(lat),
+        "throughput": len(lat) / elapsed,
+        "p50_ms": float(np.percentile(lat, 50)) if len(lat) else 0.0,
+        "p99_ms": float(np.percentile(lat, 99)) if len(lat) else 0.0
+    }
+
+
+def main(argv):
+    duration = 10.0
+    if "--duration" in argv:
+        i = argv.index("--duration")
+        duration = float(argv[i + 1])
+        argv = argv[:i] + argv[i + 2:]
+
+    url = argv[0] if argv else "http://127.0.0.1:5000"
+    client_counts = [int(c) for c in argv[1:]] or [1, 100, 1000]
+
+    print(f"{'clients':>8} {'moves/s':>10} {'p50 ms':>8} {'p99 ms':>8}")
+    for clients in client_counts:
+        result = asyncio.run(run_load(url, clients, duration))
+        print(f"{result['clients']:>8} {result['throughput']:>10.0f} "
+              f"{result['p50_ms']:>8.2f} {result['p99_ms']:>8.2f}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
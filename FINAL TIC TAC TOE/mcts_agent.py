@@ -0,0 +1,348 @@
+"""
+Monte Carlo Tree Search agent compatible with TicTacToeEnvironment
+UCT on any m,n,k board, with an array-backed node pool, batched random
+rollouts and subtree reuse between successive moves of a game
+"""
+
+import random
+import threading
+import time
+from typing import List, Optional
+
+import numpy as np
+
+from mnk_board import MNKBoard, DIRECTIONS
+
+
+# Node terminal flags
+UNKNOWN = -1
+ONGOING = 0
+WON = 1     # the move into the node won the game
+DRAWN = 2
+
+
+def line_windows(width: int, height: int, k: int) -> np.ndarray:
+    """(L, k) flat cell indices of every k-in-a-row window on the board"""
+    windows = []
+    for row in range(height):
+        for col in range(width):
+            for dr, dc in DIRECTIONS:
+                end_row, end_col = row + dr * (k - 1), col + dc * (k - 1)
+                if 0 <= end_row < height and 0 <= end_col < width:
+                    windows.append([(row + dr * i) * width + col + dc * i for i in range(k)])
+    return np.array(windows, dtype=np.intp).reshape(-1, k)
+
+
+class MCTSAgent:
+    """
+    UCT search with the same choose_action interface as QLearningAgent
+    (flat states, actions row * width + col).
+
+    Nodes live in preallocated parallel arrays (visits, value sums, first
+    child offset, child count, move, parent); the children of a node are
+    contiguous, so selection is one vectorized UCB over a slice. Values are
+    stored from the point of view of the player who made the move into the
+    node. Each leaf is scored by rollout_batch random playouts evaluated
+    together in NumPy.
+
+    Budget per move: `playouts` rollouts, or `time_limit` seconds if set
+    (whichever comes first when both are given).
+    """
+
+    def __init__(self, player: int = -1,
+                 width: int = 3, height: int = 3, k: int = 3,
+                 playouts: int = 2000,
+                 time_limit: Optional[float] = None,
+                 exploration: float = 1.4,
+                 rollout_batch: int = 8,
+                 max_nodes: int = 200000,
+                 reuse_tree: bool = True,
+                 seed: Optional[int] = None):
+
+        self.player = player  # kept for interface symmetry; side to move is read from the board
+        self.width = width
+        self.height = height
+        self.k = k
+        self.num_cells = width * height
+        self.playouts = playouts
+        self.time_limit = time_limit
+        self.exploration = exploration
+        self.rollout_batch = rollout_batch
+        self.max_nodes = max_nodes
+        self.reuse_tree = reuse_tree
+
+        self.windows = line_windows(width, height, k)
+        self.rng = np.random.default_rng(seed)
+        self._random = random.Random(seed)
+
+        # ---- Node pool (struct of arrays) ----
+        self.visits = np.zeros(max_nodes, dtype=np.int32)
+        self.value_sum = np.zeros(max_nodes, dtype=np.float32)
+        self.first_child = np.full(max_nodes, -1, dtype=np.int32)
+        self.num_children = np.zeros(max_nodes, dtype=np.int16)
+        self.move = np.full(max_nodes, -1, dtype=np.int16)
+        self.parent = np.full(max_nodes, -1, dtype=np.int32)
+        self.terminal = np.full(max_nodes, UNKNOWN, dtype=np.int8)
+        self.size = 0
+
+        self.root = -1
+        self._root_cells: Optional[np.ndarray] = None
+
+        # The pool and the reused root are shared state
+        self._lock = threading.Lock()
+
+        self.searches = 0
+        self.reused = 0
+        self.last_playouts = 0
+        self.last_search_ms = 0.0
+
+    def reseed(self, seed: Optional[int]):
+        """Restart the random streams from seed and drop the reusable tree"""
+        with self._lock:
+            self.rng = np.random.default_rng(seed)
+            self._random = random.Random(seed)
+            self.root = -1
+            self._root_cells = None
+
+    # ---------- NODE POOL ----------
+
+    def _reset_pool(self):
+        self.size = 1
+        self.root = 0
+        self.visits[0] = 0
+        self.value_sum[0] = 0.0
+        self.first_child[0] = -1
+        self.num_children[0] = 0
+        self.move[0] = -1
+        self.parent[0] = -1
+        self.terminal[0] = ONGOING
+
+    def _expand(self, node: int, empties: List[int]) -> bool:
+        count = len(empties)
+        start = self.size
+        if start + count > self.max_nodes:
+            return False
+        end = start + count
+        self.visits[start:end] = 0
+        self.value_sum[start:end] = 0.0
+        self.first_child[start:end] = -1
+        self.num_children[start:end] = 0
+        self.move[start:end] = empties
+        self.parent[start:end] = node
+        self.terminal[start:end] = UNKNOWN
+        self.first_child[node] = start
+        self.num_children[node] = count
+        self.size = end
+        return True
+
+    def _select_child(self, node: int) -> int:
+        start = int(self.first_child[node])
+        end = start + int(self.num_children[node])
+        visits = self.visits[start:end]
+
+        unvisited = np.flatnonzero(visits == 0)
+        if len(unvisited):
+            return start + int(unvisited[self._random.randrange(len(unvisited))])
+
+        log_parent = np.log(self.visits[node])
+        ucb = (self.value_sum[start:end] / visits
+               + self.exploration * np.sqrt(log_parent / visits))
+        return start + int(np.argmax(ucb))
+
+    def _try_reuse(self, cells: np.ndarray) -> bool:
+        """Re-root on the node for `cells` if it is a descendant of the old root"""
+        if not self.reuse_tree or self.root < 0 or self._root_cells is None:
+            return False
+        if self.size > self.max_nodes * 3 // 4:
+            return False
+
+        placed = np.flatnonzero(cells != self._root_cells)
+        if len(placed) == 0 or (self._root_cells[placed] != 0).any():
+            return False
+
+        # Replay the new stones in turn order from the old root
+        to_move = self._to_move(self._root_cells)
+        mine = [int(c) for c in placed if cells[c] == to_move]
+        theirs = [int(c) for c in placed if cells[c] == -to_move]
+        if len(mine) - len(theirs) not in (0, 1):
+            return False
+
+        node = self.root
+        for i in range(len(placed)):
+            cell = mine[i // 2] if i % 2 == 0 else theirs[i // 2]
+            start = int(self.first_child[node])
+            if start < 0:
+                return False
+            moves = self.move[start:start + int(self.num_children[node])]
+            found = np.flatnonzero(moves == cell)
+            if not len(found):
+                return False
+            node = start + int(found[0])
+
+        if self.first_child[node] < 0:
+            return False
+        self.root = node
+        self.parent[node] = -1
+        return True
+
+    # ---------- SEARCH ----------
+
+    def _to_move(self, cells: np.ndarray) -> int:
+        return 1 if np.count_nonzero(cells == 1) == np.count_nonzero(cells == -1) else -1
+
+    def _board_from(self, cells: np.ndarray) -> MNKBoard:
+        board = MNKBoard(self.width, self.height, self.k)
+        for idx in np.flatnonzero(cells).tolist():
+            board.make_move(idx // self.width, idx % self.width, int(cells[idx]))
+        board.move_stack.clear()  # the root position cannot be undone
+        board.current_player = self._to_move(cells)
+        return board
+
+    def _rollouts(self, board: MNKBoard, count: int) -> float:
+        """
+        Sum of `count` random playout results from the current position,
+        from the point of view of the player who just moved.
+
+        Each playout fills every empty cell in a random order; the game is
+        won by whoever completes a window first (the window whose last
+        filled cell comes earliest), so one vectorized pass scores them all.
+        """
+        cells = np.array(board.cells, dtype=np.int8)
+        empty = np.flatnonzero(cells == 0)
+        to_move = board.current_player
+
+        order = self.rng.random((count, len(empty))).argsort(axis=1)
+        boards = np.broadcast_to(cells, (count, self.num_cells)).copy()
+        times = np.zeros((count, self.num_cells), dtype=np.int32)
+        times[:, empty] = order + 1
+        boards[:, empty] = np.where(order % 2 == 0, to_move, -to_move)
+
+        sums = boards[:, self.windows].sum(axis=2, dtype=np.int32)
+        finished = times[:, self.windows].max(axis=2)
+        never = self.num_cells + 1
+        x_time = np.where(sums == self.k, finished, never).min(axis=1)
+        o_time = np.where(sums == -self.k, finished, never).min(axis=1)
+
+        # +1 X wins, -1 O wins, 0 draw
+        results = np.sign(o_time - x_time)
+        return float(results.sum()) * -to_move
+
+    def _search(self, board: MNKBoard):
+        batch = self.rollout_batch
+        deadline = None if self.time_limit is None else time.perf_counter() + self.time_limit
+        playouts = 0
+
+        while playouts < self.playouts:
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+
+            # ---- Selection ----
+            node = self.root
+            depth = 0
+            while self.first_child[node] >= 0 and self.terminal[node] != WON and self.terminal[node] != DRAWN:
+                node = self._select_child(node)
+                move = int(self.move[node])
+                board.make_move(move // self.width, move % self.width)
+                depth += 1
+
+            # ---- Expansion ----
+            flag = self.terminal[node]
+            if flag == UNKNOWN:
+                if board.winner is not None:
+                    flag = WON
+                elif board.empty_count == 0:
+                    flag = DRAWN
+                else:
+                    flag = ONGOING
+                self.terminal[node] = flag
+
+            if flag == ONGOING and (self.visits[node] > 0 or node == self.root):
+                if self._expand(node, board.get_available_actions_flat()):
+                    node = self._select_child(node)
+                    move = int(self.move[node])
+                    board.make_move(move // self.width, move % self.width)
+                    depth += 1
+                    flag = ONGOING
+                    if board.winner is not None:
+                        flag = WON
+                    elif board.empty_count == 0:
+                        flag = DRAWN
+                    self.terminal[node] = flag
+
+            # ---- Simulation ----
+            if flag == WON:
+                value = float(batch)
+            elif flag == DRAWN:
+                value = 0.0
+            else:
+                value = self._rollouts(board, batch)
+            playouts += batch
+
+            # ---- Backpropagation ----
+            while node >= 0:
+                self.visits[node] += batch
+                self.value_sum[node] += value
+                value = -value
+                if node == self.root:
+                    break
+                node = int(self.parent[node])
+
+            for _ in range(depth):
+                board.undo_move()
+
+        self.last_playouts = playouts
+
+    # ---------- ACTION SELECTION ----------
+
+    def choose_action(self, state: np.ndarray,
+                      valid_actions: List[int],
+                      training: bool = True) -> int:
+
+        if not valid_actions:
+            return None
+        if len(valid_actions) == 1:
+            return valid_actions[0]
+
+        cells = np.asarray(state, dtype=np.int8).ravel()
+        if len(cells) != self.num_cells:
+            raise ValueError(f"expected a {self.width}x{self.height} board")
+
+        with self._lock:
+            start_time = time.perf_counter()
+
+            if self._try_reuse(cells):
+                self.reused += 1
+            else:
+                self._reset_pool()
+
+            self._search(self._board_from(cells))
+
+            start = int(self.first_child[self.root])
+            end = start + int(self.num_children[self.root])
+            visits = np.where(np.isin(self.move[start:end], valid_actions),
+                              self.visits[start:end], -1)
+            action = int(self.move[start + int(np.argmax(visits))])
+
+            self._root_cells = cells.copy()
+            self.searches += 1
+            self.last_search_ms = (time.perf_counter() - start_time) * 1000
+
+        return action
+
+    # ---------- LEARNING (no-op) ----------
+
+    def record_move(self, state, action):
+        pass
+
+    def learn(self, reward):
+        pass
+
+    def get_stats(self):
+        return {
+            "searches": self.searches,
+            "reused_subtrees": self.reused,
+            "pool_nodes": self.size,
+            "max_nodes": self.max_nodes,
+            "last_playouts": self.last_playouts,
+            "last_search_ms": self.last_search_ms
+        }
@@ -0,0 +1,176 @@
+"""
+Lightweight, switchable instrumentation
+Histograms and counters for the environment, agent, training and server hot
+paths, rendered in the Prometheus text format.
+
+Disabled by default (TICTACTOE_METRICS=1 or enable() turns it on). Hot paths
+guard their timing with `if metrics.ENABLED:`, so when disabled the cost is
+one module-attribute check per phase. Updates take a module lock, so the
+threaded Flask server can record from several request threads at once.
+"""
+
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, Optional, Tuple
+
+
+ENABLED = os.environ.get("TICTACTOE_METRICS", "0") not in ("", "0", "false")
+
+PREFIX = "tictactoe_"
+
+# Upper bounds in seconds, from 1 us to 1 s
+DEFAULT_BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4,
+                   5e-4, 1e-3, 2.5e-3, 5e-3, 1e-2, 0.1, 1.0)
+
+perf_counter = time.perf_counter
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-quantile"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return float("inf")
+
+
+_lock = threading.Lock()
+_histograms: Dict[Tuple[str, Tuple], Histogram] = {}
+_counters: Dict[Tuple[str, Tuple], float] = {}
+_help: Dict[str, str] = {}
+
+
+def enable(on: bool = True):
+    global ENABLED
+    ENABLED = on
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+
+
+def describe(name: str, text: str):
+    _help[name] = text
+
+
+def observe(name: str, seconds: float, **labels):
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = Histogram()
+        histogram.observe(seconds)
+
+
+def inc(name: str, amount: float = 1, **labels):
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+# --------------------------------------------------
+# OUTPUT
+# --------------------------------------------------
+
+def _labels(pairs, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(pairs) + ([extra] if extra else [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+
+def render_prometheus(gauges: Optional[Dict[str, float]] = None,
+                      counters: Optional[Dict[str, float]] = None) -> str:
+    """
+    All metrics in the Prometheus text exposition format, plus the given
+    point-in-time gauges and externally kept counters (names ending in _total)
+    """
+    with _lock:
+        return _render(gauges, counters)
+
+
+def _render(gauges, counters) -> str:
+    lines = []
+    typed = set()
+
+    def header(name, kind):
+        if name not in typed:
+            typed.add(name)
+            if name in _help:
+                lines.append(f"# HELP {PREFIX}{name} {_help[name]}")
+            lines.append(f"# TYPE {PREFIX}{name} {kind}")
+
+    for (name, labels), histogram in sorted(_histograms.items()):
+        header(name, "histogram")
+        cumulative = 0
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            cumulative += count
+            lines.append(f"{PREFIX}{name}_bucket{_labels(labels, ('le', repr(bound)))} {cumulative}")
+        lines.append(f"{PREFIX}{name}_bucket{_labels(labels, ('le', '+Inf'))} {histogram.count}")
+        lines.append(f"{PREFIX}{name}_sum{_labels(labels)} {histogram.sum}")
+        lines.append(f"{PREFIX}{name}_count{_labels(labels)} {histogram.count}")
+
+    for (name, labels), value in sorted(_counters.items()):
+        header(name, "counter")
+        lines.append(f"{PREFIX}{name}{_labels(labels)} {value}")
+
+    for name, value in sorted((counters or {}).items()):
+        header(name, "counter")
+        lines.append(f"{PREFIX}{name} {value}")
+
+    for name, value in sorted((gauges or {}).items()):
+        header(name, "gauge")
+        lines.append(f"{PREFIX}{name} {value}")
+
+    return "\n".join(lines) + "\n"
+
+
+def summary() -> str:
+    """One line per histogram (count, mean, ~p50, ~p99) and counter, for logs"""
+    with _lock:
+        return _summary()
+
+
+def _summary() -> str:
+    lines = []
+    for (name, labels), histogram in sorted(_histograms.items()):
+        if not histogram.count:
+            continue
+        mean = histogram.sum / histogram.count
+        lines.append(f"  {name}{_labels(labels)}: n={histogram.count} "
+                     f"mean={mean * 1e6:.1f}us p50<={histogram.quantile(0.5) * 1e6:.1f}us "
+                     f"p99<={histogram.quantile(0.99) * 1e6:.1f}us")
+    for (name, labels), value in sorted(_counters.items()):
+        lines.append(f"  {name}{_labels(labels)}: {value:g}")
+    return "\n".join(lines)
+
+
+describe("env_step_seconds", "TicTacToeEnvironment.step time per phase")
+describe("agent_seconds", "QLearningAgent time per operation")
+describe("play_game_seconds", "train.play_game time per episode")
+describe("server_move_seconds", "/move time per phase")
+describe("games_played_total", "Episodes played by train.play_game")
+describe("moves_total", "Moves played by train.play_game")
+describe("agent_explorations_total", "Random exploration moves of QLearningAgent")
@@ -0,0 +1,247 @@
+"""
+Plateau généralisé m,n,k (largeur x hauteur, k pions alignés pour gagner)
+Tic-Tac-Toe = MNKBoard(3, 3, 3); puissance 4 sans gravité sur 7x7 =
+MNKBoard(7, 7, 4); gomoku = MNKBoard(15, 15, 5).
+
+Même interface que board.Board. Le coût d'un coup ne dépend pas de la
+taille du plateau: la victoire est cherchée uniquement autour du dernier
+coup (4 directions, au plus 2(k-1) cases chacune) et les cases occupées
+sont tenues dans un bitset (un entier Python, bit i = row * width + col).
+"""
+
+import numpy as np
+from typing import Tuple, List, Optional
+
+
+# Directions (dr, dc): horizontale, verticale, diagonale \, diagonale /
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+
+class MNKBoard:
+    """
+    Plateau width x height où il faut aligner k pions.
+    Convention: 0 = vide, 1 = joueur X, -1 = joueur O.
+    """
+
+    def __init__(self, width: int = 3, height: int = 3, k: int = 3):
+        """
+        Initialise un plateau vide.
+
+        Args:
+            width: Nombre de colonnes
+            height: Nombre de lignes
+            k: Nombre de pions alignés pour gagner
+        """
+        if width < 1 or height < 1 or not 1 <= k <= max(width, height):
+            raise ValueError(f"plateau {width}x{height} incompatible avec k={k}")
+        self.width = width
+        self.height = height
+        self.k = k
+        self.num_cells = width * height
+        self.full_mask = (1 << self.num_cells) - 1
+        self.reset()
+
+    def reset(self) -> np.ndarray:
+        """
+        Réinitialise le plateau à l'état initial.
+
+        Returns:
+            np.ndarray: Le plateau vide
+        """
+        self.grid = np.zeros((self.height, self.width), dtype=int)
+        # Copie en liste Python: lue par la détection de victoire
+        self.cells = [0] * self.num_cells
+        self.current_player = 1
+        self.occupied = 0
+        self.x_bits = 0
+        self.o_bits = 0
+        self.empty_count = self.num_cells
+        self.winner = None
+        # Pile des coups (row, col, player, gagnant avant le coup)
+        self.move_stack = []
+        return self.grid.copy()
+
+    def get_state(self) -> np.ndarray:
+        """
+        Retourne l'état actuel du plateau.
+
+        Returns:
+            np.ndarray: Copie de la grille actuelle
+        """
+        return self.grid.copy()
+
+    def get_available_actions(self) -> List[Tuple[int, int]]:
+        """
+        Retourne la liste des coups valides (cases vides), lue dans le bitset.
+
+        Returns:
+            List[Tuple[int, int]]: Liste des positions (row, col) disponibles
+        """
+        return [divmod(idx, self.width) for idx in self.get_available_actions_flat()]
+
+    def get_available_actions_flat(self) -> List[int]:
+        """
+        Retourne les coups valides sous forme d'indices row * width + col.
+
+        Returns:
+            List[int]: Indices des cases vides, croissants
+        """
+        actions = []
+        free = self.full_mask & ~self.occupied
+        while free:
+            low = free & -free
+            actions.append(low.bit_length() - 1)
+            free ^= low
+        return actions
+
+    def get_bits(self) -> Tuple[int, int]:
+        """
+        Retourne la position sous forme de bitsets.
+
+        Returns:
+            Tuple[int, int]: (x_bits, o_bits)
+        """
+        return self.x_bits, self.o_bits
+
+    def is_valid_action(self, row: int, col: int) -> bool:
+        """
+        Vérifie si un coup est valide.
+
+        Args:
+            row: Ligne (0 à height - 1)
+            col: Colonne (0 à width - 1)
+
+        Returns:
+            bool: True si le coup est valide
+        """
+        if not (0 <= row < self.height and 0 <= col < self.width):
+            return False
+        return not (self.occupied >> (row * self.width + col)) & 1
+
+    def make_move(self, row: int, col: int, player: Optional[int] = None) -> bool:
+        """
+        Effectue un coup et met à jour le gagnant en O(k).
+
+        Args:
+            row: Ligne
+            col: Colonne
+            player: Joueur (1 ou -1), utilise current_player si None
+
+        Returns:
+            bool: True si le coup a été effectué, False sinon
+        """
+        if not self.is_valid_action(row, col):
+            return False
+
+        if player is None:
+            player = self.current_player
+
+        idx = row * self.width + col
+        self.grid[row, col] = player
+        self.cells[idx] = player
+        self.occupied |= 1 << idx
+        if player == 1:
+            self.x_bits |= 1 << idx
+        else:
+            self.o_bits |= 1 << idx
+        self.empty_count -= 1
+        self.move_stack.append((row, col, player, self.winner))
+
+        # Le premier alignement décide de la partie
+        if self.winner is None and self._wins_at(row, col, player):
+            self.winner = player
+
+        self.current_player = -self.current_player  # Change de joueur
+        return True
+
+    def undo_move(self) -> Optional[Tuple[int, int]]:
+        """
+        Annule le dernier coup joué avec make_move.
+
+        Returns:
+            Optional[Tuple[int, int]]: Position (row, col) libérée, None si
+            aucun coup à annuler
+        """
+        if not self.move_stack:
+            return None
+
+        row, col, player, previous_winner = self.move_stack.pop()
+        idx = row * self.width + col
+        self.grid[row, col] = 0
+        self.cells[idx] = 0
+        self.occupied &= ~(1 << idx)
+        if player == 1:
+            self.x_bits &= ~(1 << idx)
+        else:
+            self.o_bits &= ~(1 << idx)
+        self.empty_count += 1
+        self.winner = previous_winner
+        self.current_player = -self.current_player
+        return row, col
+
+    def _wins_at(self, row: int, col: int, player: int) -> bool:
+        """
+        Vérifie si le pion de player en (row, col) fait partie d'un
+        alignement de k (au plus 2(k-1) cases lues par direction).
+        """
+        cells, width, height, k = self.cells, self.width, self.height, self.k
+        for dr, dc in DIRECTIONS:
+            count = 1
+            r, c = row + dr, col + dc
+            while count < k and 0 <= r < height and 0 <= c < width and cells[r * width + c] == player:
+                count += 1
+                r += dr
+                c += dc
+            r, c = row - dr, col - dc
+            while count < k and 0 <= r < height and 0 <= c < width and cells[r * width + c] == player:
+                count += 1
+                r -= dr
+                c -= dc
+            if count >= k:
+                return True
+        return False
+
+    def last_move_won(self) -> bool:
+        """
+        Vérifie si le dernier coup a complété un alignement de k.
+
+        Returns:
+            bool: True si le dernier coup est gagnant
+        """
+        if not self.move_stack:
+            return False
+        row, col, player, _ = self.move_stack[-1]
+        return self._wins_at(row, col, player)
+
+    def is_full(self) -> bool:
+        """
+        Vérifie si toutes les cases sont occupées.
+
+        Returns:
+            bool: True si le plateau est plein
+        """
+        return self.empty_count == 0
+
+    def __str__(self) -> str:
+        """
+        Représentation en chaîne du plateau pour debug/console.
+
+        Returns:
+            str: Affichage formaté du plateau
+        """
+        symbols = {0: '.', 1: 'X', -1: 'O'}
+        pad = len(str(self.height - 1))
+        lines = [" " * (pad + 1) + " ".join(str(c % 10) for c in range(self.width))]
+        for i, row in enumerate(self.grid):
+            lines.append(f"{i:>{pad}} " + " ".join(symbols[cell] for cell in row))
+        return "\n".join(lines)
+
+    def to_string_simple(self) -> str:
+        """
+        Version compacte pour affichage.
+
+        Returns:
+            str: Représentation simple du plateau
+        """
+        symbols = {0: '.', 1: 'X', -1: 'O'}
+        return '\n'.join(''.join(symbols[cell] for cell in row) for row in self.grid)
@@ -0,0 +1,120 @@
+"""
+Règles du jeu m,n,k (voir mnk_board.py)
+Même format de statut que rules.RulesChecker, pour n'importe quelle taille
+de plateau et longueur d'alignement.
+"""
+
+import numpy as np
+from typing import Optional
+
+from mnk_board import MNKBoard
+
+
+class MNKRules:
+    """
+    Vérification de victoire et de match nul pour un plateau width x height
+    avec k pions alignés.
+    """
+
+    def __init__(self, width: int = 3, height: int = 3, k: int = 3):
+        """
+        Args:
+            width: Nombre de colonnes
+            height: Nombre de lignes
+            k: Nombre de pions alignés pour gagner
+        """
+        self.width = width
+        self.height = height
+        self.k = k
+
+    def check_winner(self, grid: np.ndarray) -> Optional[int]:
+        """
+        Vérifie s'il y a un gagnant en parcourant toute la grille (pour une
+        position quelconque; en cours de partie, MNKBoard.winner suffit).
+
+        Args:
+            grid: Plateau height x width
+
+        Returns:
+            int: 1 si X gagne, -1 si O gagne, None si pas de gagnant
+        """
+        grid = np.asarray(grid).reshape(self.height, self.width)
+        k = self.k
+        for player in (1, -1):
+            mine = (grid == player).astype(np.int32)
+            # Somme de k cases consécutives dans chaque direction
+            windows = []
+            if self.width >= k:
+                windows.append(np.lib.stride_tricks.sliding_window_view(mine, k, axis=1).sum(axis=-1))
+            if self.height >= k:
+                windows.append(np.lib.stride_tricks.sliding_window_view(mine, k, axis=0).sum(axis=-1))
+            if self.width >= k and self.height >= k:
+                blocks = np.lib.stride_tricks.sliding_window_view(mine, (k, k))
+                windows.append(np.trace(blocks, axis1=-2, axis2=-1))
+                windows.append(np.trace(blocks[..., ::-1], axis1=-2, axis2=-1))
+            if any((window == k).any() for window in windows):
+                return player
+        return None
+
+    def is_draw(self, grid: np.ndarray) -> bool:
+        """
+        Vérifie si le jeu est un match nul (plateau plein sans gagnant).
+
+        Args:
+            grid: Plateau height x width
+
+        Returns:
+            bool: True si match nul
+        """
+        return not (np.asarray(grid) == 0).any() and self.check_winner(grid) is None
+
+    def is_terminal(self, grid: np.ndarray) -> bool:
+        """
+        Vérifie si le jeu est terminé (victoire ou match nul).
+
+        Args:
+            grid: Plateau height x width
+
+        Returns:
+            bool: True si le jeu est terminé
+        """
+        return self.check_winner(grid) is not None or not (np.asarray(grid) == 0).any()
+
+    def get_game_status(self, grid: np.ndarray) -> dict:
+        """
+        Retourne le statut complet du jeu (parcours de toute la grille).
+
+        Args:
+            grid: Plateau height x width
+
+        Returns:
+            dict: Même format que RulesChecker.get_game_status
+        """
+        winner = self.check_winner(grid)
+        draw = winner is None and not (np.asarray(grid) == 0).any()
+        return {
+            'is_terminal': winner is not None or draw,
+            'winner': winner,
+            'is_draw': draw,
+            'game_over': winner is not None or draw
+        }
+
+    @staticmethod
+    def get_game_status_board(board: MNKBoard) -> dict:
+        """
+        Statut en O(1) à partir des compteurs incrémentaux du plateau.
+
+        Args:
+            board: Plateau tenu à jour par make_move / undo_move
+
+        Returns:
+            dict: Même format que get_game_status
+        """
+        winner = board.winner
+        draw = winner is None and board.empty_count == 0
+        return {
+            'is_terminal': winner is not None or draw,
+            'winner': winner,
+            'is_draw': draw,
+            'game_over': winner is not None or draw
+        }
@@ -0,0 +1,149 @@
+"""
+Versioned binary model format for QLearningAgent (.qtb)
+
+Layout (little-endian):
+    header  64 bytes: magic b"TTTQ", version, header size, number of rows,
+            number of actions, index offset, values offset, CRC32 of the
+            index and values sections
+    index   int32[rows]        base-3 board codes, strictly increasing
+    values  float32[rows, 9]   Q-values, 64-byte aligned so it can be memory-mapped
+
+Reading with mmap=True maps both sections read-only, so every process that
+loads the same file shares one page-cached copy.
+"""
+
+import struct
+import zlib
+from typing import Tuple
+
+import numpy as np
+
+
+MAGIC = b"TTTQ"
+VERSION = 1
+HEADER_SIZE = 64
+NUM_ACTIONS = 9
+
+_HEADER = struct.Struct("<4sHHIIQQI")
+
+
+class ModelFormatError(ValueError):
+    """Raised for files that are not valid .qtb models"""
+
+
+def is_model_file(filename: str) -> bool:
+    with open(filename, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def _align(offset: int, alignment: int = 64) -> int:
+    return (offset + alignment - 1) // alignment * alignment
+
+
+def write_model(filename: str, codes: np.ndarray, values: np.ndarray):
+    """
+    Write a model file.
+
+    Args:
+        codes: (rows,) base-3 codes of the stored states
+        values: (rows, 9) Q-values in the same order
+    """
+    codes = np.asarray(codes, dtype="<i4")
+    values = np.asarray(values, dtype="<f4").reshape(-1, NUM_ACTIONS)
+    if len(codes) != len(values):
+        raise ModelFormatError("index and values have different lengths")
+
+    order = np.argsort(codes, kind="stable")
+    codes = np.ascontiguousarray(codes[order])
+    values = np.ascontiguousarray(values[order])
+    if len(codes) > 1 and not (np.diff(codes) > 0).all():
+        raise ModelFormatError("duplicate state codes")
+
+    index_offset = HEADER_SIZE
+    values_offset = _align(index_offset + codes.nbytes)
+
+    checksum = zlib.crc32(values.tobytes(), zlib.crc32(codes.tobytes()))
+    header = _HEADER.pack(MAGIC, VERSION, HEADER_SIZE, len(codes), NUM_ACTIONS,
+                          index_offset, values_offset, checksum)
+
+    with open(filename, "wb") as f:
+        f.write(header.ljust(HEADER_SIZE, b"\0"))
+        f.write(codes.tobytes())
+        f.write(b"\0" * (values_offset - index_offset - codes.nbytes))
+        f.write(values.tobytes())
+
+
+def read_model(filename: str, mmap: bool = True,
+               verify: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Read a model file.
+
+    Args:
+        mmap: Map the sections read-only instead of reading them into memory
+        verify: Check the CRC32 checksum
+
+    Returns:
+        (codes, values) arrays
+
+    Raises:
+        ModelFormatError: bad magic, unsupported version, truncated file or bad checksum
+    """
+    with open(filename, "rb") as f:
+        raw_header = f.read(HEADER_SIZE)
+
+    if len(raw_header) < _HEADER.size:
+        raise ModelFormatError(f"{filename}: truncated header")
+
+    (magic, version, header_size, rows, num_actions,
+     index_offset, values_offset, checksum) = _HEADER.unpack_from(raw_header)
+
+    if magic != MAGIC:
+        raise ModelFormatError(f"{filename}: not a .qtb model")
+    if version != VERSION:
+        raise ModelFormatError(f"{filename}: unsupported version {version}")
+    if num_actions != NUM_ACTIONS:
+        raise ModelFormatError(f"{filename}: expected {NUM_ACTIONS} actions, got {num_actions}")
+
+    try:
+        if mmap:
+            codes = np.memmap(filename, dtype="<i4", mode="r",
+                              offset=index_offset, shape=(rows,)) if rows else np.zeros(0, "<i4")
+            values = np.memmap(filename, dtype="<f4", mode="r", offset=values_offset,
+                               shape=(rows, num_actions)) if rows else np.zeros((0, num_actions), "<f4")
+        else:
+            with open(filename, "rb") as f:
+                f.seek(index_offset)
+                codes = np.frombuffer(f.read(rows * 4), dtype="<i4")
+                f.seek(values_offset)
+                values = np.frombuffer(f.read(rows * num_actions * 4),
+                                       dtype="<f4").reshape(rows, num_actions)
+            if len(codes) != rows or len(values) != rows:
+                raise ValueError
+    except ValueError:
+        raise ModelFormatError(f"{filename}: truncated file")
+
+    if verify and zlib.crc32(values.tobytes(), zlib.crc32(codes.tobytes())) != checksum:
+        raise ModelFormatError(f"{filename}: checksum mismatch")
+
+    return codes, values
+
+
+def convert_pickle(pickle_file: str, model_file: str):
+    """Convert a pickled QLearningAgent table (dict or dense) to a .qtb file"""
+    from qlearning_agent import QLearningAgent
+
+    agent = QLearningAgent(player=1, dense=True)
+    agent.load(pickle_file)
+    agent.save(model_file)
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) != 3:
+        print("Usage: python model_format.py <trained_agent.pkl> <trained_agent.qtb>")
+        sys.exit(1)
+
+    convert_pickle(sys.argv[1], sys.argv[2])
+    codes, _ = read_model(sys.argv[2])
+    print(f"Wrote {sys.argv[2]}: {len(codes)} states")
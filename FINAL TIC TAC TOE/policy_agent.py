@@ -0,0 +1,178 @@
+"""
+Precompiled greedy policy for serving
+A trained agent is compiled into one byte per base-3 board code (3^9 = 19,683
+entries); PolicyAgent answers choose_action with a single table lookup
+"""
+
+import struct
+import zlib
+from typing import List
+
+import numpy as np
+
+from state_graph import load_state_graph, decode, NUM_CODES, POW3, BALANCED_OFFSET, STATUS_ONGOING
+from search_agent import SearchAgent, MOVE_ORDER
+
+
+NO_MOVE = 255
+
+MAGIC = b"TTTP"
+VERSION = 1
+_HEADER = struct.Struct("<4sHHII")
+
+
+def _all_boards() -> np.ndarray:
+    """(19683, 9) boards of every base-3 code, decoded in one pass"""
+    return decode(np.arange(NUM_CODES)[:, None])
+
+
+def _first_in_order(candidates) -> int:
+    for action in MOVE_ORDER:
+        if action in candidates:
+            return action
+    return NO_MOVE
+
+
+def compile_policy(agent, fallback: str = "search") -> np.ndarray:
+    """
+    Greedy policy of a QLearningAgent for every board code.
+
+    Ties between equal Q-values go to the first action in MOVE_ORDER
+    (center, corners, edges). States the agent never stored get the
+    fallback: "search" (perfect play) or "order" (first empty cell in
+    MOVE_ORDER). Unreachable codes with empty cells use "order"; full
+    boards get NO_MOVE.
+
+    Returns:
+        np.ndarray: (19683,) uint8 table indexed by base-3 code
+    """
+    graph = load_state_graph()
+    table = np.full(NUM_CODES, NO_MOVE, dtype=np.uint8)
+
+    # Every code: first empty cell in MOVE_ORDER
+    empty = _all_boards()[:, MOVE_ORDER] == 0
+    first = np.array(MOVE_ORDER)[np.argmax(empty, axis=1)]
+    table[:] = np.where(empty.any(axis=1), first, NO_MOVE)
+
+    # Reachable, non-terminal positions: greedy action of the agent
+    ids = np.flatnonzero(graph.status == STATUS_ONGOING)
+    states = graph.boards[ids].astype(int)
+    q_values = agent.q_values_batch(states)
+    solver = SearchAgent() if fallback == "search" else None
+
+    for state_id, state, q_row in zip(ids, states, q_values):
+        valid_actions = np.flatnonzero(state == 0).tolist()
+        key = agent.state_to_key(state)
+        seen = agent.visits[key] > 0 if agent.dense else key in agent.q_table
+
+        if seen:
+            best = max(q_row[a] for a in valid_actions)
+            action = _first_in_order([a for a in valid_actions if q_row[a] == best])
+        elif solver is not None:
+            action = solver.choose_action(state, valid_actions, training=False)
+        else:
+            action = _first_in_order(valid_actions)
+
+        table[graph.codes[state_id]] = action
+
+    return table
+
+
+def save_policy(filename: str, table: np.ndarray):
+    table = np.asarray(table, dtype=np.uint8)
+    header = _HEADER.pack(MAGIC, VERSION, _HEADER.size, len(table), zlib.crc32(table.tobytes()))
+    with open(filename, "wb") as f:
+        f.write(header)
+        f.write(table.tobytes())
+
+
+def load_policy(filename: str) -> np.ndarray:
+    with open(filename, "rb") as f:
+        data = f.read()
+
+    magic, version, header_size, entries, checksum = _HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{filename}: not a version {VERSION} policy file")
+
+    table = np.frombuffer(data, dtype=np.uint8, count=entries, offset=header_size)
+    if entries != NUM_CODES or zlib.crc32(table.tobytes()) != checksum:
+        raise ValueError(f"{filename}: corrupted policy file")
+    return table
+
+
+class PolicyAgent:
+    """Serves a compiled policy table (flat states and actions 0-8)"""
+
+    def __init__(self, table: np.ndarray):
+        # Re-index by the balanced code dot(POW3, state) + offset so a lookup
+        # is one dot product, without state % 3
+        balanced = _all_boards() @ POW3 + BALANCED_OFFSET
+        by_balanced = np.empty(NUM_CODES, dtype=np.uint8)
+        by_balanced[balanced] = table
+        self.table = np.asarray(table, dtype=np.uint8)
+        self._by_balanced = by_balanced
+        self._actions = by_balanced.tolist()
+
+        self.lookups = 0
+        self.fallbacks = 0
+
+    @classmethod
+    def from_file(cls, filename: str) -> 'PolicyAgent':
+        return cls(load_policy(filename))
+
+    def choose_action(self, state: np.ndarray,
+                      valid_actions: List[int],
+                      training: bool = True) -> int:
+
+        if not valid_actions:
+            return None
+
+        self.lookups += 1
+        action = self._actions[int(state.dot(POW3)) + BALANCED_OFFSET]
+        if action not in valid_actions:
+            self.fallbacks += 1
+            return valid_actions[0]
+        return action
+
+    def choose_action_batch(self, states: np.ndarray,
+                            valid_mask: np.ndarray) -> np.ndarray:
+        """Table lookups for (B, 9) states; -1 where no action is valid"""
+        states = np.asarray(states).reshape(-1, 9)
+        valid_mask = np.asarray(valid_mask, dtype=bool).reshape(-1, 9)
+
+        actions = self._by_balanced[states.astype(np.int64) @ POW3 + BALANCED_OFFSET].astype(np.intp)
+        self.lookups += len(actions)
+
+        # Invalid table entries fall back to the first valid cell, like choose_action
+        ok = actions != NO_MOVE
+        ok[ok] = valid_mask[np.flatnonzero(ok), actions[ok]]
+        first_valid = np.where(valid_mask.any(axis=1), np.argmax(valid_mask, axis=1), -1)
+        self.fallbacks += int((~ok & valid_mask.any(axis=1)).sum())
+        return np.where(ok, actions, first_valid)
+
+    def record_move(self, state, action):
+        pass
+
+    def learn(self, reward):
+        pass
+
+    def get_stats(self):
+        return {
+            "lookups": self.lookups,
+            "fallbacks": self.fallbacks,
+            "table_bytes": self.table.nbytes
+        }
+
+
+if __name__ == "__main__":
+    import sys
+    from qlearning_agent import QLearningAgent
+
+    if len(sys.argv) != 3:
+        print("Usage: python policy_agent.py <trained_agent.qtb|.pkl> <policy.bin>")
+        sys.exit(1)
+
+    trained = QLearningAgent(player=-1, dense=True)
+    trained.load(sys.argv[1])
+    save_policy(sys.argv[2], compile_policy(trained))
+    print(f"Wrote {sys.argv[2]}")
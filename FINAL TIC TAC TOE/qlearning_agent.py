@@ -8,21 +8,55 @@ import random
 import pickle
 from typing import Dict, List
 
+from state_graph import load_state_graph, POW3, BALANCED_OFFSET, encode, decode
+import model_format
+import metrics
+from symmetry import load_symmetry_tables
+
 
 class QLearningAgent:
     def __init__(self, player: int,
                  epsilon: float = 0.1,
                  alpha: float = 0.5,
-                 gamma: float = 0.9):
+                 gamma: float = 0.9,
+                 dense: bool = False,
+                 symmetric: bool = False,
+                 num_actions: int = 9):
 
         self.player = player  # 1 or -1
         self.epsilon = epsilon
         self.alpha = alpha
         self.gamma = gamma
+        self.dense = dense
+        self.symmetric = symmetric
+        # Cells of the board (width * height for an m,n,k environment);
+        # the dense and symmetric backends only exist for 3x3
+        self.num_actions = num_actions
+        if num_actions != 9 and (dense or symmetric):
+            raise ValueError("dense and symmetric tables require a 3x3 board")
 
         # Q-table: state_key -> action_values[9]
         self.q_table: Dict[str, np.ndarray] = {}
 
+        # Dense backend: one (num_states, 9) float32 matrix indexed by the
+        # state-graph id of the board, plus a per-state visit counter
+        self.graph = None
+        self.q_values = None
+        self.visits = None
+        if dense or symmetric:
+            self.graph = load_state_graph()
+        if dense:
+            self.q_values = np.zeros((self.graph.num_states, 9), dtype=np.float32)
+            self.visits = np.zeros(self.graph.num_states, dtype=np.int32)
+
+        # Symmetric mode: the 8 rotations/reflections of a board share one
+        # entry, stored under the canonical board and in canonical coordinates
+        # (equivalent moves of a self-symmetric board share one cell)
+        self.symmetry = load_symmetry_tables() if symmetric else None
+
+        # Table key of every state-graph id (dict backend, offline learning)
+        self._id_keys = None
+
         # history for learning
         self.state_history = []
         self.action_history = []
@@ -30,13 +64,38 @@ class QLearningAgent:
     # ---------- STATE HANDLING ----------
 
     def state_to_key(self, state: np.ndarray) -> str:
-        """Convert state array to string key"""
-        return state.astype(int).tobytes()
+        """Convert state array to string key (integer state id if dense)"""
+        return self._key_and_perm(state)[0]
+
+    def _key_and_perm(self, state: np.ndarray):
+        """
+        Table key for state, plus the map taking actions on this board to
+        actions on the stored board (None when not symmetric).
+        The key is None for a board outside the state graph (dense tables)
+        """
+        if self.symmetric:
+            state_id = self.graph.fast_id(state)
+            if state_id < 0:
+                # Outside the state graph: no symmetry class, plain key
+                return (None if self.dense else state.astype(int).tobytes()), None
+            canonical_id = self.symmetry.canonical_id_list[state_id]
+            perm = self.symmetry.action_map_list[state_id]
+            if self.dense:
+                return canonical_id, perm
+            return self.graph.boards[canonical_id].astype(int).tobytes(), perm
+        if self.dense:
+            state_id = self.graph.fast_id(state)
+            return (state_id if state_id >= 0 else None), None
+        return state.astype(int).tobytes(), None
 
     def get_q_values(self, state_key: str) -> np.ndarray:
-        """Return Q-values for state (initialize if new)"""
+        """Return Q-values for state (initialize if new; zeros for an unknown dense key)"""
+        if self.dense:
+            if state_key is None:
+                return np.zeros(9, dtype=np.float32)
+            return self.q_values[state_key]
         if state_key not in self.q_table:
-            self.q_table[state_key] = np.zeros(9)
+            self.q_table[state_key] = np.zeros(self.num_actions)
         return self.q_table[state_key]
 
     # ---------- ACTION SELECTION ----------
@@ -48,29 +107,139 @@ class QLearningAgent:
         if not valid_actions:
             return None
 
-        state_key = self.state_to_key(state)
+        timed = metrics.ENABLED
+        if timed:
+            start = metrics.perf_counter()
+
+        state_key, perm = self._key_and_perm(state)
         q_values = self.get_q_values(state_key)
 
+        if timed:
+            looked_up = metrics.perf_counter()
+            metrics.observe("agent_seconds", looked_up - start, op="choose_action", phase="lookup")
+
         # --- Exploration ---
         if training and random.random() < self.epsilon:
+            if timed:
+                metrics.inc("agent_explorations_total")
             return random.choice(valid_actions)
 
         # --- Exploitation ---
-        valid_q = [(a, q_values[a]) for a in valid_actions]
+        q_list = q_values.tolist()
+        if perm is None:
+            valid_q = [(a, q_list[a]) for a in valid_actions]
+        else:
+            valid_q = [(a, q_list[perm[a]]) for a in valid_actions]
         max_q = max(valid_q, key=lambda x: x[1])[1]
 
         best_actions = [a for a, q in valid_q if q == max_q]
-        return random.choice(best_actions)
+        action = random.choice(best_actions)
+
+        if timed:
+            metrics.observe("agent_seconds", metrics.perf_counter() - looked_up,
+                            op="choose_action", phase="select")
+        return action
+
+    # ---------- BATCHED INFERENCE ----------
+
+    def q_values_batch(self, states: np.ndarray) -> np.ndarray:
+        """
+        Q-values of many flat states at once, in real (not canonical)
+        action coordinates. Unseen states get zeros; the table is not modified.
+
+        Args:
+            states: (B, 9) boards
+
+        Returns:
+            np.ndarray: (B, 9) float array
+        """
+        states = np.asarray(states).reshape(-1, self.num_actions)
+
+        if self.dense or self.symmetric:
+            ids = self.graph.balanced_to_id[states.astype(np.int64) @ POW3 + BALANCED_OFFSET].astype(np.intp)
+            known = ids >= 0
+            ids = np.where(known, ids, 0)
+            perms = None
+            if self.symmetric:
+                perms = self.symmetry.action_map[ids]
+                ids = self.symmetry.canonical_id[ids].astype(np.intp)
+
+            if self.dense:
+                q = self.q_values[ids].astype(float)
+            else:
+                zeros = np.zeros(9)
+                boards = self.graph.boards
+                q = np.array([self.q_table.get(boards[i].astype(int).tobytes(), zeros)
+                              for i in ids.tolist()], dtype=float).reshape(-1, 9)
+
+            if perms is not None:
+                q = np.take_along_axis(q, perms, axis=1)
+            q[~known] = 0.0
+            return q
+
+        zeros = np.zeros(self.num_actions)
+        rows = [self.q_table.get(state.astype(int).tobytes(), zeros) for state in states]
+        return np.array(rows, dtype=float).reshape(-1, self.num_actions)
+
+    def choose_action_batch(self, states: np.ndarray,
+                            valid_mask: np.ndarray,
+                            q_values: np.ndarray = None,
+                            epsilon: float = 0.0) -> np.ndarray:
+        """
+        Greedy actions (training=False) for many states in one lookup,
+        breaking ties at random like choose_action.
+
+        Args:
+            states: (B, 9) boards
+            valid_mask: (B, 9) bool, True for playable cells
+            q_values: (B, 9) result of q_values_batch(states), if already computed
+            epsilon: probability of a uniformly random valid action per row
+
+        Returns:
+            np.ndarray: (B,) actions, -1 where no action is valid
+        """
+        valid_mask = np.asarray(valid_mask, dtype=bool).reshape(-1, self.num_actions)
+        if q_values is None:
+            q_values = self.q_values_batch(states)
+        q = np.where(valid_mask, q_values, -np.inf)
+
+        best = q == q.max(axis=1, keepdims=True)
+        best &= valid_mask
+        noise = np.random.random(best.shape)
+        actions = np.argmax(np.where(best, noise, -1.0), axis=1)
+
+        if epsilon > 0:
+            explore = np.random.random(len(actions)) < epsilon
+            if explore.any():
+                noise = np.random.random((int(explore.sum()), valid_mask.shape[1]))
+                actions[explore] = np.argmax(np.where(valid_mask[explore], noise, -1.0), axis=1)
+
+        return np.where(valid_mask.any(axis=1), actions, -1)
 
     # ---------- LEARNING ----------
 
+    def _check_writable(self):
+        """Refuse to train on a table mapped read-only by load(mmap=True)"""
+        if self.dense and not self.q_values.flags.writeable:
+            raise ValueError("Q-values are memory-mapped read-only; "
+                             "load the model with mmap=False to train it")
+
     def record_move(self, state: np.ndarray, action: int):
-        state_key = self.state_to_key(state)
+        state_key, perm = self._key_and_perm(state)
+        if state_key is None:
+            raise ValueError("board is not a reachable tic-tac-toe position")
+        if self.dense:
+            self.visits[state_key] += 1
         self.state_history.append(state_key)
-        self.action_history.append(action)
+        self.action_history.append(action if perm is None else perm[action])
 
     def learn(self, reward: float):
         """Temporal-difference update backward through episode"""
+        self._check_writable()
+
+        timed = metrics.ENABLED
+        if timed:
+            start = metrics.perf_counter()
 
         target = reward
 
@@ -86,24 +255,245 @@ class QLearningAgent:
 
             target = self.gamma * new_q
 
+        if timed:
+            metrics.observe("agent_seconds", metrics.perf_counter() - start, op="learn", phase="td_update")
+
         self.state_history.clear()
         self.action_history.clear()
 
+    def learn_batch(self, state_ids: np.ndarray, actions: np.ndarray,
+                    rewards: np.ndarray, lengths: np.ndarray = None):
+        """
+        learn() for many finished episodes at once (dense backend).
+
+        The backward TD chain runs for all episodes together, one move from
+        the end at a time. When several episodes update the same
+        (state, action) in the same step, their updates are composed in
+        episode order exactly as consecutive learn() calls would, with a
+        segmented scan over the sorted keys. Only pairs shared at
+        different distances from the end are ordered differently from
+        sequential learn() (by distance, then episode).
+
+        Args:
+            state_ids: (E, T) state-graph ids where this agent moved,
+                       padded after each episode's length
+            actions: (E, T) actions played, in real board coordinates
+            rewards: (E,) final reward of each episode
+            lengths: (E,) number of moves of each episode (default T)
+        """
+        if not self.dense:
+            raise ValueError("learn_batch requires the dense backend")
+        self._check_writable()
+
+        rewards = np.asarray(rewards, dtype=np.float64)
+        if len(rewards) == 0:
+            return
+        state_ids = np.asarray(state_ids, dtype=np.intp).reshape(len(rewards), -1)
+        actions = np.asarray(actions, dtype=np.intp).reshape(state_ids.shape)
+        num_episodes, max_length = state_ids.shape
+        if lengths is None:
+            lengths = np.full(num_episodes, max_length)
+        lengths = np.asarray(lengths, dtype=np.intp)
+
+        moved = np.arange(max_length) < lengths[:, None]
+        state_ids = np.where(moved, state_ids, 0)
+        actions = np.where(moved, actions, 0)
+        if self.symmetric:
+            perms = self.symmetry.action_map[state_ids]
+            actions = np.take_along_axis(perms, actions[..., None], axis=2)[..., 0]
+            state_ids = self.symmetry.canonical_id[state_ids].astype(np.intp)
+
+        np.add.at(self.visits, state_ids[moved], 1)
+
+        q_flat = self.q_values.reshape(-1)
+        keep = 1.0 - self.alpha
+        targets = rewards.copy()
+
+        for back in range(1, max_length + 1):
+            column = lengths - back
+            rows = np.flatnonzero(column >= 0)
+            if not len(rows):
+                break
+
+            keys = state_ids[rows, column[rows]] * 9 + actions[rows, column[rows]]
+            order = np.argsort(keys, kind="stable")
+            keys = keys[order]
+            starts = np.empty(len(keys), dtype=bool)
+            starts[0] = True
+            starts[1:] = keys[1:] != keys[:-1]
+
+            # Sequential updates q <- keep * q + alpha * target, as the
+            # recurrence x_i = A_i * x_(i-1) + b_i (A_i = 0 starts a key)
+            b = self.alpha * targets[rows][order]
+            b[starts] += keep * q_flat[keys[starts]]
+            a = np.where(starts, 0.0, keep)
+            step = 1
+            while step < len(keys):
+                b[step:] = b[step:] + a[step:] * b[:-step]
+                a[step:] = a[step:] * a[:-step]
+                step *= 2
+
+            ends = np.empty(len(keys), dtype=bool)
+            ends[-1] = True
+            ends[:-1] = starts[1:]
+            q_flat[keys[ends]] = b[ends]
+
+            new_q = np.empty(len(keys))
+            new_q[order] = b
+            targets[rows] = self.gamma * new_q
+
+    # ---------- OFFLINE LEARNING ----------
+
+    def _key_and_perm_id(self, state_id: int):
+        """_key_and_perm for a state-graph id, without building the board"""
+        if self.symmetric:
+            canonical_id = self.symmetry.canonical_id_list[state_id]
+            perm = self.symmetry.action_map_list[state_id]
+            if self.dense:
+                return canonical_id, perm
+            return self._id_keys[canonical_id], perm
+        if self.dense:
+            return state_id, None
+        return self._id_keys[state_id], None
+
+    def learn_from_games(self, games) -> int:
+        """
+        Offline learning from recorded 3x3 games, e.g. the batches of
+        trajectory_log.read_batches: the same updates as if this agent had
+        played its side of every game (learn_from_winner rewards).
+
+        Args:
+            games: iterable of (moves, winner) pairs, or of lists of them
+
+        Returns:
+            int: number of games learned from
+        """
+        if self.num_actions != 9:
+            raise ValueError("learn_from_games replays 3x3 games only")
+        self._check_writable()
+        if self.graph is None:
+            self.graph = load_state_graph()
+        if not self.dense and self._id_keys is None:
+            self._id_keys = [board.astype(int).tobytes() for board in self.graph.boards]
+        next_state = self.graph.next_state_list
+
+        count = 0
+        for item in games:
+            batch = item if isinstance(item, list) else (item,)
+            for moves, winner in batch:
+                state_id = 0
+                player = 1
+                for action in moves:
+                    if player == self.player:
+                        state_key, perm = self._key_and_perm_id(state_id)
+                        if self.dense:
+                            self.visits[state_key] += 1
+                        self.state_history.append(state_key)
+                        self.action_history.append(action if perm is None else perm[action])
+                    state_id = next_state[state_id][action]
+                    if state_id < 0:
+                        raise ValueError(f"illegal move {action} in a recorded game")
+                    player = -player
+
+                self.learn(self.player * (winner or 0))
+                count += 1
+
+        return count
+
     # ---------- SAVE / LOAD ----------
 
     def save(self, filename: str):
+        """Pickle by default; the binary .qtb format if filename ends with .qtb"""
+        if filename.endswith(".qtb"):
+            self._save_model(filename)
+            return
+
+        if self.dense:
+            data = {"format": "dense",
+                    "q_values": self.q_values,
+                    "visits": self.visits}
+        else:
+            data = self.q_table
         with open(filename, "wb") as f:
-            pickle.dump(self.q_table, f)
+            pickle.dump(data, f)
+
+    def _save_model(self, filename: str):
+        if self.dense:
+            # Every graph row, so a dense load can map the file without copying
+            codes, values = self.graph.codes, self.q_values
+        else:
+            codes = np.array([encode(np.frombuffer(key, dtype=int)) for key in self.q_table],
+                             dtype=np.int64)
+            values = np.array(list(self.q_table.values())).reshape(-1, 9)
+        model_format.write_model(filename, codes, values)
+
+    def load(self, filename: str, mmap: bool = False):
+        """
+        Load either file format into the current backend.
+
+        With a .qtb file and mmap=True, a dense agent uses the file's value
+        matrix directly (read-only, shared between processes): suitable for
+        serving, not for further training.
+        """
+        if model_format.is_model_file(filename):
+            self._load_model(filename, mmap)
+            return
 
-    def load(self, filename: str):
         with open(filename, "rb") as f:
-            self.q_table = pickle.load(f)
+            data = pickle.load(f)
+
+        is_dense_file = data.get("format") == "dense"
+
+        if self.dense and is_dense_file:
+            self.q_values = data["q_values"]
+            self.visits = data["visits"]
+        elif self.dense:
+            self.q_values[:] = 0
+            self.visits[:] = 0
+            for state_key, values in data.items():
+                state = np.frombuffer(state_key, dtype=int)
+                state_id = self.graph.fast_id(state)
+                if state_id >= 0:
+                    self.q_values[state_id] = values
+                    self.visits[state_id] = 1
+        elif is_dense_file:
+            graph = load_state_graph()
+            self.q_table = {
+                graph.boards[state_id].astype(int).tobytes(): data["q_values"][state_id].astype(float)
+                for state_id in np.flatnonzero(data["visits"])
+            }
+        else:
+            self.q_table = data
+
+    def _load_model(self, filename: str, mmap: bool):
+        codes, values = model_format.read_model(filename, mmap=mmap)
+
+        if self.dense:
+            if np.array_equal(codes, self.graph.codes):
+                self.q_values = values if mmap else values.copy()
+            else:
+                ids = self.graph.code_to_id[codes].astype(np.intp)
+                known = ids >= 0
+                self.q_values = np.zeros((self.graph.num_states, 9), dtype=np.float32)
+                self.q_values[ids[known]] = values[known]
+            self.visits = np.any(self.q_values != 0, axis=1).astype(np.int32)
+        else:
+            self.q_table = {
+                decode(int(code)).tobytes(): row.astype(float)
+                for code, row in zip(codes, values) if row.any()
+            }
 
     # ---------- STATS ----------
 
     def get_stats(self):
+        if self.dense:
+            states_learned = int(np.count_nonzero(self.visits))
+        else:
+            states_learned = len(self.q_table)
+
         return {
-            "states_learned": len(self.q_table),
+            "states_learned": states_learned,
+            "symmetric": self.symmetric,
             "epsilon": self.epsilon,
             "alpha": self.alpha,
             "gamma": self.gamma
@@ -6,6 +6,8 @@ Responsable: INES
 import numpy as np
 from typing import Optional
 
+import bitboard
+
 
 class RulesChecker:
     """
@@ -23,28 +25,7 @@ class RulesChecker:
         Returns:
             int: 1 si X gagne, -1 si O gagne, None si pas de gagnant
         """
-        # Vérifier les lignes
-        for row in grid:
-            if abs(sum(row)) == 3:
-                return int(row[0])
-        
-        # Vérifier les colonnes
-        for col in range(3):
-            column_sum = sum(grid[:, col])
-            if abs(column_sum) == 3:
-                return int(grid[0, col])
-        
-        # Vérifier diagonale principale (\)
-        diag_main = sum([grid[i, i] for i in range(3)])
-        if abs(diag_main) == 3:
-            return int(grid[0, 0])
-        
-        # Vérifier diagonale secondaire (/)
-        diag_sec = sum([grid[i, 2-i] for i in range(3)])
-        if abs(diag_sec) == 3:
-            return int(grid[0, 2])
-        
-        return None
+        return bitboard.winner(*bitboard.from_grid(grid))
     
     @staticmethod
     def is_draw(grid: np.ndarray) -> bool:
@@ -58,7 +39,7 @@ class RulesChecker:
             bool: True si match nul
         """
         # Match nul = pas de case vide ET pas de gagnant
-        return not np.any(grid == 0) and RulesChecker.check_winner(grid) is None
+        return bitboard.is_draw(*bitboard.from_grid(grid))
     
     @staticmethod
     def is_terminal(grid: np.ndarray) -> bool:
@@ -71,7 +52,9 @@ class RulesChecker:
         Returns:
             bool: True si le jeu est terminé
         """
-        return RulesChecker.check_winner(grid) is not None or RulesChecker.is_draw(grid)
+        x_bits, o_bits = bitboard.from_grid(grid)
+        return (bitboard.winner(x_bits, o_bits) is not None
+                or bitboard.is_full(x_bits, o_bits))
     
     @staticmethod
     def get_game_status(grid: np.ndarray) -> dict:
@@ -84,13 +67,19 @@ class RulesChecker:
         Returns:
             dict: Dictionnaire avec les informations de statut
         """
-        winner = RulesChecker.check_winner(grid)
-        is_draw = RulesChecker.is_draw(grid)
-        is_terminal = winner is not None or is_draw
+        # Une seule conversion et une seule recherche de gagnant
+        return bitboard.game_status(*bitboard.from_grid(grid))
+    
+    @staticmethod
+    def get_game_status_bits(x_bits: int, o_bits: int) -> dict:
+        """
+        Statut du jeu directement à partir des bitboards (sans lire la grille).
         
-        return {
-            'is_terminal': is_terminal,
-            'winner': winner,
-            'is_draw': is_draw,
-            'game_over': is_terminal
-        }
+        Args:
+            x_bits: Cases de X (9 bits)
+            o_bits: Cases de O (9 bits)
+            
+        Returns:
+            dict: Même format que get_game_status
+        """
+        return bitboard.game_status(x_bits, o_bits)
@@ -0,0 +1,153 @@
+"""
+Search Agent compatible with TicTacToeEnvironment
+Perfect play with negamax, alpha-beta pruning and a transposition table
+"""
+
+import numpy as np
+from typing import Dict, List, Tuple
+
+import bitboard
+from bitboard import WIN_TABLE, FULL_MASK
+
+
+# Transposition table flags
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+INF = 100
+
+# Static move ordering: center, corners, edges
+MOVE_ORDER = (4, 0, 2, 6, 8, 1, 3, 5, 7)
+
+
+class SearchAgent:
+    """
+    Plays provably optimal moves (flat states and actions 0-8).
+
+    Scores are from the side to move: a win scores 1 + the number of empty
+    cells left, so faster wins and slower losses are preferred; a draw is 0.
+    The transposition table is keyed by the packed bitboards of the side to
+    move and its opponent (me | opp << 9), a perfect 18-bit hash, and is
+    kept across calls and games.
+    """
+
+    def __init__(self, player: int = -1):
+        self.player = player  # kept for interface symmetry; side to move is read from the board
+
+        # key -> (value, flag, best_move)
+        self.tt: Dict[int, Tuple[int, int, int]] = {}
+
+        self.nodes = 0
+        self.tt_probes = 0
+        self.tt_hits = 0
+
+    # ---------- SEARCH ----------
+
+    def _negamax(self, me: int, opp: int, alpha: int, beta: int) -> int:
+        self.nodes += 1
+
+        key = me | (opp << 9)
+        alpha_orig = alpha
+
+        self.tt_probes += 1
+        entry = self.tt.get(key)
+        tt_move = -1
+        if entry is not None:
+            self.tt_hits += 1
+            value, flag, tt_move = entry
+            if flag == EXACT:
+                return value
+            if flag == LOWER:
+                alpha = max(alpha, value)
+            else:
+                beta = min(beta, value)
+            if alpha >= beta:
+                return value
+
+        occupied = me | opp
+        if occupied == FULL_MASK:
+            return 0
+
+        empties = 9 - bin(occupied).count("1")
+
+        best_value = -INF
+        best_move = -1
+
+        # Transposition-table move first, then static order
+        moves = MOVE_ORDER if tt_move < 0 else (tt_move,) + MOVE_ORDER
+        for move in moves:
+            bit = 1 << move
+            if occupied & bit or (move == tt_move and best_move >= 0):
+                continue
+
+            after = me | bit
+            if WIN_TABLE[after]:
+                value = empties  # 1 + (empties - 1) cells left after this move
+            else:
+                value = -self._negamax(opp, after, -beta, -alpha)
+
+            if value > best_value:
+                best_value = value
+                best_move = move
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                break
+
+        if best_value <= alpha_orig:
+            flag = UPPER
+        elif best_value >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.tt[key] = (best_value, flag, best_move)
+
+        return best_value
+
+    def solve(self, state: np.ndarray) -> Tuple[int, int]:
+        """
+        Exact value and best move for the side to move.
+
+        Returns:
+            (value, best_move)
+        """
+        x_bits, o_bits = bitboard.from_grid(state)
+        if bin(x_bits).count("1") == bin(o_bits).count("1"):
+            me, opp = x_bits, o_bits
+        else:
+            me, opp = o_bits, x_bits
+
+        self._negamax(me, opp, -INF, INF)
+        value, _, best_move = self.tt[me | (opp << 9)]
+        return value, best_move
+
+    # ---------- ACTION SELECTION ----------
+
+    def choose_action(self, state: np.ndarray,
+                      valid_actions: List[int],
+                      training: bool = True) -> int:
+
+        if not valid_actions:
+            return None
+
+        _, best_move = self.solve(state)
+        if best_move not in valid_actions:
+            return valid_actions[0]
+        return best_move
+
+    def record_move(self, state, action):
+        pass
+
+    def learn(self, reward):
+        pass
+
+    # ---------- STATS ----------
+
+    def get_stats(self):
+        return {
+            "nodes_searched": self.nodes,
+            "tt_size": len(self.tt),
+            "tt_probes": self.tt_probes,
+            "tt_hits": self.tt_hits,
+            "tt_hit_rate": self.tt_hits / self.tt_probes if self.tt_probes else 0.0
+        }
@@ -1,15 +1,44 @@
 
-from flask import Flask, request, jsonify
+import os
+
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
-from game import TicTacToeEnvironment
-from qlearning_agent import QLearningAgent
+from session_store import GameStore
+from serving import (load_agent, apply_human_move, apply_ai_move, parse_boards, evaluate_boards,
+                     render_metrics, open_trajectory_logger)
+import metrics
 
 app = Flask(__name__)
 CORS(app)   # ⭐ ADD THIS
 
-env = TicTacToeEnvironment()
-agent = QLearningAgent(player=-1)
-agent.load("trained_agent.pkl")  # load your trained model
+# One environment per game, bounded by count and idle time
+games = GameStore(
+    max_games=int(os.environ.get("TICTACTOE_MAX_GAMES", 10000)),
+    ttl=float(os.environ.get("TICTACTOE_GAME_TTL", 1800))
+)
+
+# Set by init(), not at import: importing this module stays cheap
+agent = None
+# Finished games, if TICTACTOE_TRAJECTORY_DIR is set
+trajectories = None
+_initialized = False
+
+
+def init(ai_agent=None):
+    """Load the model (or serve ai_agent) and open the trajectory log"""
+    global agent, trajectories, _initialized
+    agent = ai_agent if ai_agent is not None else load_agent()
+    trajectories = open_trajectory_logger()
+    _initialized = True
+    return agent
+
+
+def get_agent():
+    """The served agent; a WSGI server importing app without init() loads it on first use"""
+    if not _initialized:
+        init()
+    return agent
+
 
 @app.route("/")
 def home():
@@ -17,8 +46,13 @@ def home():
 
 @app.route("/reset", methods=["POST"])
 def reset():
-    state = env.reset()
-    return jsonify(state.flatten().tolist())
+    session = games.create()
+    with session.lock:
+        state = session.env.reset()
+    return jsonify({
+        "game_id": session.game_id,
+        "board": state.flatten().tolist()
+    })
 
 
 @app.route("/move", methods=["POST"])
@@ -27,45 +61,100 @@ def move():
         data = request.json
         human_action = int(data["action"])
 
+        session = games.get(data.get("game_id"))
+        if session is None:
+            return jsonify({"error": "unknown or expired game_id"}), 404
 
-        # ---- Human move ----
-        state, reward, done, info = env.step_flat(human_action)
-
-        if done:
-            return jsonify({
-                "done": True,
-                "winner": env.get_winner(),
-                "board": state.flatten().tolist()
-            })
-
-        # ---- AI move ----
-        valid_actions = env.get_available_actions_flat()
+        with session.lock:
+            return play_turn(session.env, human_action)
 
-        if not valid_actions:
-            return jsonify({
-                "done": True,
-                "winner": env.get_winner(),
-                "board": state.flatten().tolist()
-            })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
-        ai_action = agent.choose_action(
-            state.flatten(),
-            valid_actions,
-            training=False
-        )
 
-        state, reward, done, info = env.step_flat(ai_action)
+@app.route("/move_batch", methods=["POST"])
+def move_batch():
+    try:
+        boards = parse_boards(request.json)
+        return jsonify(evaluate_boards(get_agent(), boards, with_values=False))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except NotImplementedError as e:
+        return jsonify({"error": str(e)}), 501
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
-        return jsonify({
-            "ai_action": ai_action,
-            "done": done,
-            "winner": env.get_winner(),
-            "board": state.flatten().tolist()
-        })
 
+@app.route("/evaluate", methods=["POST"])
+def evaluate():
+    try:
+        boards = parse_boards(request.json)
+        return jsonify(evaluate_boards(get_agent(), boards))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except NotImplementedError as e:
+        return jsonify({"error": str(e)}), 501
     except Exception as e:
         return jsonify({"error": str(e)}), 500
-    
+
+
+@app.route("/games/stats")
+def games_stats():
+    return jsonify(games.get_stats())
+
+
+@app.route("/metrics")
+def metrics_route():
+    return Response(render_metrics(games), mimetype="text/plain; version=0.0.4")
+
+
+def play_turn(env, human_action):
+    """Human move then AI reply on one game's environment"""
+
+    ai = get_agent()
+
+    timed = metrics.ENABLED
+    if timed:
+        start = metrics.perf_counter()
+
+    # ---- Human move ----
+    response, state, valid_actions = apply_human_move(env, human_action, trajectories)
+
+    if timed:
+        human_done = metrics.perf_counter()
+        metrics.observe("server_move_seconds", human_done - start, phase="human")
+
+    if response is not None:
+        return _encode(response, timed)
+
+    # ---- AI move ----
+    ai_action = ai.choose_action(
+        state.flatten(),
+        valid_actions,
+        training=False
+    )
+
+    if timed:
+        agent_done = metrics.perf_counter()
+        metrics.observe("server_move_seconds", agent_done - human_done, phase="agent")
+
+    response = apply_ai_move(env, ai_action, trajectories)
+
+    if timed:
+        metrics.observe("server_move_seconds", metrics.perf_counter() - agent_done, phase="ai")
+    return _encode(response, timed)
+
+
+def _encode(body, timed):
+    """jsonify, timed as the "encode" phase"""
+    if not timed:
+        return jsonify(body)
+    start = metrics.perf_counter()
+    response = jsonify(body)
+    metrics.observe("server_move_seconds", metrics.perf_counter() - start, phase="encode")
+    return response
+
 
 if __name__ == "__main__":
+    init()
     app.run(debug=True)
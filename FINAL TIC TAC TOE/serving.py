@@ -0,0 +1,304 @@
+"""
+Shared serving logic for server.py and async_server.py
+Agent loading, the two halves of a /move turn, stateless batch analysis,
+the AI-move micro-batcher and the /metrics body
+"""
+
+import asyncio
+import os
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from qlearning_agent import QLearningAgent
+from search_agent import SearchAgent
+from policy_agent import PolicyAgent
+from mcts_agent import MCTSAgent
+from trajectory_log import TrajectoryLogger, game_moves
+import metrics
+
+
+def load_agent():
+    """
+    TICTACTOE_AGENT=search serves perfect play instead of the trained Q-table,
+    TICTACTOE_AGENT=policy the compiled policy table (trained_policy.bin),
+    TICTACTOE_AGENT=mcts Monte Carlo tree search, whose strength/latency
+    trade-off is set by TICTACTOE_MCTS_PLAYOUTS (default 2000) and/or
+    TICTACTOE_MCTS_TIME_MS (per-move time cap).
+    The binary model is preferred: it is memory-mapped, so pre-fork workers
+    share one copy of the table.
+    """
+    if os.environ.get("TICTACTOE_AGENT") == "search":
+        return SearchAgent(player=-1)
+
+    if os.environ.get("TICTACTOE_AGENT") == "policy":
+        return PolicyAgent.from_file("trained_policy.bin")
+
+    if os.environ.get("TICTACTOE_AGENT") == "mcts":
+        time_ms = os.environ.get("TICTACTOE_MCTS_TIME_MS")
+        return MCTSAgent(
+            player=-1,
+            playouts=int(os.environ.get("TICTACTOE_MCTS_PLAYOUTS", 2000)),
+            time_limit=float(time_ms) / 1000 if time_ms else None
+        )
+
+    if os.path.exists("trained_agent.qtb"):
+        agent = QLearningAgent(player=-1, dense=True)
+        agent.load("trained_agent.qtb", mmap=True)
+        return agent
+
+    agent = QLearningAgent(player=-1)
+    agent.load("trained_agent.pkl")  # load your trained model
+    return agent
+
+
+def open_trajectory_logger() -> Optional[TrajectoryLogger]:
+    """
+    Logger for finished games if TICTACTOE_TRAJECTORY_DIR is set, so human
+    games can be reused by train.train_offline. Every game is written
+    as soon as it ends.
+    """
+    directory = os.environ.get("TICTACTOE_TRAJECTORY_DIR")
+    if not directory:
+        return None
+    return TrajectoryLogger(directory, flush_every=1)
+
+
+# --------------------------------------------------
+# ONE /move TURN
+# --------------------------------------------------
+
+def apply_human_move(env, human_action: int,
+                     logger: Optional[TrajectoryLogger] = None) -> Tuple[Optional[dict], np.ndarray, List[int]]:
+    """
+    Play the human move.
+
+    Returns:
+        (response, state, valid_actions): response is the final JSON body
+        if the game is over, else None and the AI must reply
+    """
+    # Moves after the end of a game must not log it twice
+    already_over = logger is not None and env.is_game_over()
+
+    state, reward, done, info = env.step_flat(human_action)
+
+    if done and logger is not None and not already_over and 'error' not in info:
+        logger.log_game(game_moves(env), env.get_winner())
+
+    if done:
+        return {
+            "done": True,
+            "winner": env.get_winner(),
+            "board": state.flatten().tolist()
+        }, state, []
+
+    valid_actions = env.get_available_actions_flat()
+
+    if not valid_actions:
+        return {
+            "done": True,
+            "winner": env.get_winner(),
+            "board": state.flatten().tolist()
+        }, state, []
+
+    return None, state, valid_actions
+
+
+def apply_ai_move(env, ai_action: int, logger: Optional[TrajectoryLogger] = None) -> dict:
+    """Play the AI reply and build the JSON body"""
+    state, reward, done, info = env.step_flat(ai_action)
+
+    if done and logger is not None:
+        logger.log_game(game_moves(env), env.get_winner())
+
+    return {
+        "ai_action": ai_action,
+        "done": done,
+        "winner": env.get_winner(),
+        "board": state.flatten().tolist()
+    }
+
+
+# --------------------------------------------------
+# STATELESS BATCH ANALYSIS
+# --------------------------------------------------
+
+def parse_boards(data) -> np.ndarray:
+    """
+    Validate the "boards" field of a /move_batch or /evaluate body.
+
+    Raises:
+        ValueError: if it is not a list of 9-element boards of -1, 0, 1
+    """
+    try:
+        boards = np.asarray(data["boards"], dtype=int)
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("expected {\"boards\": [[9 cells], ...]}")
+
+    if boards.ndim != 2 or boards.shape[1] != 9 or not np.isin(boards, (-1, 0, 1)).all():
+        raise ValueError("each board must have 9 cells with values -1, 0 or 1")
+    return boards
+
+
+def evaluate_boards(agent, boards: np.ndarray, with_values: bool = True) -> dict:
+    """
+    Chosen action (and per-action values) for every board, without touching
+    any game. Uses the agent's vectorized table lookup when it has one.
+
+    Returns:
+        dict: "actions" (None where the board is full) and, if with_values,
+        "q_values" (None for occupied cells)
+
+    Raises:
+        NotImplementedError: values asked from an agent without action values
+    """
+    valid_mask = boards == 0
+
+    if hasattr(agent, "q_values_batch"):
+        q_values = agent.q_values_batch(boards)
+        actions = agent.choose_action_batch(boards, valid_mask, q_values=q_values).tolist()
+    elif with_values:
+        raise NotImplementedError("the loaded agent has no action values")
+    elif hasattr(agent, "choose_action_batch"):
+        q_values = None
+        actions = agent.choose_action_batch(boards, valid_mask).tolist()
+    else:
+        q_values = None
+        actions = [agent.choose_action(board, np.flatnonzero(mask).tolist(), training=False)
+                   for board, mask in zip(boards, valid_mask)]
+
+    result = {"actions": [None if a is None or a < 0 else a for a in actions]}
+    if with_values:
+        result["q_values"] = [
+            [value if valid else None for value, valid in zip(row, mask_row)]
+            for row, mask_row in zip(q_values.tolist(), valid_mask.tolist())
+        ]
+    return result
+
+
+# --------------------------------------------------
+# MICRO-BATCHING
+# --------------------------------------------------
+
+class MoveBatcher:
+    """
+    Collects AI-move requests for a short window and answers them with one
+    vectorized policy lookup (agent.choose_action_batch when the agent has
+    it, otherwise one choose_action per request).
+
+    Agents without choose_action_batch (e.g. MCTS) can take milliseconds
+    per move, so their batches run in the loop's default executor instead
+    of blocking the event loop.
+    """
+
+    def __init__(self, agent, window: float = 0.002, max_batch: int = 512):
+        self.agent = agent
+        self.window = window
+        self.max_batch = max_batch
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+        self.batches = 0
+        self.requests = 0
+        self.max_batch_seen = 0
+
+    @property
+    def blocking(self) -> bool:
+        """True when moves are chosen one choose_action call at a time"""
+        return not hasattr(self.agent, "choose_action_batch")
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def choose_action(self, state: np.ndarray, valid_actions: List[int]) -> int:
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((state, valid_actions, future))
+        return await future
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            if self.window > 0:
+                await asyncio.sleep(self.window)
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            try:
+                if self.blocking:
+                    actions = await asyncio.get_running_loop().run_in_executor(
+                        None, self._resolve, batch)
+                else:
+                    actions = self._resolve(batch)
+            except Exception as e:
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, _, future), action in zip(batch, actions):
+                if not future.done():
+                    future.set_result(action)
+
+    def _resolve(self, batch) -> List[int]:
+        self.batches += 1
+        self.requests += len(batch)
+        self.max_batch_seen = max(self.max_batch_seen, len(batch))
+
+        if self.blocking:
+            return [self.agent.choose_action(state, valid_actions, training=False)
+                    for state, valid_actions, _ in batch]
+
+        states = np.stack([state for state, _, _ in batch])
+        valid_mask = np.zeros((len(batch), 9), dtype=bool)
+        for row, (_, valid_actions, _) in enumerate(batch):
+            valid_mask[row, valid_actions] = True
+
+        return self.agent.choose_action_batch(states, valid_mask).tolist()
+
+    def get_stats(self):
+        return {
+            "batches": self.batches,
+            "requests": self.requests,
+            "mean_batch_size": self.requests / self.batches if self.batches else 0.0,
+            "max_batch_size": self.max_batch_seen,
+            "window_ms": self.window * 1000
+        }
+
+
+# --------------------------------------------------
+# /metrics
+# --------------------------------------------------
+
+# Monotonic GameStore / batcher statistics, exposed as counters (the
+# others, sizes and configuration, are gauges)
+_COUNTER_STATS = {"created", "evicted_lru", "evicted_ttl", "misses", "batches", "requests"}
+
+
+def render_metrics(games, batcher: Optional[MoveBatcher] = None) -> str:
+    """
+    Prometheus text for /metrics: the recorded histograms and counters
+    (TICTACTOE_METRICS=1) plus GameStore and batcher statistics, always present.
+    """
+    stats = [(f"games_{name}", name, value) for name, value in games.get_stats().items()]
+    if batcher is not None:
+        stats += [(f"batcher_{name}", name, value) for name, value in batcher.get_stats().items()]
+
+    gauges = {}
+    counters = {}
+    for metric, name, value in stats:
+        if name in _COUNTER_STATS:
+            counters[f"{metric}_total"] = value
+        else:
+            gauges[metric] = value
+    return metrics.render_prometheus(gauges, counters)
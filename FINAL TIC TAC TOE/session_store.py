@@ -0,0 +1,127 @@
+"""
+Bounded in-memory store of game sessions for the server
+One TicTacToeEnvironment per game id, with LRU and idle-TTL eviction
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from game import TicTacToeEnvironment
+
+
+class GameSession:
+    """One game: its environment and the lock serializing moves on it"""
+
+    __slots__ = ("game_id", "env", "lock", "last_access")
+
+    def __init__(self, game_id: str, env: TicTacToeEnvironment, now: float, lock):
+        self.game_id = game_id
+        self.env = env
+        self.lock = lock
+        self.last_access = now
+
+
+class GameStore:
+    """
+    Sessions ordered by last access (oldest first).
+
+    - LRU: creating a game when the store is full evicts the least
+      recently used one.
+    - TTL: games idle for longer than ttl seconds are evicted lazily,
+      from the front of the order, on every create/get.
+    """
+
+    def __init__(self, max_games: int = 10000,
+                 ttl: float = 1800.0,
+                 env_factory: Callable[[], TicTacToeEnvironment] = TicTacToeEnvironment,
+                 clock: Callable[[], float] = time.monotonic,
+                 lock_factory: Callable = threading.Lock):
+
+        self.max_games = max_games
+        self.ttl = ttl
+        self.env_factory = env_factory
+        self.clock = clock
+        # threading.Lock for the Flask server, asyncio.Lock for the async one
+        self.lock_factory = lock_factory
+
+        self._sessions: "OrderedDict[str, GameSession]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.created = 0
+        self.evicted_lru = 0
+        self.evicted_ttl = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._sessions)
+
+    # ---------- EVICTION ----------
+
+    def _evict_expired(self, now: float) -> int:
+        """Drop idle sessions from the front; caller holds self._lock"""
+        evicted = 0
+        deadline = now - self.ttl
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if session.last_access > deadline:
+                break
+            self._sessions.popitem(last=False)
+            evicted += 1
+        self.evicted_ttl += evicted
+        return evicted
+
+    def evict_expired(self) -> int:
+        with self._lock:
+            return self._evict_expired(self.clock())
+
+    # ---------- ACCESS ----------
+
+    def create(self) -> GameSession:
+        """Start a new game, evicting idle or least recently used ones if needed"""
+        game_id = uuid.uuid4().hex
+        env = self.env_factory()
+
+        with self._lock:
+            now = self.clock()
+            self._evict_expired(now)
+            while len(self._sessions) >= self.max_games:
+                self._sessions.popitem(last=False)
+                self.evicted_lru += 1
+
+            session = GameSession(game_id, env, now, self.lock_factory())
+            self._sessions[game_id] = session
+            self.created += 1
+            return session
+
+    def get(self, game_id: str) -> Optional[GameSession]:
+        """Return the session and mark it used, or None if unknown or expired"""
+        with self._lock:
+            now = self.clock()
+            self._evict_expired(now)
+            session = self._sessions.get(game_id)
+            if session is None:
+                self.misses += 1
+                return None
+            session.last_access = now
+            self._sessions.move_to_end(game_id)
+            return session
+
+    def remove(self, game_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(game_id, None) is not None
+
+    # ---------- STATS ----------
+
+    def get_stats(self):
+        return {
+            "size": len(self._sessions),
+            "max_games": self.max_games,
+            "ttl_seconds": self.ttl,
+            "created": self.created,
+            "evicted_lru": self.evicted_lru,
+            "evicted_ttl": self.evicted_ttl,
+            "misses": self.misses
+        }
@@ -0,0 +1,267 @@
+"""
+Graphe compilé des positions du Tic-Tac-Toe
+
+Énumère une fois les 5 478 positions atteignables depuis le plateau vide et
+leur attribue un identifiant dense (rang du code base 3 parmi les positions
+atteignables). Les tables de transition et de statut sont mises en cache sur disque.
+
+Codage base 3: code = sum(digit[i] * 3**i), digit = 0 vide, 1 X, 2 O.
+"""
+
+import os
+import zipfile
+import numpy as np
+from typing import Dict, Optional
+
+import bitboard
+
+
+NUM_CODES = 3 ** 9
+
+# Valeurs de status[id]
+STATUS_ONGOING = 0
+STATUS_X_WIN = 1
+STATUS_O_WIN = -1
+STATUS_DRAW = 2
+
+CACHE_VERSION = 1
+
+
+def default_cache_dir() -> str:
+    """
+    Dossier de cache de l'utilisateur: TICTACTOE_CACHE_DIR, sinon
+    $XDG_CACHE_HOME/tictactoe, sinon ~/.cache/tictactoe.
+    """
+    if os.environ.get("TICTACTOE_CACHE_DIR"):
+        return os.environ["TICTACTOE_CACHE_DIR"]
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "tictactoe")
+
+
+DEFAULT_CACHE_FILE = os.path.join(default_cache_dir(), "state_graph.npz")
+
+POW3 = 3 ** np.arange(9, dtype=np.int64)
+
+# Code "ternaire équilibré" sum(state[i] * 3**i) dans [-9841, 9841]: un seul
+# produit scalaire, sans passer par state % 3. On le décale pour indexer un tableau.
+BALANCED_OFFSET = (NUM_CODES - 1) // 2
+
+
+def encode(state: np.ndarray) -> int:
+    """
+    Code base 3 d'un plateau (1 = X, -1 = O, 0 = vide).
+
+    Args:
+        state: Plateau 3x3 ou vecteur de 9 éléments
+
+    Returns:
+        int: Code dans [0, 3^9)
+    """
+    return int(POW3 @ (np.asarray(state, dtype=np.int64).ravel() % 3))
+
+
+def decode(code: int) -> np.ndarray:
+    """
+    Plateau (9,) correspondant à un code base 3 (inverse de encode).
+    Avec une colonne de codes (N, 1), décode tous les plateaux d'un coup.
+
+    Returns:
+        np.ndarray: Vecteur de 9 entiers (1 / -1 / 0), ou (N, 9)
+    """
+    digits = (code // POW3) % 3
+    return np.where(digits == 2, -1, digits).astype(int)
+
+
+def bits_to_code(x_bits: int, o_bits: int) -> int:
+    """Code base 3 d'une position donnée en bitboards (deux lectures de table)."""
+    return bitboard.code(x_bits, o_bits)
+
+
+class StateGraph:
+    """
+    Tables indexées par identifiant de position:
+
+        codes[id]              code base 3 (croissant avec id)
+        boards[id]             plateau (9,) int8
+        next_state[id, action] position suivante, -1 si coup illégal ou partie finie
+        status[id]             STATUS_ONGOING / STATUS_X_WIN / STATUS_O_WIN / STATUS_DRAW
+        to_move[id]            joueur au trait (1 ou -1)
+        legal_mask[id]         cases jouables (9,) bool
+        code_to_id[code]       identifiant, -1 si position non atteignable
+    """
+
+    def __init__(self, codes: np.ndarray, boards: np.ndarray, next_state: np.ndarray,
+                 status: np.ndarray, to_move: np.ndarray, legal_mask: np.ndarray):
+        self.codes = codes
+        # Lignes passées telles quelles aux agents (play_game): en lecture
+        # seule, un agent ne peut pas corrompre le graphe partagé
+        self.boards = boards
+        self.boards.flags.writeable = False
+        self.next_state = next_state
+        self.status = status
+        self.to_move = to_move
+        self.legal_mask = legal_mask
+
+        self.code_to_id = np.full(NUM_CODES, -1, dtype=np.int16)
+        self.code_to_id[codes] = np.arange(len(codes), dtype=np.int16)
+
+        # balanced_to_id[dot(POW3, state) + BALANCED_OFFSET] == code_to_id[encode(state)]
+        balanced = boards.astype(np.int64) @ POW3 + BALANCED_OFFSET
+        self.balanced_to_id = np.full(NUM_CODES, -1, dtype=np.int16)
+        self.balanced_to_id[balanced] = np.arange(len(codes), dtype=np.int16)
+        self._balanced_to_id_list = self.balanced_to_id.tolist()
+
+        # Masque 9 bits des cases occupées (indice dans bitboard.MOVES_TABLE)
+        self.occupied = (boards != 0).astype(np.int64) @ (1 << np.arange(9, dtype=np.int64))
+
+        # Listes Python des coups légaux (évite np.flatnonzero dans les boucles)
+        self.legal_actions = [tuple(int(a) for a in np.flatnonzero(mask)) for mask in legal_mask]
+
+        # Transitions en listes Python (rejeu de parties coup par coup)
+        self.next_state_list = next_state.tolist()
+
+    @property
+    def num_states(self) -> int:
+        return len(self.codes)
+
+    def state_id(self, state: np.ndarray) -> int:
+        """
+        Identifiant d'un plateau.
+
+        Raises:
+            KeyError: si la position n'est pas atteignable
+        """
+        state_id = int(self.code_to_id[encode(state)])
+        if state_id < 0:
+            raise KeyError("unreachable position")
+        return state_id
+
+    def fast_id(self, state: np.ndarray) -> int:
+        """
+        Identifiant d'un vecteur de 9 éléments via le code équilibré
+        (-1 si non atteignable). Chemin rapide utilisé par les agents.
+        """
+        return self._balanced_to_id_list[int(state.dot(POW3)) + BALANCED_OFFSET]
+
+    def save(self, filename: str):
+        np.savez(filename, version=CACHE_VERSION, codes=self.codes, boards=self.boards,
+                 next_state=self.next_state, status=self.status,
+                 to_move=self.to_move, legal_mask=self.legal_mask)
+
+    @classmethod
+    def load(cls, filename: str) -> 'StateGraph':
+        with np.load(filename) as data:
+            if int(data["version"]) != CACHE_VERSION:
+                raise ValueError(f"state graph cache version {int(data['version'])}, "
+                                 f"expected {CACHE_VERSION}")
+            return cls(data["codes"], data["boards"], data["next_state"],
+                       data["status"], data["to_move"], data["legal_mask"])
+
+
+def build_state_graph() -> StateGraph:
+    """
+    Énumère toutes les positions atteignables et construit les tables.
+
+    Returns:
+        StateGraph: Graphe complet (5 478 positions)
+    """
+    # Parcours depuis le plateau vide; on ne développe pas les positions terminales
+    seen = {(0, 0)}
+    stack = [(0, 0)]
+    while stack:
+        x_bits, o_bits = stack.pop()
+        if bitboard.winner(x_bits, o_bits) is not None:
+            continue
+        x_to_move = bin(x_bits).count("1") == bin(o_bits).count("1")
+        for action in bitboard.legal_actions(x_bits, o_bits):
+            child = ((x_bits | 1 << action, o_bits) if x_to_move
+                     else (x_bits, o_bits | 1 << action))
+            if child not in seen:
+                seen.add(child)
+                stack.append(child)
+
+    positions = sorted(seen, key=lambda p: bits_to_code(*p))
+    n = len(positions)
+    codes = np.array([bits_to_code(*p) for p in positions], dtype=np.int32)
+    id_of = {p: i for i, p in enumerate(positions)}
+
+    boards = np.zeros((n, 9), dtype=np.int8)
+    next_state = np.full((n, 9), -1, dtype=np.int16)
+    status = np.zeros(n, dtype=np.int8)
+    to_move = np.zeros(n, dtype=np.int8)
+    legal_mask = np.zeros((n, 9), dtype=bool)
+
+    for i, (x_bits, o_bits) in enumerate(positions):
+        boards[i] = bitboard.to_flat(x_bits, o_bits)
+        x_to_move = bin(x_bits).count("1") == bin(o_bits).count("1")
+        to_move[i] = 1 if x_to_move else -1
+
+        win = bitboard.winner(x_bits, o_bits)
+        if win is not None:
+            status[i] = STATUS_X_WIN if win == 1 else STATUS_O_WIN
+            continue
+        if bitboard.is_full(x_bits, o_bits):
+            status[i] = STATUS_DRAW
+            continue
+
+        for action in bitboard.legal_actions(x_bits, o_bits):
+            child = ((x_bits | 1 << action, o_bits) if x_to_move
+                     else (x_bits, o_bits | 1 << action))
+            next_state[i, action] = id_of[child]
+            legal_mask[i, action] = True
+
+    return StateGraph(codes, boards, next_state, status, to_move, legal_mask)
+
+
+# Graphes mémorisés dans le processus, par fichier de cache
+_graphs: Dict[Optional[str], StateGraph] = {}
+
+
+def _write_cache(graph: StateGraph, cache_file: str):
+    """
+    Écrit le cache (fichier temporaire puis renommage: un autre processus ne
+    lit jamais un fichier à moitié écrit). Sans droit d'écriture, pas de cache.
+    """
+    temporary = f"{cache_file}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(cache_file)), exist_ok=True)
+        with open(temporary, "wb") as f:
+            graph.save(f)
+        os.replace(temporary, cache_file)
+    except OSError:
+        try:
+            os.remove(temporary)
+        except OSError:
+            pass
+
+
+def load_state_graph(cache_file: Optional[str] = DEFAULT_CACHE_FILE) -> StateGraph:
+    """
+    Retourne le graphe (mémorisé dans le processus pour chaque cache_file), en
+    le lisant depuis le cache disque ou en le construisant puis l'écrivant si le
+    cache est absent ou périmé.
+
+    Args:
+        cache_file: Fichier .npz du cache (None pour ne pas utiliser de cache);
+                    par défaut dans le dossier de cache de l'utilisateur
+
+    Returns:
+        StateGraph: Graphe des positions
+    """
+    graph = _graphs.get(cache_file)
+    if graph is not None:
+        return graph
+
+    if cache_file and os.path.exists(cache_file):
+        try:
+            graph = StateGraph.load(cache_file)
+        except (ValueError, KeyError, OSError, zipfile.BadZipFile):
+            graph = None
+
+    if graph is None:
+        graph = build_state_graph()
+        if cache_file:
+            _write_cache(graph, cache_file)
+
+    _graphs[cache_file] = graph
+    return graph
@@ -0,0 +1,104 @@
+"""
+Symétries du plateau 3x3 (groupe diédral, 8 éléments)
+
+Chaque transformation t est une permutation des cases: la case i va en PERMS[t][i].
+Le représentant canonique d'une position est l'image de plus petit code base 3
+(donc de plus petit identifiant dans le graphe compilé).
+"""
+
+import numpy as np
+from typing import Optional, Tuple
+
+from state_graph import StateGraph, load_state_graph, POW3
+
+
+def _perm(transform) -> Tuple[int, ...]:
+    """Permutation des indices 0-8 à partir d'une fonction (row, col) -> (row, col)."""
+    perm = [0] * 9
+    for idx in range(9):
+        row, col = transform(*divmod(idx, 3))
+        perm[idx] = row * 3 + col
+    return tuple(perm)
+
+
+# PERMS[0] est l'identité
+PERMS = (
+    _perm(lambda r, c: (r, c)),          # identité
+    _perm(lambda r, c: (c, 2 - r)),      # rotation 90°
+    _perm(lambda r, c: (2 - r, 2 - c)),  # rotation 180°
+    _perm(lambda r, c: (2 - c, r)),      # rotation 270°
+    _perm(lambda r, c: (r, 2 - c)),      # miroir vertical
+    _perm(lambda r, c: (2 - r, c)),      # miroir horizontal
+    _perm(lambda r, c: (c, r)),          # diagonale principale
+    _perm(lambda r, c: (2 - c, 2 - r)),  # diagonale secondaire
+)
+
+INVERSE_PERMS = tuple(
+    tuple(perm.index(idx) for idx in range(9)) for perm in PERMS
+)
+
+_PERMS_ARRAY = np.array(PERMS, dtype=np.intp)
+
+
+def transform_board(flat: np.ndarray, t: int) -> np.ndarray:
+    """
+    Applique la transformation t à un vecteur de 9 éléments.
+
+    Returns:
+        np.ndarray: out avec out[PERMS[t][i]] = flat[i]
+    """
+    out = np.empty_like(flat)
+    out[_PERMS_ARRAY[t]] = flat
+    return out
+
+
+class SymmetryTables:
+    """
+    Tables précalculées, indexées par identifiant du graphe:
+
+        canonical_id[id]   identifiant du représentant canonique
+        transform[id]      t tel que transform_board(boards[id], t) == boards[canonical_id[id]]
+        action_map[id]     case du représentant canonique où est rangée la valeur de
+                           chaque coup: PERMS[transform[id]], puis, si le représentant
+                           est symétrique à lui-même, la plus petite case équivalente
+                           (les 4 coins du plateau vide partagent une seule valeur)
+    """
+
+    def __init__(self, graph: StateGraph):
+        n = graph.num_states
+        images = np.empty((len(PERMS), n), dtype=np.int64)
+        for t in range(len(PERMS)):
+            transformed = np.empty_like(graph.boards)
+            transformed[:, _PERMS_ARRAY[t]] = graph.boards
+            images[t] = graph.code_to_id[transformed.astype(np.int64) % 3 @ POW3]
+
+        self.transform = images.argmin(axis=0).astype(np.int8)
+        self.canonical_id = images.min(axis=0).astype(np.int16)
+
+        # Transformations qui laissent le représentant canonique inchangé
+        canonical = self.canonical_id.astype(np.intp)
+        stabilizer = images[:, canonical] == canonical
+        # composed[g, t, a] = PERMS[g][PERMS[t][a]]
+        composed = _PERMS_ARRAY[:, _PERMS_ARRAY]
+        candidates = composed[:, self.transform.astype(np.intp), :]
+        self.action_map = np.where(stabilizer[:, :, None], candidates, 9).min(axis=0)
+
+        # Versions listes pour les boucles Python des agents
+        self.canonical_id_list = self.canonical_id.tolist()
+        self.transform_list = self.transform.tolist()
+        self.action_map_list = [tuple(row) for row in self.action_map.tolist()]
+
+    @property
+    def num_canonical(self) -> int:
+        return len(np.unique(self.canonical_id))
+
+
+_tables: Optional[SymmetryTables] = None
+
+
+def load_symmetry_tables() -> SymmetryTables:
+    """Retourne les tables de symétrie (calculées une fois par processus)."""
+    global _tables
+    if _tables is None:
+        _tables = SymmetryTables(load_state_graph())
+    return _tables
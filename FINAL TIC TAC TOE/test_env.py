@@ -6,8 +6,16 @@ Ce script démontre toutes les fonctionnalités de l'environnement
 
 """
 
+import os
+import subprocess
+import sys
+import time
+
 import numpy as np
 from game import TicTacToeEnvironment
+from batch_env import BatchTicTacToeEnvironment
+from mnk_board import MNKBoard
+import metrics
 
 
 def test_basic_game():
@@ -158,11 +166,1164 @@ def test_game_info():
             print(f"  {key}: {value}")
 
 
+def test_batch_environment():
+    """Test de l'environnement vectorisé (victoire de X dans une des parties)."""
+    print("\n" + "="*50)
+    print("TEST 7: Environnement vectorisé")
+    print("="*50)
+    
+    env = BatchTicTacToeEnvironment(n=2)
+    
+    # Partie 0: X gagne sur la ligne du haut, partie 1: coups quelconques
+    moves = [(0, 4), (3, 0), (1, 8), (4, 2), (2, 6)]
+    
+    for move in moves:
+        states, rewards, dones, info = env.step_flat(np.array(move))
+    
+    print(f"Récompenses: {rewards}")
+    print(f"Terminées: {dones}")
+    assert rewards[0] == 1.0 and dones[0] and info['winner'][0] == 1
+    assert not dones[1]
+    # La partie 0 a été réinitialisée automatiquement
+    assert not states[0].any()
+    assert env.get_available_actions_mask()[0].all()
+
+
+
+
+
+
+
+
+def test_compiled_environment():
+    """Test du mode compilé: même partie que le test 1, jouée par indexation."""
+    print("\n" + "="*50)
+    print("TEST 8: Mode compilé")
+    print("="*50)
+    
+    env = TicTacToeEnvironment(compiled=True)
+    env.reset()
+    print(f"Positions atteignables: {env.graph.num_states}")
+    assert env.graph.num_states == 5478
+    
+    for action in [0, 3, 1, 4]:
+        state_id, reward, done = env.step_id(action)
+        assert reward == 0.0 and not done
+    
+    state_id, reward, done = env.step_id(2)  # X gagne (ligne du haut)
+    env.render('console')
+    assert reward == 1.0 and done
+    assert env.get_winner() == 1
+    assert env.board.current_player == -1
+    
+    # Coup après la fin de la partie: invalide en mode compilé
+    assert env.step_id(8) == (state_id, -10.0, True)
+    
+
+def test_step_metrics():
+    """Test de l'instrumentation: timers par phase de step() et export Prometheus."""
+    print("\n" + "="*50)
+    print("TEST 9: Instrumentation")
+    print("="*50)
+    
+    metrics.reset()
+    metrics.enable()
+    try:
+        env = TicTacToeEnvironment()
+        env.reset()
+        for action in [0, 3, 1]:
+            env.step_flat(action)
+    finally:
+        metrics.enable(False)
+    
+    print(metrics.summary())
+    text = metrics.render_prometheus({"games_size": 0})
+    assert 'tictactoe_env_step_seconds_count{phase="move"} 3' in text
+    assert 'tictactoe_env_step_seconds_bucket{phase="status",le="+Inf"} 3' in text
+    assert "tictactoe_games_size 0" in text
+    
+    # Désactivé: plus rien n'est enregistré
+    env.step_flat(4)
+    assert 'tictactoe_env_step_seconds_count{phase="move"} 3' in metrics.render_prometheus()
+    metrics.reset()
+    
+    # Activé en cours de partie: play_game et learn lisent le drapeau une fois
+    from qlearning_agent import QLearningAgent, RandomAgent
+    from train import play_game
+    
+    class EnablingAgent(RandomAgent):
+        def choose_action(self, state, valid_actions, training=True):
+            metrics.enable()
+            return super().choose_action(state, valid_actions, training)
+    
+    try:
+        play_game(EnablingAgent(), QLearningAgent(player=-1), TicTacToeEnvironment())
+    finally:
+        metrics.enable(False)
+        metrics.reset()
+    
+    # /metrics: compteurs monotones en _total, taille et configuration en gauges
+    from session_store import GameStore
+    from serving import render_metrics
+    
+    games = GameStore(max_games=1)
+    games.create()
+    games.create()
+    text = render_metrics(games)
+    assert "# TYPE tictactoe_games_created_total counter" in text
+    assert "tictactoe_games_created_total 2" in text
+    assert "tictactoe_games_evicted_lru_total 1" in text
+    assert "# TYPE tictactoe_games_max_games gauge" in text
+    assert "# TYPE tictactoe_games_ttl_seconds gauge" in text
+    assert "tictactoe_games_created " not in text
+
+    # Mises à jour concurrentes (serveur Flask threadé): aucun incrément perdu
+    import threading
+
+    def hammer():
+        for _ in range(2000):
+            metrics.inc("hammer_total")
+            metrics.observe("hammer_seconds", 1e-6)
+
+    threads = [threading.Thread(target=hammer) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    text = metrics.render_prometheus()
+    assert "tictactoe_hammer_total 16000" in text
+    assert "tictactoe_hammer_seconds_count 16000" in text
+    metrics.reset()
+
+    # /move: phase d'encodage JSON chronométrée, y compris sur fin de partie humaine
+    import server
+    from qlearning_agent import RandomAgent
+
+    server.init(RandomAgent())
+    client = server.app.test_client()
+    game_id = client.post("/reset").get_json()["game_id"]
+    metrics.enable()
+    try:
+        assert client.post("/move", json={"game_id": game_id, "action": 4}).status_code == 200
+    finally:
+        metrics.enable(False)
+    text = metrics.render_prometheus()
+    for phase in ("human", "agent", "ai", "encode"):
+        assert f'tictactoe_server_move_seconds_count{{phase="{phase}"}} 1' in text, phase
+    metrics.reset()
+
+
+def test_step_fast():
+    """Test du pas sans allocation: codes entiers et historique préalloué."""
+    print("\n" + "="*50)
+    print("TEST 10: step_fast")
+    print("="*50)
+    
+    env = TicTacToeEnvironment(record_history=True)
+    env.reset()
+    graph = env.get_graph()
+    
+    for action in [0, 3, 1, 4]:
+        state_id, reward, done = env.step_fast(action)
+        assert reward == 0.0 and not done
+    
+    state_id, reward, done = env.step_fast(2)  # X gagne (ligne du haut)
+    print(f"state_id final: {state_id}")
+    assert reward == 1.0 and done
+    assert graph.boards[state_id].tolist() == [1, 1, 1, -1, -1, 0, 0, 0, 0]
+    assert env.get_fast_history() == [0, 3, 1, 4, 2]
+    
+    # Le plateau est reconstruit à la demande
+    env.render('console')
+    assert env.get_winner() == 1
+    
+    # Mélange avec step(): step_fast repart du plateau à jour
+    env.reset()
+    env.step_flat(4)
+    state_id, reward, done = env.step_fast(0)
+    assert graph.boards[state_id].tolist() == [-1, 0, 0, 0, 1, 0, 0, 0, 0]
+    assert env.step_fast(0) == (state_id, -10.0, True)
+    
+
+def test_undo_move():
+    """Test des sommes de lignes incrémentales et de undo_move."""
+    print("\n" + "="*50)
+    print("TEST 11: last_move_won / undo_move")
+    print("="*50)
+    
+    env = TicTacToeEnvironment()
+    env.reset()
+    board = env.board
+    
+    for action in [0, 3, 1, 4]:
+        board.make_move(action // 3, action % 3)
+        assert not board.last_move_won()
+    
+    board.make_move(0, 2)  # X complète la ligne du haut
+    print(board)
+    assert board.last_move_won()
+    assert board.line_sums[0] == 3 and board.empty_count == 4
+    
+    # Retour arrière jusqu'au plateau vide
+    assert board.undo_move() == (0, 2)
+    assert not board.last_move_won() and board.current_player == 1
+    while board.undo_move() is not None:
+        pass
+    assert board.line_sums == [0] * 8 and board.empty_count == 9
+    assert board.get_bits() == (0, 0) and not board.grid.any()
+    
+
+def test_mnk_environment():
+    """Test de l'environnement sur un plateau m,n,k (gomoku 15x15)."""
+    print("\n" + "="*50)
+    print("TEST 12: Plateau m,n,k (15x15, 5 alignés)")
+    print("="*50)
+    
+    env = TicTacToeEnvironment(board=MNKBoard(15, 15, 5))
+    state = env.reset()
+    assert state.shape == (15, 15)
+    assert len(env.get_available_actions_flat()) == 225
+    
+    # X aligne une diagonale, O joue sur la dernière ligne
+    for i in range(4):
+        state, reward, done, info = env.step_flat(i * 16)
+        assert reward == 0.0 and not done
+        state, reward, done, info = env.step_flat(210 + i)
+    
+    state, reward, done, info = env.step_flat(4 * 16)
+    env.render('simple')
+    assert reward == 1.0 and done
+    assert env.get_winner() == 1
+    assert env.rules.check_winner(state) == 1
+    
+    # Retour arrière sur le plateau: la victoire disparaît
+    env.board.undo_move()
+    assert env.get_winner() is None and not env.is_game_over()
+
 
+def test_cli_startup():
+    """Test du temps de démarrage de la ligne de commande tictactoe.py."""
+    print("\n" + "="*50)
+    print("TEST 13: Démarrage de la CLI")
+    print("="*50)
+    
+    import tictactoe
+    here = os.path.dirname(os.path.abspath(__file__))
+    
+    # Sous-commandes légères: meilleur de 3 lancements, interpréteur compris.
+    # Le temps dépend de la machine: vérifié seulement avec TICTACTOE_CHECK_STARTUP=1
+    check_budget = os.environ.get("TICTACTOE_CHECK_STARTUP", "0") not in ("", "0", "false")
+    for argv in (["--help"], ["eval", "--help"], ["export", "--help"]):
+        best = float("inf")
+        for _ in range(3):
+            start = time.perf_counter()
+            result = subprocess.run([sys.executable, "tictactoe.py", *argv],
+                                    cwd=here, capture_output=True)
+            best = min(best, time.perf_counter() - start)
+            assert result.returncode == 0
+        print(f"tictactoe.py {' '.join(argv)}: {best * 1000:.0f} ms "
+              f"(budget {tictactoe.STARTUP_BUDGET_MS} ms)")
+        if check_budget:
+            assert best * 1000 < tictactoe.STARTUP_BUDGET_MS
+    
+    # Le parseur seul ne charge ni NumPy ni les dépendances lourdes
+    code = ("import sys, tictactoe; tictactoe.build_parser().parse_args(['eval', 'm.qtb']); "
+            "print(','.join(m for m in tictactoe.HEAVY_MODULES if m in sys.modules))")
+    loaded = subprocess.run([sys.executable, "-c", code], cwd=here,
+                            capture_output=True, text=True).stdout.strip()
+    assert loaded == "", loaded
 
 
+def test_tournament():
+    """Test du tournoi: Elo, intervalle de confiance et arrêt SPRT."""
+    print("\n" + "="*50)
+    print("TEST 14: Tournoi et SPRT")
+    print("="*50)
+    
+    from tournament import SPRT, elo_interval, run_match, fit_ratings
+    
+    # Score symétrique: Elo opposés
+    elo, low, high = elo_interval(60, 20, 20)
+    assert low < elo < high and elo > 0
+    assert abs(elo_interval(20, 20, 60)[0] + elo) < 1e-9
+    
+    # La recherche parfaite bat l'aléatoire: décidé dès le premier paquet
+    match = run_match("search", "random", max_games=2000, chunk=50, sprt=SPRT(), seed=1)
+    print(match)
+    assert match.sprt == "H1" and match.games == 50 and match.losses == 0
+    
+    # Deux joueurs parfaits: toujours nul, H0 accepté
+    draws = run_match("search", "search", max_games=2000, chunk=50, sprt=SPRT(), seed=1)
+    assert draws.sprt == "H0" and draws.draws == draws.games
+    
+    ratings = fit_ratings([match, draws])
+    assert ratings["search"] == 0 and ratings["random"] < -200
+    
+    # Agents en cache dans le processus: un paquet ne dépend que de sa graine,
+    # pas des paquets (ou matchs) joués avant lui par le même processus
+    from tournament import _match_worker
+    job = ("mcts:30", "random", 40, 11)
+    first = _match_worker(job)
+    _match_worker(("mcts:30", "random", 40, 12))
+    run_match("random", "mcts:30", max_games=20, chunk=10, seed=4)
+    assert _match_worker(job) == first
+
+
+def test_checkpoint_resume():
+    """Test de la reprise d'un entraînement depuis les checkpoints delta."""
+    print("\n" + "="*50)
+    print("TEST 15: Checkpoints delta et reprise")
+    print("="*50)
+    
+    import contextlib
+    import io
+    import tempfile
+    from train import train_agent
+    from checkpoint import CheckpointLog
+    
+    options = dict(save_file=None, plot_progress=False, dense=True, seed=5)
+    with tempfile.TemporaryDirectory() as directory, \
+            contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        reference = train_agent(4000, **options)
+        
+        # Arrêt à mi-parcours, puis un enregistrement tronqué par un "crash"
+        train_agent(2000, checkpoint_dir=directory, checkpoint_every=500, **options)
+        log = CheckpointLog(directory)
+        assert log.records == 4
+        with open(log.filename, "ab") as f:
+            f.write(b"TTCK\xff\x00\x00\x00")
+        
+        resumed = train_agent(4000, checkpoint_dir=directory, checkpoint_every=500,
+                              resume=True, **dict(options, seed=0))
+        log = CheckpointLog(directory)
+        assert log.records == 8
+        
+        # Même table, même epsilon qu'un entraînement sans interruption
+        assert np.array_equal(reference.q_values, resumed.q_values)
+        assert reference.epsilon == resumed.epsilon
+        
+        # Le compactage garde l'état final
+        before = log.load()
+        log.compact()
+        after = log.load()
+        assert log.records == 1 and after[1]["episode"] == 4000
+        assert np.array_equal(before[0][0][1], after[0][0][1])
+        
+        # Nouvel entraînement sans resume dans le même dossier: nouveau journal,
+        # la reprise suivante ne mélange pas les deux exécutions
+        fresh = train_agent(1000, checkpoint_dir=directory, checkpoint_every=500,
+                            **dict(options, seed=2))
+        assert os.path.exists(log.filename + ".old")
+        log = CheckpointLog(directory)
+        assert log.records == 2 and log.load()[1]["episode"] == 1000
+        restored = train_agent(1000, checkpoint_dir=directory, resume=True,
+                               **dict(options, seed=0))
+        assert np.array_equal(fresh.q_values, restored.q_values)
+    print("Reprise identique à l'entraînement continu")
 
 
+def test_shared_core():
+    """Test du moteur commun à board.Board et tictactoe_game.Board."""
+    print("\n" + "="*50)
+    print("TEST 16: Moteur commun (1 / -1 et 1 / 2)")
+    print("="*50)
+    
+    import tictactoe_game
+    from state_graph import encode
+    
+    env = TicTacToeEnvironment()
+    env.reset()
+    legacy = tictactoe_game.Board(position=env.board)
+    
+    # Les coups de l'un sont vus par l'autre, sans copie de la grille
+    env.step((1, 1))
+    legacy.make_move(0, 0)
+    assert env.board.grid[0, 0] == -1 and env.board.current_player == 1
+    print(legacy)
+    assert legacy.get_state_key() == "200010000"
+    assert legacy.get_state_code() == encode(env.board.grid)
+    
+    # Clés texte et codes base 3 se convertissent dans les deux sens
+    copy = tictactoe_game.Board.from_state_key("200010000")
+    assert copy.current_player == 1 and copy.position.code() == legacy.get_state_code()
+    
+    for action in [(0, 1), (2, 0), (2, 1)]:
+        legacy.make_move(*action)
+    assert legacy.winner == 1 and env.get_winner() == 1
+    assert legacy.undo_move() == (2, 1) and legacy.winner is None
+    assert not legacy.make_move(0, 1)
+    
+    # Coup gagnant joué par l'environnement: vu par la vue (gagnant, fin de partie)
+    env.step((2, 1))
+    assert legacy.winner == 1 and legacy.is_game_over()
+    assert not legacy.make_move(2, 2)
+    
+    # Board(env=...) suit aussi les coups de step_fast
+    env.reset()
+    view = tictactoe_game.Board(env=env)
+    for action in [4, 0, 1, 3, 7]:
+        env.step_fast(action)
+    assert view.get_state_key() == "210210010"
+    assert view.grid.tolist() == [[2, 1, 0], [2, 1, 0], [0, 1, 0]]
+    assert view.winner == 1 and view.is_game_over() and view.get_reward(1) == 1.0
+    try:
+        tictactoe_game.Board(env=TicTacToeEnvironment(compiled=True))
+        assert False, "un environnement compilé ne doit pas être vu"
+    except ValueError:
+        pass
+    
+    # Écritures par les attributs: répercutées sur le plateau partagé
+    board = tictactoe_game.Board()
+    board.grid[1, 1] = 1
+    board.grid[0][2] = 2
+    assert board.position.grid.tolist() == [[0, 0, -1], [0, 1, 0], [0, 0, 0]]
+    board.current_player = 2
+    assert board.position.current_player == -1 and board.current_player == 2
+    board.grid = np.array([[1, 1, 0], [2, 2, 0], [0, 0, 0]])
+    board.current_player = 1
+    assert board.move_count == 4 and board.make_move(0, 2) and board.winner == 1
+    assert board.get_state_key() == "111220000"
+
+
+def test_subprocess_environment():
+    """Test de l'environnement vectorisé multi-processus (mémoire partagée)."""
+    print("\n" + "="*50)
+    print("TEST 17: Environnement multi-processus")
+    print("="*50)
+    
+    from vector_env import SubprocTicTacToeEnvironment
+    
+    rng = np.random.default_rng(0)
+    batch = BatchTicTacToeEnvironment(16)
+    
+    with SubprocTicTacToeEnvironment(16, num_workers=3) as env:
+        assert np.array_equal(env.reset(), batch.reset())
+        for i in range(200):
+            # Coups légaux aléatoires, avec quelques coups invalides
+            actions = (rng.random((16, 9)) * batch.get_available_actions_mask()).argmax(axis=1)
+            actions[rng.random(16) < 0.05] = 9
+            expected = batch.step_flat(actions)
+            
+            # Alternance des modes synchrone et asynchrone
+            if i % 2:
+                states, rewards, dones, info = env.step_flat(actions)
+            else:
+                env.step_async(actions)
+                states, rewards, dones, info = env.step_wait()
+            
+            assert np.array_equal(states, expected[0])
+            assert np.array_equal(rewards, expected[1])
+            assert np.array_equal(dones, expected[2])
+            assert np.array_equal(info['winner'], expected[3]['winner'])
+            assert np.array_equal(info['terminal_state'], expected[3]['terminal_state'])
+            assert np.array_equal(info['action_mask'], batch.get_available_actions_mask())
+            for key in ('player', 'invalid', 'is_draw'):
+                assert np.array_equal(info[key], expected[3][key]), key
+        
+        print(f"Parties jouées: {env.game_count}")
+        assert env.game_count == batch.game_count
+    
+    # Plateaux m,n,k: mêmes résultats que des environnements locaux
+    from mnk_board import MNKBoard
+    local = [TicTacToeEnvironment(board=MNKBoard(4, 4, 3)) for _ in range(6)]
+    with SubprocTicTacToeEnvironment(6, num_workers=2, mnk=(4, 4, 3)) as env:
+        states = env.reset()
+        for local_env in local:
+            local_env.reset()
+        for _ in range(60):
+            masks = env.get_available_actions_mask()
+            actions = (rng.random((6, 16)) * masks).argmax(axis=1)
+            actions[rng.random(6) < 0.05] = 0  # parfois une case occupée
+            states, rewards, dones, info = env.step_flat(actions)
+            for j, local_env in enumerate(local):
+                player = local_env.board.current_player
+                state, reward, done, local_info = local_env.step_flat(int(actions[j]))
+                assert np.array_equal(info['terminal_state'][j], state.ravel())
+                assert rewards[j] == reward and dones[j] == done
+                assert info['player'][j] == player
+                assert info['winner'][j] == (local_env.get_winner() or 0)
+                assert info['invalid'][j] == ('error' in local_info)
+                if done:
+                    local_env.reset()
+                assert np.array_equal(states[j], local_env.get_state().ravel())
+    
+    # Processus tué: erreur au pas suivant, close() libère quand même la mémoire
+    from multiprocessing import shared_memory
+    env = SubprocTicTacToeEnvironment(4, num_workers=2)
+    name = env._shm.name
+    env._processes[0].kill()
+    env._processes[0].join()
+    try:
+        env.step_flat(np.zeros(4, dtype=int))
+        assert False, "un processus mort doit être signalé"
+    except RuntimeError:
+        pass
+    env.close()
+    try:
+        shared_memory.SharedMemory(name=name).close()
+        assert False, "le bloc partagé aurait dû être libéré"
+    except FileNotFoundError:
+        pass
+
+
+def test_parallel_selfplay():
+    """Test de l'auto-apprentissage parallèle: trajectoires non vides et table modifiée."""
+    print("\n" + "="*50)
+    print("TEST 18: Auto-apprentissage parallèle")
+    print("="*50)
+    
+    import contextlib
+    import io
+    from qlearning_agent import QLearningAgent
+    from train import _selfplay_worker, _get_tables, parallel_selfplay, play_game, train_agent
+    
+    options = {"dense": True, "symmetric": False}
+    agent = QLearningAgent(player=1, **options)
+    trajectories = _selfplay_worker((_get_tables(agent), _get_tables(agent), options,
+                                     0.3, 20, 0))
+    assert len(trajectories) == 20
+    for moves, winner in trajectories:
+        assert 5 <= len(moves) <= 9 and winner in (1, -1, 0)
+    
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        trained = train_agent(episodes=2000, save_file=None, plot_progress=False,
+                              dense=True, workers=2, seed=0)
+    print(f"États appris: {trained.get_stats()['states_learned']}")
+    assert trained.get_stats()["states_learned"] > 100
+    assert np.abs(trained.q_values).sum() > 0
+    
+    # Même graine: mêmes parties; sans graine: parties différentes d'un appel à l'autre
+    def winners(seed):
+        agent1 = QLearningAgent(player=1, epsilon=0.3, **options)
+        agent2 = QLearningAgent(player=-1, epsilon=0.3, **options)
+        return list(parallel_selfplay(agent1, agent2, 200, 2, seed=seed, episodes_per_sync=50))
+    
+    assert winners(7) == winners(7)
+    assert winners(None) != winners(None)
+    
+    # Les agents reçoivent les lignes du graphe en lecture seule
+    class WritingAgent:
+        def choose_action(self, state, valid_actions, training=True):
+            state[0] = 1
+        def record_move(self, state, action):
+            pass
+    
+    try:
+        play_game(WritingAgent(), WritingAgent(), TicTacToeEnvironment(), training=False)
+        assert False, "la ligne du graphe devrait être en lecture seule"
+    except ValueError:
+        pass
+
+
+def test_dense_backend():
+    """Test de la table dense: mêmes valeurs que la table dict, plateau inconnu."""
+    print("\n" + "="*50)
+    print("TEST 19: Table Q dense")
+    print("="*50)
+    
+    import random
+    from qlearning_agent import QLearningAgent
+    from train import play_game
+    
+    def selfplay(dense):
+        random.seed(1)
+        agent1 = QLearningAgent(player=1, epsilon=0.3, dense=dense)
+        agent2 = QLearningAgent(player=-1, epsilon=0.3, dense=dense)
+        env = TicTacToeEnvironment()
+        # Peu de parties: en float32, des égalités de valeurs finissent par
+        # départager autrement qu'en float64 et les parties divergent
+        for _ in range(500):
+            play_game(agent1, agent2, env)
+        return agent1
+    
+    dense, table = selfplay(True), selfplay(False)
+    graph = dense.graph
+    assert np.count_nonzero(dense.q_values.any(axis=1)) == sum(v.any() for v in table.q_table.values())
+    for key, values in table.q_table.items():
+        state_id = graph.fast_id(np.frombuffer(key, dtype=int))
+        assert np.allclose(dense.q_values[state_id], values, atol=1e-5)
+    print(f"{len(table.q_table)} positions identiques")
+    
+    # Plateau hors du graphe (deux X de plus que de O): pas de ligne aliasée
+    unreachable = np.array([1, 1, 1, 0, 0, 0, 0, 0, 0])
+    before = dense.q_values.copy()
+    action = dense.choose_action(unreachable, [3, 4, 5], training=False)
+    assert action in (3, 4, 5)
+    assert not dense.get_q_values(dense.state_to_key(unreachable)).any()
+    try:
+        dense.record_move(unreachable, 3)
+        assert False, "record_move devrait refuser un plateau inatteignable"
+    except ValueError:
+        pass
+    assert np.array_equal(before, dense.q_values)
+
+
+def test_symmetric_backend():
+    """Test du mode symétrique: mêmes valeurs pour les 8 images d'un plateau."""
+    print("\n" + "="*50)
+    print("TEST 20: Table Q symétrique")
+    print("="*50)
+    
+    import random
+    from qlearning_agent import QLearningAgent
+    from symmetry import PERMS, transform_board
+    from train import play_game
+    
+    for dense in (True, False):
+        random.seed(2)
+        agent1 = QLearningAgent(player=1, epsilon=0.3, dense=dense, symmetric=True)
+        agent2 = QLearningAgent(player=-1, epsilon=0.3, dense=dense, symmetric=True)
+        env = TicTacToeEnvironment()
+        for _ in range(300):
+            play_game(agent1, agent2, env)
+        
+        # Q(T(s))[PERMS[t]] == Q(s): la case a de s devient PERMS[t][a] dans T(s)
+        states = agent1.graph.boards[:: 7].astype(int)
+        q = agent1.q_values_batch(states)
+        assert q.any()
+        for t, perm in enumerate(PERMS):
+            images = np.array([transform_board(s, t) for s in states])
+            q_images = agent1.q_values_batch(images)
+            assert np.allclose(q_images[:, list(perm)], q), f"transformation {t}"
+        
+        # Plateau hors du graphe: pas d'indice -1 dans les tables de symétrie
+        unreachable = np.array([1, 1, 1, 0, 0, 0, 0, 0, 0])
+        assert agent1.choose_action(unreachable, [3, 4, 5], training=False) in (3, 4, 5)
+        assert not agent1.q_values_batch(unreachable[None]).any()
+    print("8 transformations cohérentes (dense et dict)")
+
+
+def test_trajectory_log():
+    """Test du journal de parties: relecture, fin tronquée, apprentissage hors ligne."""
+    print("\n" + "="*50)
+    print("TEST 21: Journal de parties")
+    print("="*50)
+    
+    import random
+    import tempfile
+    from qlearning_agent import QLearningAgent, RandomAgent
+    from trajectory_log import TrajectoryLogger, chunk_files, game_moves, read_games
+    
+    random.seed(3)
+    env = TicTacToeEnvironment(record_history=True)
+    player = RandomAgent()
+    games = []
+    for _ in range(200):
+        env.reset()
+        done = False
+        while not done:
+            _, _, done, _ = env.step_flat(player.choose_action(env.get_state_flat(), env.get_available_actions_flat()))
+        games.append((game_moves(env), env.get_winner() or 0))
+    
+    with tempfile.TemporaryDirectory() as directory:
+        with TrajectoryLogger(directory, games_per_chunk=64, flush_every=10) as logger:
+            for moves, winner in games:
+                logger.log_game(moves, winner)
+        assert list(read_games(directory, cells=9)) == games
+        
+        # Partie coupée par un arrêt brutal: pas d'octet de résultat, ignorée
+        with open(chunk_files(directory)[-1], "ab") as f:
+            f.write(bytes([4, 0, 8]))
+        assert list(read_games(directory)) == games
+        
+        try:
+            list(read_games(directory, cells=225))
+            assert False, "un journal 3x3 ne doit pas se relire comme un 15x15"
+        except ValueError:
+            pass
+        
+        # Hors ligne: mêmes mises à jour que record_move / learn sur les mêmes parties
+        offline = QLearningAgent(player=-1, dense=True)
+        assert offline.learn_from_games(read_games(directory, cells=9)) == len(games)
+        replayed = QLearningAgent(player=-1, dense=True)
+        for moves, winner in games:
+            env.reset()
+            for action in moves:
+                if env.board.current_player == replayed.player:
+                    replayed.record_move(env.get_state_flat(), action)
+                env.step_flat(action)
+            replayed.learn(replayed.player * winner)
+        assert offline.q_values.any()
+        assert np.array_equal(offline.q_values, replayed.q_values)
+        assert np.array_equal(offline.visits, replayed.visits)
+    print(f"{len(games)} parties relues et rejouées")
+
+
+def test_learn_batch():
+    """Test de learn_batch: mêmes valeurs que learn() partie par partie."""
+    print("\n" + "="*50)
+    print("TEST 22: Apprentissage par lots")
+    print("="*50)
+    
+    import random
+    from qlearning_agent import QLearningAgent
+    
+    random.seed(4)
+    agent = QLearningAgent(player=1, dense=True)
+    graph = agent.graph
+    
+    # Parties aléatoires où X joue exactement 3 coups (fin au 5e ou 6e coup):
+    # une position revient toujours à la même distance de la fin, cas où
+    # learn_batch suit exactement l'ordre de learn()
+    episodes = []
+    while len(episodes) < 150:
+        state_id, ids, actions = 0, [], []
+        while graph.status[state_id] == 0:
+            action = random.choice(np.flatnonzero(graph.legal_mask[state_id]).tolist())
+            if graph.to_move[state_id] == 1:
+                ids.append(state_id)
+                actions.append(action)
+            state_id = graph.next_state[state_id, action]
+        if len(ids) == 3:
+            status = int(graph.status[state_id])
+            episodes.append((ids, actions, 0 if status == 2 else status))
+    # Parties répétées: les segments de clés identiques traversent plusieurs lignes
+    episodes += episodes[:40]
+    random.shuffle(episodes)
+    
+    # Colonnes de remplissage après la fin (lengths)
+    state_ids = np.array([ids + [0, 0] for ids, _, _ in episodes])
+    actions = np.array([a + [0, 0] for _, a, _ in episodes])
+    rewards = np.array([reward for _, _, reward in episodes], dtype=float)
+    batched = QLearningAgent(player=1, dense=True)
+    batched.learn_batch(state_ids, actions, rewards, np.full(len(episodes), 3))
+    
+    sequential = QLearningAgent(player=1, dense=True)
+    for ids, acts, reward in episodes:
+        for state_id, action in zip(ids, acts):
+            sequential.record_move(graph.boards[state_id], action)
+        sequential.learn(reward)
+    
+    assert sequential.q_values.any()
+    assert np.allclose(batched.q_values, sequential.q_values, atol=1e-5)
+    assert np.array_equal(batched.visits, sequential.visits)
+    
+    # Lot vide: rien à apprendre; backend dict refusé avant tout entraînement
+    before = batched.q_values.copy()
+    batched.learn_batch(np.zeros((0, 5), dtype=int), np.zeros((0, 5), dtype=int), [])
+    assert np.array_equal(before, batched.q_values)
+    from train import train_agent
+    try:
+        train_agent(10, save_file=None, plot_progress=False, batch_size=4)
+        assert False, "batch_size sans dense devrait être refusé"
+    except ValueError as e:
+        assert "dense" in str(e)
+    print(f"{len(episodes)} parties: learn_batch == learn()")
+
+
+def test_mcts_agent():
+    """Test de l'agent MCTS: coups forcés, réutilisation de l'arbre, serveur asynchrone."""
+    print("\n" + "="*50)
+    print("TEST 23: Agent MCTS")
+    print("="*50)
+    
+    import asyncio
+    import threading
+    from mcts_agent import MCTSAgent
+    from serving import MoveBatcher
+    
+    # X joue et gagne en 2
+    win = np.array([1, 1, 0, -1, -1, 0, 0, 0, 0])
+    agent = MCTSAgent(player=1, playouts=500, seed=0)
+    assert agent.choose_action(win, [2, 5, 6, 7, 8], training=False) == 2
+    
+    # O doit parer la menace en 2
+    block = np.array([1, 1, 0, 0, -1, 0, 0, 0, 0])
+    agent = MCTSAgent(player=-1, playouts=500, seed=0)
+    assert agent.choose_action(block, [2, 3, 5, 6, 7, 8], training=False) == 2
+    
+    # Arbre réutilisé d'un coup à l'autre de la même partie
+    agent = MCTSAgent(player=1, playouts=500, seed=0)
+    env = TicTacToeEnvironment()
+    env.step_flat(agent.choose_action(env.get_state_flat(), env.get_available_actions_flat()))
+    env.step_flat(env.get_available_actions_flat()[0])
+    agent.choose_action(env.get_state_flat(), env.get_available_actions_flat())
+    assert agent.reused == 1 and agent.searches == 2
+    
+    # Sans choose_action_batch, la recherche tourne hors de la boucle asyncio
+    threads = []
+    search = agent.choose_action
+    
+    def choose_action(*args, **kwargs):
+        threads.append(threading.current_thread())
+        return search(*args, **kwargs)
+    
+    agent.choose_action = choose_action
+    
+    async def serve():
+        batcher = MoveBatcher(agent, window=0)
+        await batcher.start()
+        try:
+            return await batcher.choose_action(block, [2, 3, 5, 6, 7, 8])
+        finally:
+            await batcher.stop()
+    
+    assert asyncio.run(serve()) == 2
+    assert threads and threads[0] is not threading.main_thread()
+    print(f"Coups forcés trouvés, arbre réutilisé ({agent.get_stats()['pool_nodes']} noeuds)")
+
+
+def test_search_agent():
+    """Test de l'agent de recherche: valeurs égales au minimax sans élagage."""
+    print("\n" + "="*50)
+    print("TEST 24: Agent de recherche")
+    print("="*50)
+    
+    from search_agent import SearchAgent
+    from state_graph import load_state_graph
+    
+    graph = load_state_graph()
+    values = {}
+    
+    def minimax(state_id):
+        """Valeur pour le joueur au trait: 1 + cases vides pour une victoire, 0 nul"""
+        if state_id not in values:
+            best = None
+            for action in np.flatnonzero(graph.legal_mask[state_id]).tolist():
+                child = int(graph.next_state[state_id, action])
+                if graph.status[child] == 2:
+                    value = 0
+                elif graph.status[child] != 0:
+                    value = 1 + int(np.count_nonzero(graph.boards[child] == 0))
+                else:
+                    value = -minimax(child)
+                best = value if best is None else max(best, value)
+            values[state_id] = best
+        return values[state_id]
+    
+    agent = SearchAgent()
+    # Plateau vide: partie nulle
+    assert agent.solve(graph.boards[0].astype(int))[0] == 0
+    assert minimax(0) == 0
+    
+    ongoing = np.flatnonzero(graph.status == 0)
+    for state_id in ongoing[::11].tolist():
+        board = graph.boards[state_id].astype(int)
+        value, best_move = agent.solve(board)
+        assert value == minimax(state_id), f"position {state_id}"
+        
+        # Le coup choisi atteint la valeur annoncée
+        child = int(graph.next_state[state_id, best_move])
+        assert child >= 0
+        if graph.status[child] == 0:
+            assert -minimax(child) == value
+    print(f"{len(ongoing[::11])} positions: negamax == minimax, plateau vide nul")
+
+
+def test_compiled_policy():
+    """Test de la politique compilée: même coup que l'agent source partout."""
+    print("\n" + "="*50)
+    print("TEST 25: Politique compilée")
+    print("="*50)
+    
+    import random
+    from policy_agent import PolicyAgent, compile_policy
+    from qlearning_agent import QLearningAgent
+    from search_agent import SearchAgent
+    from train import play_game
+    
+    random.seed(5)
+    agent1 = QLearningAgent(player=1, epsilon=0.3, dense=True)
+    agent2 = QLearningAgent(player=-1, epsilon=0.3, dense=True)
+    env = TicTacToeEnvironment()
+    for _ in range(300):
+        play_game(agent1, agent2, env)
+    
+    policy = PolicyAgent(compile_policy(agent1))
+    solver = SearchAgent()
+    graph = agent1.graph
+    states = graph.boards[graph.status == 0].astype(int)
+    q_values = agent1.q_values_batch(states)
+    compiled = policy.choose_action_batch(states, states == 0)
+    
+    learned = 0
+    for state, q_row, action in zip(states, q_values, compiled.tolist()):
+        valid_actions = np.flatnonzero(state == 0).tolist()
+        assert policy.choose_action(state, valid_actions) == action
+        if agent1.visits[agent1.state_to_key(state)] > 0:
+            # Égalités départagées au hasard par l'agent: même ensemble de coups
+            best = max(q_row[a] for a in valid_actions)
+            ties = [a for a in valid_actions if q_row[a] == best]
+            assert action in ties
+            if len(ties) == 1:
+                assert action == agent1.choose_action(state, valid_actions, training=False)
+            learned += 1
+        else:
+            assert action == solver.choose_action(state, valid_actions, training=False)
+    assert learned and policy.get_stats()["fallbacks"] == 0
+    print(f"{len(states)} positions ({learned} apprises), aucun repli")
+
+
+def test_model_format():
+    """Test du format .qtb: aller-retour, somme de contrôle, troncature, mmap."""
+    print("\n" + "="*50)
+    print("TEST 26: Format de modèle .qtb")
+    print("="*50)
+    
+    import random
+    import tempfile
+    import model_format
+    from qlearning_agent import QLearningAgent
+    from train import play_game
+    
+    random.seed(6)
+    agent1 = QLearningAgent(player=1, epsilon=0.3, dense=True)
+    agent2 = QLearningAgent(player=-1, epsilon=0.3)
+    env = TicTacToeEnvironment()
+    for _ in range(200):
+        play_game(agent1, agent2, env)
+    
+    def expect_error(filename, message):
+        try:
+            model_format.read_model(filename, mmap=False)
+            assert False, f"{filename} devrait être refusé"
+        except model_format.ModelFormatError as e:
+            assert message in str(e), str(e)
+    
+    with tempfile.TemporaryDirectory() as directory:
+        dense_file = os.path.join(directory, "dense.qtb")
+        dict_file = os.path.join(directory, "dict.qtb")
+        agent1.save(dense_file)
+        agent2.save(dict_file)
+        
+        # Aller-retour, dans les deux backends et avec ou sans mmap
+        for mmap in (False, True):
+            loaded = QLearningAgent(player=1, dense=True)
+            loaded.load(dense_file, mmap=mmap)
+            assert np.array_equal(loaded.q_values, agent1.q_values)
+            loaded = QLearningAgent(player=-1)
+            loaded.load(dict_file, mmap=mmap)
+            assert loaded.q_table.keys() == {k for k, v in agent2.q_table.items() if v.any()}
+            for key, values in loaded.q_table.items():
+                assert np.allclose(values, agent2.q_table[key], atol=1e-6)
+        
+        with open(dense_file, "rb") as f:
+            data = bytearray(f.read())
+        
+        # Un octet modifié dans les valeurs
+        corrupted = os.path.join(directory, "corrupted.qtb")
+        data[-5] ^= 0xFF
+        with open(corrupted, "wb") as f:
+            f.write(data)
+        expect_error(corrupted, "checksum mismatch")
+        data[-5] ^= 0xFF
+        
+        # Fichier coupé: en-tête ou sections
+        truncated = os.path.join(directory, "truncated.qtb")
+        for size in (20, len(data) - 100):
+            with open(truncated, "wb") as f:
+                f.write(data[:size])
+            expect_error(truncated, "truncated")
+        
+        # Table projetée en lecture seule: erreur explicite à l'apprentissage
+        served = QLearningAgent(player=1, dense=True)
+        served.load(dense_file, mmap=True)
+        served.record_move(served.graph.boards[0].astype(int), 4)
+        try:
+            served.learn(1.0)
+            assert False, "learn() ne doit pas écrire dans une table en lecture seule"
+        except ValueError as e:
+            assert "mmap=False" in str(e)
+        del served
+    print("Aller-retour, corruption et troncature détectées")
+
+
+def test_game_store():
+    """Test du stock de parties: éviction LRU, expiration TTL, /reset."""
+    print("\n" + "="*50)
+    print("TEST 27: Stock de parties du serveur")
+    print("="*50)
+    
+    import server
+    from qlearning_agent import RandomAgent
+    from session_store import GameStore
+    
+    now = [0.0]
+    games = GameStore(max_games=2, ttl=60.0, clock=lambda: now[0])
+    
+    # LRU: la partie la moins récemment utilisée part, pas la plus ancienne
+    first, second = games.create(), games.create()
+    now[0] = 10.0
+    assert games.get(first.game_id) is first
+    third = games.create()
+    assert games.get(second.game_id) is None
+    assert games.get(first.game_id) is first and games.get(third.game_id) is third
+    assert games.evicted_lru == 1 and len(games) == 2
+    
+    # TTL: inactive depuis plus de 60 s
+    now[0] = 65.0
+    assert games.get(third.game_id) is third
+    now[0] = 71.0
+    assert games.get(first.game_id) is None
+    assert games.get(third.game_id) is third
+    assert games.evicted_ttl == 1 and len(games) == 1
+    
+    # /reset: nouvelle partie à chaque appel, /move sur une partie expirée: 404
+    saved = server.games
+    server.games = GameStore(max_games=2, ttl=60.0, clock=lambda: now[0])
+    server.init(RandomAgent())
+    try:
+        client = server.app.test_client()
+        ids = [client.post("/reset").get_json()["game_id"] for _ in range(2)]
+        assert ids[0] != ids[1]
+        assert client.post("/reset").get_json()["board"] == [0] * 9
+        assert client.post("/move", json={"game_id": ids[0], "action": 4}).status_code == 404
+        assert client.post("/move", json={"game_id": ids[1], "action": 4}).status_code == 200
+        now[0] += 61.0
+        assert client.post("/move", json={"game_id": ids[1], "action": 0}).status_code == 404
+    finally:
+        server.games = saved
+    print("LRU, TTL et /reset vérifiés")
+
+
+def test_move_batcher():
+    """Test du micro-batching: requêtes simultanées, un seul appel vectorisé."""
+    print("\n" + "="*50)
+    print("TEST 28: Micro-batching des coups")
+    print("="*50)
+    
+    import asyncio
+    from serving import MoveBatcher
+    
+    class CountingAgent:
+        """Joue la première case libre et compte les appels"""
+        def __init__(self):
+            self.batch_sizes = []
+        
+        def choose_action_batch(self, states, valid_mask):
+            self.batch_sizes.append(len(states))
+            return np.argmax(valid_mask, axis=1)
+    
+    agent = CountingAgent()
+    
+    async def requests():
+        batcher = MoveBatcher(agent, window=0.01)
+        await batcher.start()
+        try:
+            # Requête i: seule la case i est libre, réponse attendue i
+            boards = [np.where(np.arange(9) == i, 0, 1) for i in range(9)]
+            return await asyncio.gather(*(
+                batcher.choose_action(board, [i]) for i, board in enumerate(boards)
+            )), batcher.get_stats()
+        finally:
+            await batcher.stop()
+    
+    actions, stats = asyncio.run(requests())
+    assert actions == list(range(9))
+    assert agent.batch_sizes == [9]
+    assert stats["batches"] == 1 and stats["requests"] == 9
+    
+    # Par le serveur asynchrone: /move simultanés sur 4 parties
+    from aiohttp.test_utils import TestClient, TestServer
+    from async_server import create_app
+    
+    agent.batch_sizes.clear()
+    
+    async def moves():
+        async with TestClient(TestServer(create_app(agent, window=0.01))) as client:
+            game_ids = []
+            for _ in range(4):
+                response = await client.post("/reset")
+                game_ids.append((await response.json())["game_id"])
+            responses = await asyncio.gather(*(
+                client.post("/move", json={"game_id": game_id, "action": cell})
+                for cell, game_id in enumerate(game_ids)
+            ))
+            return [await response.json() for response in responses]
+    
+    for cell, body in enumerate(asyncio.run(moves())):
+        # Réponse de l'agent: première case libre après le coup humain
+        assert body["ai_action"] == (1 if cell == 0 else 0), body
+    assert agent.batch_sizes == [4]
+    print(f"9 requêtes, {len(agent.batch_sizes)} appel choose_action_batch")
+
+
+def test_batch_routes():
+    """Test de /move_batch et /evaluate: erreurs de saisie, agent sans valeurs, cohérence avec /move."""
+    print("\n" + "="*50)
+    print("TEST 29: Routes d'analyse par lots")
+    print("="*50)
+    
+    import server
+    from policy_agent import PolicyAgent, compile_policy
+    from qlearning_agent import QLearningAgent
+    from search_agent import SearchAgent
+    
+    client = server.app.test_client()
+    server.init(QLearningAgent(player=-1, dense=True))
+    
+    # Plateaux mal formés: 400 avec un message
+    for body in ({}, {"boards": "x"}, {"boards": [[0] * 8]}, {"boards": [[2] + [0] * 8]}):
+        for route in ("/move_batch", "/evaluate"):
+            response = client.post(route, json=body)
+            assert response.status_code == 400, (route, body)
+            assert response.get_json()["error"]
+    
+    # Agent sans valeurs d'action: /evaluate n'est pas une erreur du client
+    server.init(SearchAgent())
+    response = client.post("/evaluate", json={"boards": [[0] * 9]})
+    assert response.status_code == 501
+    assert "no action values" in response.get_json()["error"]
+    
+    # /move_batch répond comme /move sur chaque premier coup humain,
+    # avec et sans choose_action_batch
+    for agent in (SearchAgent(), PolicyAgent(compile_policy(QLearningAgent(player=-1, dense=True)))):
+        server.init(agent)
+        boards = []
+        single = []
+        for cell in range(9):
+            game_id = client.post("/reset").get_json()["game_id"]
+            body = client.post("/move", json={"game_id": game_id, "action": cell}).get_json()
+            board = [0] * 9
+            board[cell] = 1
+            boards.append(board)
+            single.append(body["ai_action"])
+        batch = client.post("/move_batch", json={"boards": boards}).get_json()
+        assert batch["actions"] == single, (type(agent).__name__, batch["actions"], single)
+    print("Erreurs 400 / 501 et /move_batch == /move vérifiés")
+
+
+def test_state_graph_cache():
+    """Test du cache du graphe: un fichier par cache_file, dossier non inscriptible."""
+    print("\n" + "="*50)
+    print("TEST 30: Cache du graphe des positions")
+    print("="*50)
+    
+    import tempfile
+    import state_graph
+    from state_graph import load_state_graph
+    
+    reference = load_state_graph()
+    with tempfile.TemporaryDirectory() as directory:
+        # Un autre cache_file après la mémorisation: lu ou écrit quand même
+        cache_file = os.path.join(directory, "cache", "graph.npz")
+        graph = load_state_graph(cache_file)
+        assert os.path.exists(cache_file)
+        assert load_state_graph(cache_file) is graph
+        assert np.array_equal(graph.next_state, reference.next_state)
+        
+        # Relu depuis le disque, pas reconstruit
+        state_graph._graphs.pop(cache_file)
+        assert np.array_equal(load_state_graph(cache_file).boards, reference.boards)
+        
+        # Cache corrompu: reconstruit et réécrit
+        state_graph._graphs.pop(cache_file)
+        with open(cache_file, "wb") as f:
+            f.write(b"PK\x03\x04 truncated")
+        assert load_state_graph(cache_file).num_states == reference.num_states
+        assert state_graph.StateGraph.load(cache_file).num_states == reference.num_states
+        
+        # Dossier impossible à créer (sous un fichier): pas de cache, pas d'erreur
+        blocked = os.path.join(cache_file, "graph.npz")
+        assert load_state_graph(blocked).num_states == reference.num_states
+        assert not os.path.exists(blocked)
+        assert sorted(os.listdir(os.path.dirname(cache_file))) == ["graph.npz"]
+    
+    # Par défaut, hors du dossier du code
+    here = os.path.dirname(os.path.abspath(__file__))
+    assert os.path.dirname(state_graph.DEFAULT_CACHE_FILE) != here
+    print(f"Cache par défaut: {state_graph.DEFAULT_CACHE_FILE}")
+
 
 def run_all_tests():
     """Exécute tous les tests."""
@@ -171,6 +1332,30 @@ def run_all_tests():
     test_invalid_move()
     test_available_actions()
     test_state_representations()
+    test_batch_environment()
+    test_compiled_environment()
+    test_step_metrics()
+    test_step_fast()
+    test_undo_move()
+    test_mnk_environment()
+    test_cli_startup()
+    test_tournament()
+    test_checkpoint_resume()
+    test_shared_core()
+    test_subprocess_environment()
+    test_parallel_selfplay()
+    test_dense_backend()
+    test_symmetric_backend()
+    test_trajectory_log()
+    test_learn_batch()
+    test_mcts_agent()
+    test_search_agent()
+    test_compiled_policy()
+    test_model_format()
+    test_game_store()
+    test_move_batcher()
+    test_batch_routes()
+    test_state_graph_cache()
     
     
     
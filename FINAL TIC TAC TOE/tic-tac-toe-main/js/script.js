@@ -13,6 +13,7 @@ document.addEventListener('DOMContentLoaded', () => {
     let difficulty = 'easy';
     let moveHistory = [];
     let redoStack = [];
+    let gameId = null;  // server-side game session
     
     const stats = {
         player: 0,
@@ -71,7 +72,8 @@ document.addEventListener('DOMContentLoaded', () => {
 
     modal.classList.add('hidden');
 
-    await fetch("http://127.0.0.1:5000/reset", { method: "POST" });
+    const resetResponse = await fetch("http://127.0.0.1:5000/reset", { method: "POST" });
+    gameId = (await resetResponse.json()).game_id;
 
     if (currentPlayer === aiSymbol) {
         makeAiMove();
@@ -172,7 +174,7 @@ document.addEventListener('DOMContentLoaded', () => {
         const response = await fetch("http://127.0.0.1:5000/move", {
             method: "POST",
             headers: {"Content-Type": "application/json"},
-            body: JSON.stringify({ action: lastHumanMove })
+            body: JSON.stringify({ game_id: gameId, action: lastHumanMove })
         });
 
         const data = await response.json();
@@ -0,0 +1,177 @@
+"""
+Single entry point: python tictactoe.py <train|eval|tournament|serve|bench|export> ...
+
+Only argparse is imported at startup. Each subcommand imports what it
+needs (NumPy, agents, Flask/aiohttp, tqdm, matplotlib) inside its handler,
+so `--help` and argument errors answer immediately, and models are loaded
+only by the subcommand that was asked for.
+"""
+
+import argparse
+import sys
+
+
+# Wall-clock budget for `tictactoe.py --help` and `<subcommand> --help`,
+# interpreter start included (checked by TEST 13 in test_env.py when
+# TICTACTOE_CHECK_STARTUP=1; the heavy-module check always runs)
+STARTUP_BUDGET_MS = 250
+
+# Never imported by the parser itself
+HEAVY_MODULES = ("numpy", "tqdm", "matplotlib", "flask", "aiohttp")
+
+
+# --------------------------------------------------
+# SUBCOMMANDS
+# --------------------------------------------------
+
+def cmd_train(args) -> int:
+    import train
+
+    if args.offline:
+        train.train_offline(args.offline, save_file=args.save, dense=args.dense,
+                            symmetric=args.symmetric, batch_size=args.batch_size or 4096)
+        return 0
+
+    train.train_agent(episodes=args.episodes, save_file=args.save,
+                      plot_progress=not args.no_plot, dense=args.dense,
+                      symmetric=args.symmetric, workers=args.workers,
+                      seed=args.seed, log_dir=args.log_dir,
+                      batch_size=args.batch_size,
+                      checkpoint_dir=args.checkpoint_dir,
+                      checkpoint_every=args.checkpoint_every,
+                      resume=args.resume)
+    return 0
+
+
+def cmd_eval(args) -> int:
+    from train import test_agent
+    from tournament import SPRT
+
+    sprt = SPRT(args.elo0, args.elo1) if args.sprt else None
+    test_agent(args.model, games=args.games, opponent=args.opponent,
+               workers=args.workers, sprt=sprt)
+    return 0
+
+
+def cmd_tournament(args) -> int:
+    from tournament import SPRT, round_robin
+
+    sprt = SPRT(args.elo0, args.elo1) if args.sprt else None
+    round_robin(args.agents, games_per_pair=args.games, workers=args.workers,
+                sprt=sprt, seed=args.seed, anchor=args.anchor)
+    return 0
+
+
+def cmd_serve(args) -> int:
+    if args.use_async:
+        from aiohttp import web
+        from async_server import create_app
+
+        web.run_app(create_app(), port=args.port)
+        return 0
+
+    import server
+
+    server.init()
+    server.app.run(port=args.port, debug=args.debug)
+    return 0
+
+
+def cmd_bench(args) -> int:
+    import bench
+
+    return bench.main(args.bench_args)
+
+
+def cmd_export(args) -> int:
+    from qlearning_agent import QLearningAgent
+
+    agent = QLearningAgent(player=-1, dense=True)
+    if args.output.endswith(".bin"):
+        from policy_agent import compile_policy, save_policy
+
+        agent.load(args.model)
+        save_policy(args.output, compile_policy(agent))
+    elif args.output.endswith(".qtb"):
+        agent.load(args.model)
+        agent.save(args.output)
+    else:
+        print(f"unknown export format: {args.output} (expected .qtb or .bin)", file=sys.stderr)
+        return 2
+
+    print(f"Wrote {args.output}")
+    return 0
+
+
+# --------------------------------------------------
+# PARSER
+# --------------------------------------------------
+
+def add_match_options(parser: argparse.ArgumentParser):
+    parser.add_argument("--workers", type=int, default=1, help="processes playing games")
+    parser.add_argument("--sprt", action="store_true", help="stop once the SPRT is decided")
+    parser.add_argument("--elo0", type=float, default=0.0, help="SPRT H0 Elo")
+    parser.add_argument("--elo1", type=float, default=50.0, help="SPRT H1 Elo")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="tictactoe", description="Tic-Tac-Toe agents: training, evaluation and serving")
+    commands = parser.add_subparsers(dest="command", metavar="command")
+    commands.required = True
+
+    p = commands.add_parser("train", help="train a Q-learning agent by self-play (or from a trajectory log)")
+    p.add_argument("episodes", type=int, nargs="?", default=50000)
+    p.add_argument("--save", default="trained_agent.pkl", help="output model (.pkl or .qtb)")
+    p.add_argument("--dense", action="store_true", help="dense Q-table over the state graph")
+    p.add_argument("--symmetric", action="store_true", help="share values between symmetric positions")
+    p.add_argument("--workers", type=int, default=1, help="parallel self-play processes")
+    p.add_argument("--batch-size", type=int, default=None, help="vectorized self-play batch (dense only)")
+    p.add_argument("--seed", type=int, default=None)
+    p.add_argument("--log-dir", default=None, help="record every game to this trajectory log")
+    p.add_argument("--offline", metavar="LOG_DIR", default=None, help="learn from a trajectory log without playing")
+    p.add_argument("--no-plot", action="store_true", help="skip the training progress plot")
+    p.add_argument("--checkpoint-dir", default=None, help="append delta checkpoints to this directory")
+    p.add_argument("--checkpoint-every", type=int, default=5000, help="episodes between checkpoints")
+    p.add_argument("--resume", action="store_true", help="continue from the latest checkpoint")
+    p.set_defaults(func=cmd_train)
+
+    p = commands.add_parser("eval", help="play a model against an opponent on both colors")
+    p.add_argument("model", help="trained_agent.pkl, .qtb or compiled policy .bin")
+    p.add_argument("--games", type=int, default=1000, help="maximum number of games")
+    p.add_argument("--opponent", default="random", help="random, search, mcts[:playouts] or a model file")
+    add_match_options(p)
+    p.set_defaults(func=cmd_eval)
+
+    p = commands.add_parser("tournament", help="round robin between agents, with Elo ratings")
+    p.add_argument("agents", nargs="+", help="random, search, mcts[:playouts] or model files")
+    p.add_argument("--games", type=int, default=1000, help="maximum number of games per pair")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--anchor", default=None, help="agent rated 0 (default: the first one)")
+    add_match_options(p)
+    p.set_defaults(func=cmd_tournament)
+
+    p = commands.add_parser("serve", help="run the HTTP game server")
+    p.add_argument("--async", dest="use_async", action="store_true", help="aiohttp server with move batching")
+    p.add_argument("--port", type=int, default=5000)
+    p.add_argument("--debug", action="store_true", help="Flask debug mode")
+    p.set_defaults(func=cmd_serve)
+
+    p = commands.add_parser("bench", help="run the benchmarks against bench_baseline.json")
+    p.add_argument("bench_args", nargs=argparse.REMAINDER, help="--threshold X, --update-baseline")
+    p.set_defaults(func=cmd_bench)
+
+    p = commands.add_parser("export", help="convert a model to .qtb or compile it to a policy .bin")
+    p.add_argument("model", help="trained_agent.pkl or .qtb")
+    p.add_argument("output", help="output file, .qtb or .bin")
+    p.set_defaults(func=cmd_export)
+
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,88 +5,173 @@ Core board representation and game rules
 import numpy as np
 from typing import List, Tuple, Optional
 
+import bitboard
+from board import Board as SignedBoard
+
+
+class _Grid(np.ndarray):
+    """
+    0 / 1 / 2 copy of a Board's grid whose item writes (board.grid[r, c] = v,
+    also through slices) are written back to the board
+    """
+
+    def __array_finalize__(self, obj):
+        self._board = getattr(obj, "_board", None)
+        self._root = getattr(obj, "_root", None)
+
+    def __setitem__(self, index, value):
+        super().__setitem__(index, value)
+        root = self._root
+        if self._board is not None and root is not None and np.shares_memory(self, root):
+            self._board.grid = root.view(np.ndarray)
+
 
 class Board:
-    """Represents the tic-tac-toe board state"""
+    """
+    Represents the tic-tac-toe board state (0: empty, 1: X, 2: O)
+
+    A thin adapter over board.Board, the environment's engine (1 / -1):
+    moves, win checks and undo run on its bitboards and line sums, and state
+    keys are read from the bitboards. Board(position=env.board) views an
+    environment board in this encoding without copying it, and
+    Board(env=env) follows the environment's current board even after
+    step_fast; `position` goes the other way. Everything, the winner
+    included, is read from the shared position, so moves played on either
+    side are seen by both.
+    """
+    
+    def __init__(self, position: Optional[SignedBoard] = None, env=None):
+        if env is not None:
+            if env.compiled or env.mnk:
+                # A compiled environment keeps its position in state_id:
+                # moves made through a view of its board would be lost
+                raise ValueError("Board(env=...) needs a 3x3 TicTacToeEnvironment(compiled=False)")
+            position = None
+        self._env = env
+        self._position = position if position is not None or env is not None else SignedBoard()
     
-    def __init__(self):
-        self.grid = np.zeros((3, 3), dtype=int)  # 0: empty, 1: X, 2: O
-        self.current_player = 1  # X starts
-        self.winner = None
-        self.move_count = 0
+    @property
+    def position(self) -> SignedBoard:
+        """The shared engine board (the environment's current one for Board(env=...))"""
+        if self._env is not None:
+            return self._env.board
+        return self._position
         
     def reset(self):
         """Reset the board to initial state"""
-        self.grid = np.zeros((3, 3), dtype=int)
-        self.current_player = 1
-        self.winner = None
-        self.move_count = 0
+        self.position.reset()
+    
+    @property
+    def grid(self) -> np.ndarray:
+        """The board in 0 / 1 / 2 encoding; item writes go back to the board"""
+        grid = self.position.grid
+        view = np.where(grid < 0, 2, grid).view(_Grid)
+        view._board = self
+        view._root = view
+        return view
+    
+    @grid.setter
+    def grid(self, grid: np.ndarray):
+        """Place a whole 0 / 1 / 2 grid (keeps the player to move, clears the undo stack)"""
+        grid = np.asarray(grid, dtype=int).reshape(3, 3)
+        position = self.position
+        position.set_position(np.where(grid == 2, -1, grid), position.current_player)
+    
+    @property
+    def current_player(self) -> int:
+        return 1 if self.position.current_player == 1 else 2
+    
+    @current_player.setter
+    def current_player(self, player: int):
+        self.position.current_player = 1 if player == 1 else -1
+    
+    @property
+    def move_count(self) -> int:
+        return 9 - self.position.empty_count
+    
+    @move_count.setter
+    def move_count(self, count: int):
+        # Kept for code that reset the counter by hand: it follows the grid
+        if count != self.move_count:
+            raise ValueError(f"move_count follows the grid ({self.move_count} stones): set grid instead")
+    
+    @property
+    def winner(self) -> Optional[int]:
+        """1 or 2, 0 for a draw, None while the game goes on"""
+        position = self.position
+        winner = position.winner()
+        if winner is not None:
+            return 1 if winner == 1 else 2
+        if position.empty_count == 0:
+            return 0
+        return None
+    
+    @property
+    def line_sums(self) -> List[int]:
+        """Signed sums of the 8 lines (X +1, O -1)"""
+        return self.position.line_sums
         
     def get_valid_moves(self) -> List[Tuple[int, int]]:
         """Return list of valid (row, col) positions"""
-        return [(r, c) for r in range(3) for c in range(3) if self.grid[r, c] == 0]
+        return [divmod(idx, 3) for idx in bitboard.legal_actions(*self.position.get_bits())]
     
     def make_move(self, row: int, col: int) -> bool:
         """
         Make a move at (row, col) for current player
         Returns True if move was valid, False otherwise
         """
-        if self.grid[row, col] != 0 or self.is_game_over():
+        idx = row * 3 + col
+        if self.is_game_over() or not (0 <= row < 3 and 0 <= col < 3) or not self.position.is_legal(idx):
             return False
         
-        self.grid[row, col] = self.current_player
-        self.move_count += 1
-        
-        # Check for winner
-        if self._check_winner(self.current_player):
-            self.winner = self.current_player
-        elif self.move_count == 9:
-            self.winner = 0  # Draw
-            
-        # Switch player
-        self.current_player = 3 - self.current_player  # Toggle between 1 and 2
-        
+        self.position.make(idx)
         return True
     
+    def undo_move(self) -> Optional[Tuple[int, int]]:
+        """
+        Take back the last move, so search code can explore in place
+        instead of cloning. Returns the freed (row, col), or None
+        """
+        idx = self.position.undo()
+        return None if idx is None else divmod(idx, 3)
+    
+    def last_move_won(self) -> bool:
+        """Check in O(1) whether the last move completed a line"""
+        return self.position.last_move_won()
+    
     def is_game_over(self) -> bool:
         """Check if game is finished"""
         return self.winner is not None
     
     def _check_winner(self, player: int) -> bool:
         """Check if specified player has won"""
-        # Check rows
-        for row in range(3):
-            if all(self.grid[row, :] == player):
-                return True
-        
-        # Check columns
-        for col in range(3):
-            if all(self.grid[:, col] == player):
-                return True
-        
-        # Check diagonals
-        if all(self.grid[i, i] == player for i in range(3)):
-            return True
-        if all(self.grid[i, 2-i] == player for i in range(3)):
-            return True
-        
-        return False
+        x_bits, o_bits = self.position.get_bits()
+        return bitboard.is_win(x_bits if player == 1 else o_bits)
     
     def get_state_key(self) -> str:
         """
         Get unique string representation of board state
         Used as key for Q-table
         """
-        return ''.join(str(int(x)) for row in self.grid for x in row)
+        return self.position.state_key()
+    
+    def get_state_code(self) -> int:
+        """Base-3 code of the state, the key of state_graph / .qtb tables"""
+        return self.position.code()
+    
+    @classmethod
+    def from_state_key(cls, key: str) -> 'Board':
+        """Board for a get_state_key string (no move history)"""
+        grid = bitboard.to_flat(*bitboard.from_state_key(key))
+        position = SignedBoard()
+        position.set_position(grid, 1 if np.count_nonzero(grid) % 2 == 0 else -1)
+        return cls(position)
     
     def clone(self) -> 'Board':
-        """Create a copy of this board"""
-        new_board = Board()
-        new_board.grid = self.grid.copy()
-        new_board.current_player = self.current_player
-        new_board.winner = self.winner
-        new_board.move_count = self.move_count
-        return new_board
+        """Create a copy of this board (make_move/undo_move avoid the copy)"""
+        position = SignedBoard()
+        position.copy_from(self.position)
+        return Board(position)
     
     def get_reward(self, player: int) -> float:
         """
@@ -0,0 +1,345 @@
+"""
+Tournament and evaluation harness
+Matches between any agents on both colors, played across a process pool,
+with Elo estimates, confidence intervals and SPRT early stopping
+
+Agents are given as specs so workers can build them:
+    "random", "search", "mcts" or "mcts:<playouts>",
+    or a model file (trained_agent.pkl, .qtb, or a compiled policy .bin)
+"""
+
+import math
+import multiprocessing
+import random
+from dataclasses import dataclass
+from itertools import combinations
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from game import TicTacToeEnvironment
+from train import play_game
+
+
+# --------------------------------------------------
+# AGENTS
+# --------------------------------------------------
+
+def make_agent(spec: str, player: int, seed: Optional[int] = None):
+    """Agent playing `player` (1 = X, -1 = O) for an agent spec"""
+    if spec == "random":
+        from qlearning_agent import RandomAgent
+        return RandomAgent()
+
+    if spec == "search":
+        from search_agent import SearchAgent
+        return SearchAgent(player=player)
+
+    if spec == "mcts" or spec.startswith("mcts:"):
+        from mcts_agent import MCTSAgent
+        _, _, playouts = spec.partition(":")
+        return MCTSAgent(player=player, playouts=int(playouts or 2000), seed=seed)
+
+    if spec.endswith(".bin"):
+        from policy_agent import PolicyAgent
+        return PolicyAgent.from_file(spec)
+
+    import model_format
+    from qlearning_agent import QLearningAgent
+
+    agent = QLearningAgent(player=player, epsilon=0.0, dense=model_format.is_model_file(spec))
+    agent.load(spec, mmap=True)
+    return agent
+
+
+# Per-process cache: a worker loads each model once, not once per chunk
+_agents: Dict[Tuple[str, int], object] = {}
+
+
+def _cached_agent(spec: str, player: int, seed: int):
+    """
+    Agent for spec from the cache, reseeded for this chunk: its play then
+    only depends on the chunk seed, not on which chunks (or matches) the
+    process handled before
+    """
+    key = (spec, player)
+    if key not in _agents:
+        _agents[key] = make_agent(spec, player, seed)
+    agent = _agents[key]
+    if hasattr(agent, "reseed"):
+        agent.reseed(seed)
+    return agent
+
+
+# --------------------------------------------------
+# PLAYING
+# --------------------------------------------------
+
+def _match_worker(args) -> Tuple[int, int, int]:
+    """
+    Play one chunk of games between spec_a and spec_b, alternating colors
+    (spec_a is X in even games). Returns (wins, draws, losses) for spec_a.
+    """
+    spec_a, spec_b, games, seed = args
+
+    random.seed(seed)
+    np.random.seed(seed % 2**32)
+    env = TicTacToeEnvironment()
+
+    agents_a = {side: _cached_agent(spec_a, side, seed) for side in (1, -1)}
+    agents_b = {side: _cached_agent(spec_b, side, seed) for side in (1, -1)}
+
+    wins = draws = losses = 0
+    for game in range(games):
+        a_side = 1 if game % 2 == 0 else -1
+        agent_a = agents_a[a_side]
+        agent_b = agents_b[-a_side]
+        if a_side == 1:
+            winner = play_game(agent_a, agent_b, env, training=False)
+        else:
+            winner = play_game(agent_b, agent_a, env, training=False)
+
+        if winner == a_side:
+            wins += 1
+        elif winner == 0:
+            draws += 1
+        else:
+            losses += 1
+    return wins, draws, losses
+
+
+def _chunk_results(spec_a: str, spec_b: str, max_games: int, chunk: int,
+                   workers: int, seed: int) -> Iterator[Tuple[int, int, int]]:
+    """Chunk results in chunk order, so where SPRT stops only depends on seed"""
+    jobs = ((spec_a, spec_b, min(chunk, max_games - start), seed * 1_000_003 + i)
+            for i, start in enumerate(range(0, max_games, chunk)))
+
+    if workers <= 1:
+        for job in jobs:
+            yield _match_worker(job)
+        return
+
+    with multiprocessing.Pool(workers) as pool:
+        # Leaving the with block (early stop) terminates the pending chunks
+        yield from pool.imap(_match_worker, jobs)
+
+
+# --------------------------------------------------
+# STATISTICS
+# --------------------------------------------------
+
+def score_to_elo(score: float) -> float:
+    """Elo difference for an expected score in (0, 1)"""
+    return -400.0 * math.log10(1.0 / score - 1.0) + 0.0  # no "-0" for even scores
+
+
+def elo_to_score(elo: float) -> float:
+    return 1.0 / (1.0 + 10.0 ** (-elo / 400.0))
+
+
+def _score_stats(wins: int, draws: int, losses: int) -> Tuple[float, float]:
+    """Mean score and per-game score variance (trinomial)"""
+    games = wins + draws + losses
+    score = (wins + 0.5 * draws) / games
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2
+                + losses * score ** 2) / games
+    return score, variance
+
+
+def elo_interval(wins: int, draws: int, losses: int,
+                 confidence: float = 0.95) -> Tuple[float, float, float]:
+    """
+    (elo, low, high) for the first player of a W/D/L record.
+
+    Scores of exactly 0 or 1 (e.g. search vs random) are clamped to half
+    a game from the edge, so the estimate stays finite.
+    """
+    games = wins + draws + losses
+    score, variance = _score_stats(wins, draws, losses)
+    z = math.sqrt(2.0) * _erfinv(confidence)
+    margin = z * math.sqrt(variance / games)
+
+    edge = 0.5 / games
+
+    def clamp(s):
+        return min(max(s, edge), 1.0 - edge)
+
+    return (score_to_elo(clamp(score)),
+            score_to_elo(clamp(score - margin)),
+            score_to_elo(clamp(score + margin)))
+
+
+def _erfinv(y: float) -> float:
+    """Inverse error function (Newton on math.erf)"""
+    x = 0.0
+    for _ in range(50):
+        step = (math.erf(x) - y) / (2.0 / math.sqrt(math.pi) * math.exp(-x * x))
+        x -= step
+        if abs(step) < 1e-12:
+            break
+    return x
+
+
+@dataclass
+class SPRT:
+    """
+    Sequential probability ratio test of H0: elo <= elo0 against
+    H1: elo >= elo1, with the usual normal approximation of the
+    log-likelihood ratio over the trinomial W/D/L record.
+    """
+    elo0: float = 0.0
+    elo1: float = 50.0
+    alpha: float = 0.05
+    beta: float = 0.05
+
+    @property
+    def bounds(self) -> Tuple[float, float]:
+        return (math.log(self.beta / (1 - self.alpha)),
+                math.log((1 - self.beta) / self.alpha))
+
+    def llr(self, wins: int, draws: int, losses: int) -> float:
+        games = wins + draws + losses
+        if games == 0:
+            return 0.0
+        score, variance = _score_stats(wins, draws, losses)
+        # All games with the same result: no information on the spread yet,
+        # assume the spread of a single decisive game in each direction
+        variance = max(variance, 0.25 / games)
+        s0, s1 = elo_to_score(self.elo0), elo_to_score(self.elo1)
+        return games * (s1 - s0) * (2 * score - s0 - s1) / (2 * variance)
+
+    def decide(self, wins: int, draws: int, losses: int) -> Optional[str]:
+        """'H1' (elo1 accepted), 'H0' (elo0 accepted) or None (keep playing)"""
+        lower, upper = self.bounds
+        llr = self.llr(wins, draws, losses)
+        if llr >= upper:
+            return "H1"
+        if llr <= lower:
+            return "H0"
+        return None
+
+
+# --------------------------------------------------
+# MATCHES
+# --------------------------------------------------
+
+@dataclass
+class MatchResult:
+    agent_a: str
+    agent_b: str
+    wins: int = 0
+    draws: int = 0
+    losses: int = 0
+    sprt: Optional[str] = None  # 'H0', 'H1' or None if not decided / not run
+
+    @property
+    def games(self) -> int:
+        return self.wins + self.draws + self.losses
+
+    @property
+    def score(self) -> float:
+        return (self.wins + 0.5 * self.draws) / max(self.games, 1)
+
+    def elo(self, confidence: float = 0.95) -> Tuple[float, float, float]:
+        return elo_interval(self.wins, self.draws, self.losses, confidence)
+
+    def __str__(self) -> str:
+        elo, low, high = self.elo()
+        text = (f"{self.agent_a} vs {self.agent_b}: +{self.wins} ={self.draws} -{self.losses} "
+                f"({self.games} games) Elo {elo:+.0f} [{low:+.0f}, {high:+.0f}]")
+        if self.sprt:
+            text += f" SPRT {self.sprt}"
+        return text
+
+
+def run_match(spec_a: str, spec_b: str, max_games: int = 1000, workers: int = 1,
+              chunk: int = 100, sprt: Optional[SPRT] = None, seed: int = 0) -> MatchResult:
+    """
+    Play up to max_games between two agents, half with each color.
+
+    With an SPRT, results are checked after every chunk and the match stops
+    as soon as the test is decided: clear-cut matches end after a few
+    chunks instead of max_games.
+    """
+    chunk += chunk % 2  # whole color pairs per chunk
+    result = MatchResult(spec_a, spec_b)
+
+    for wins, draws, losses in _chunk_results(spec_a, spec_b, max_games, chunk, workers, seed):
+        result.wins += wins
+        result.draws += draws
+        result.losses += losses
+        if sprt is not None:
+            result.sprt = sprt.decide(result.wins, result.draws, result.losses)
+            if result.sprt:
+                break
+
+    return result
+
+
+def fit_ratings(matches: Sequence[MatchResult], anchor: Optional[str] = None,
+                iterations: int = 1000) -> Dict[str, float]:
+    """
+    Elo of every agent from all pairwise results (Bradley-Terry fit,
+    draws counted as half a win each way). The anchor (default: the first
+    agent) is rated 0.
+    """
+    names: List[str] = []
+    for match in matches:
+        for name in (match.agent_a, match.agent_b):
+            if name not in names:
+                names.append(name)
+    index = {name: i for i, name in enumerate(names)}
+
+    n = len(names)
+    points = np.full(n, 0.5)  # half a point prior: keeps all-win / all-loss agents finite
+    games = np.zeros((n, n))
+    for match in matches:
+        a, b = index[match.agent_a], index[match.agent_b]
+        points[a] += match.wins + 0.5 * match.draws
+        points[b] += match.losses + 0.5 * match.draws
+        games[a, b] += match.games
+        games[b, a] += match.games
+    games += 1.0 / max(n - 1, 1) * (1 - np.eye(n))
+
+    # Minorization-maximization updates of the strengths
+    strength = np.ones(n)
+    for _ in range(iterations):
+        pair = games / (strength[:, None] + strength[None, :])
+        updated = points / pair.sum(axis=1)
+        updated /= np.exp(np.log(updated).mean())
+        if np.allclose(updated, strength, rtol=1e-10):
+            break
+        strength = updated
+
+    elo = 400.0 * np.log10(strength)
+    elo -= elo[index[anchor or names[0]]]
+    return {name: float(elo[index[name]]) for name in names}
+
+
+def round_robin(specs: Sequence[str], games_per_pair: int = 1000, workers: int = 1,
+                chunk: int = 100, sprt: Optional[SPRT] = None, seed: int = 0,
+                anchor: Optional[str] = None) -> Tuple[List[MatchResult], Dict[str, float]]:
+    """Every pair of agents plays a match; returns the matches and fitted ratings"""
+    matches = []
+    for pair_index, (spec_a, spec_b) in enumerate(combinations(specs, 2)):
+        match = run_match(spec_a, spec_b, games_per_pair, workers, chunk, sprt,
+                          seed=seed * 1009 + pair_index)
+        print(match)
+        matches.append(match)
+
+    ratings = fit_ratings(matches, anchor)
+    print("\nRatings")
+    for name, elo in sorted(ratings.items(), key=lambda item: -item[1]):
+        print(f"  {elo:+7.0f}  {name}")
+    return matches, ratings
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 3:
+        print("Usage: python tournament.py <agent> <agent> [<agent> ...]")
+        sys.exit(1)
+
+    round_robin(sys.argv[1:], games_per_pair=1000, workers=multiprocessing.cpu_count(),
+                sprt=SPRT())
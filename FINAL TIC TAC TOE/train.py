@@ -3,39 +3,116 @@ Training Script for Q-Learning Agent
 Compatible with TicTacToeEnvironment
 """
 
+import random
+import time
+import multiprocessing
+
 import numpy as np
-import matplotlib.pyplot as plt
-from tqdm import tqdm
 
 from game import TicTacToeEnvironment
-from qlearning_agent import QLearningAgent, RandomAgent
+from qlearning_agent import QLearningAgent
+import metrics
+from trajectory_log import TrajectoryLogger, read_batches, game_moves
+from state_graph import load_state_graph, STATUS_ONGOING
+from checkpoint import CheckpointLog
 
 
 # --------------------------------------------------
 # PLAY ONE GAME
 # --------------------------------------------------
 
-def play_game(agent1, agent2, env: TicTacToeEnvironment, training=True):
+def play_game(agent1, agent2, env: TicTacToeEnvironment, training=True,
+              logger: TrajectoryLogger = None):
     """
     agent1 plays as X (1)
     agent2 plays as O (-1)
 
+    With a logger, the game is appended to the trajectory log; on 3x3 the
+    moves come from the step_fast history, so the environment must be
+    created with record_history=True.
+
     Returns:
         winner: 1 (agent1), -1 (agent2), 0 (draw)
     """
 
-    state = env.reset()
+    timed = metrics.ENABLED
+    if timed:
+        start = metrics.perf_counter()
+
+    env.reset()
+    if env.mnk:
+        moves = _play_moves(agent1, agent2, env, training)
+    else:
+        moves = _play_moves_fast(agent1, agent2, env, training)
+
+    # -------- GAME OVER --------
+
+    winner = env.get_winner()
+
+    if training:
+        learn_from_winner(agent1, agent2, winner)
+
+    if logger is not None:
+        logger.log_game(game_moves(env), winner)
+
+    if timed:
+        metrics.observe("play_game_seconds", metrics.perf_counter() - start)
+        metrics.inc("games_played_total")
+        metrics.inc("moves_total", moves)
+
+    return 0 if winner is None else winner
+
+
+def _play_moves_fast(agent1, agent2, env: TicTacToeEnvironment, training) -> int:
+    """3x3 move loop on state-graph ids; returns the number of moves"""
+
     done = False
+    moves = 0
+
+    # Allocation-free stepping: positions are state-graph ids, and agents
+    # get the graph's (9,) board rows (read-only views) instead of fresh copies
+    graph = env.get_graph()
+    state_id = env.state_id
 
     while not done:
 
-        current_player = env.board.current_player
-        current_agent = agent1 if current_player == 1 else agent2
+        current_agent = agent1 if graph.to_move[state_id] == 1 else agent2
+
+        state = graph.boards[state_id]
+        valid_actions = graph.legal_actions[state_id]
+
+        action = current_agent.choose_action(
+            state,
+            valid_actions,
+            training=training
+        )
+
+        if action is None:
+            break
+
+        current_agent.record_move(state, action)
+
+        state_id, reward, done = env.step_fast(action)
+        moves += 1
+
+    return moves
+
+
+def _play_moves(agent1, agent2, env: TicTacToeEnvironment, training) -> int:
+    """Move loop for any board size (m,n,k environments)"""
+
+    state = env.get_state_flat()
+    done = False
+    moves = 0
+
+    while not done:
+
+        current_agent = agent1 if env.board.current_player == 1 else agent2
 
         valid_actions = env.get_available_actions_flat()
 
         action = current_agent.choose_action(
-            state.flatten(),
+            state,
             valid_actions,
             training=training
         )
@@ -43,30 +120,194 @@ def play_game(agent1, agent2, env: TicTacToeEnvironment, training=True):
         if action is None:
             break
 
-        current_agent.record_move(state.flatten(), action)
+        current_agent.record_move(state, action)
 
         next_state, reward, done, info = env.step_flat(action)
+        state = next_state.flatten()
+        moves += 1
 
-        state = next_state
+    return moves
 
-    # -------- GAME OVER --------
 
-    winner = env.get_winner()
+def learn_from_winner(agent1, agent2, winner):
+    """End-of-game update for both agents (winner: 1, -1, 0 or None)"""
 
-    if training:
-        if winner == 1:
-            agent1.learn(1)
-            agent2.learn(-1)
+    if winner == 1:
+        agent1.learn(1)
+        agent2.learn(-1)
 
-        elif winner == -1:
-            agent1.learn(-1)
-            agent2.learn(1)
+    elif winner == -1:
+        agent1.learn(-1)
+        agent2.learn(1)
 
-        else:
-            agent1.learn(0)
-            agent2.learn(0)
+    else:
+        agent1.learn(0)
+        agent2.learn(0)
 
-    return 0 if winner is None else winner
+
+# --------------------------------------------------
+# PARALLEL SELF-PLAY
+# --------------------------------------------------
+
+def _get_tables(agent):
+    """Picklable snapshot of an agent's Q-table"""
+    if agent.dense:
+        return agent.q_values, agent.visits
+    return agent.q_table
+
+
+def _set_tables(agent, tables):
+    if agent.dense:
+        agent.q_values, agent.visits = (t.copy() for t in tables)
+    else:
+        agent.q_table = {k: v.copy() for k, v in tables.items()}
+
+
+def _selfplay_worker(args):
+    """
+    Play episodes against a snapshot of the current tables.
+
+    The worker keeps learning on its private copy so its play improves
+    during the round, but only sends back compact trajectories:
+    one bytes object of actions (one byte per move) and the winner per game.
+    """
+    tables1, tables2, options, epsilon, episodes, seed = args
+
+    random.seed(seed)
+    env = TicTacToeEnvironment(record_history=True)
+
+    agent1 = QLearningAgent(player=1, epsilon=epsilon, **options)
+    agent2 = QLearningAgent(player=-1, epsilon=epsilon, **options)
+    _set_tables(agent1, tables1)
+    _set_tables(agent2, tables2)
+
+    trajectories = []
+    for _ in range(episodes):
+        winner = play_game(agent1, agent2, env, training=True)
+        trajectories.append((game_moves(env), winner))
+    return trajectories
+
+
+def replay_trajectory(agent1, agent2, moves, winner):
+    """Apply the learning updates of a recorded game to both agents"""
+
+    state = np.zeros(9, dtype=int)
+    player = 1
+
+    for action in moves:
+        agent = agent1 if player == 1 else agent2
+        agent.record_move(state, action)
+        state[action] = player
+        player = -player
+
+    learn_from_winner(agent1, agent2, winner)
+
+
+def parallel_selfplay(agent1, agent2, episodes, workers, seed=None,
+                      episodes_per_sync=1000, logger=None):
+    """
+    Generator yielding the winner of each self-play episode, played
+    across a process pool.
+
+    Each round, every worker gets a snapshot of both agents' tables and
+    its own seed (derived from seed, round and worker index), plays
+    episodes_per_sync games and returns trajectories. Trajectories are
+    replayed into agent1/agent2 in worker order, so results only depend
+    on seed and workers (seed=None draws a fresh one from OS entropy).
+    Epsilon is read at the start of each round.
+    """
+    if seed is None:
+        seed = int(np.random.SeedSequence().generate_state(1)[0])
+    options = {"dense": agent1.dense, "symmetric": agent1.symmetric}
+    played = 0
+    round_index = 0
+
+    with multiprocessing.Pool(workers) as pool:
+        while played < episodes:
+            remaining = episodes - played
+            counts = [min(episodes_per_sync, max(0, remaining - w * episodes_per_sync))
+                      for w in range(workers)]
+            tables1, tables2 = _get_tables(agent1), _get_tables(agent2)
+            jobs = [(tables1, tables2, options, agent1.epsilon, count,
+                     (seed * 1_000_003 + round_index) * 1009 + w)
+                    for w, count in enumerate(counts) if count > 0]
+
+            for trajectories in pool.map(_selfplay_worker, jobs):
+                for moves, winner in trajectories:
+                    replay_trajectory(agent1, agent2, moves, winner)
+                    if logger is not None:
+                        logger.log_game(moves, winner)
+                    played += 1
+                    yield winner
+
+            round_index += 1
+
+
+# --------------------------------------------------
+# BATCHED SELF-PLAY
+# --------------------------------------------------
+
+def play_games_batch(agent1, agent2, count, training=True):
+    """
+    Play count games side by side on the state graph, one vectorized
+    epsilon-greedy choice per ply for all unfinished games.
+
+    Returns:
+        (state_ids, actions, lengths, winners): (count, 9) positions and
+        moves per ply (-1 after the end), moves per game, and winners
+        (1, -1 or 0)
+    """
+    graph = load_state_graph()
+    state_ids = np.full((count, 9), -1, dtype=np.intp)
+    actions = np.full((count, 9), -1, dtype=np.intp)
+    lengths = np.zeros(count, dtype=np.intp)
+    current = np.zeros(count, dtype=np.intp)
+    rows = np.arange(count)
+
+    for ply in range(9):
+        if not len(rows):
+            break
+        agent = agent1 if ply % 2 == 0 else agent2
+        ids = current[rows]
+        moves = agent.choose_action_batch(
+            graph.boards[ids], graph.legal_mask[ids],
+            epsilon=agent.epsilon if training else 0.0
+        )
+        state_ids[rows, ply] = ids
+        actions[rows, ply] = moves
+        lengths[rows] += 1
+        current[rows] = graph.next_state[ids, moves]
+        rows = rows[graph.status[current[rows]] == STATUS_ONGOING]
+
+    status = graph.status[current]
+    winners = np.where((status == 1) | (status == -1), status, 0).astype(int)
+    return state_ids, actions, lengths, winners
+
+
+def learn_games_batch(agent1, agent2, state_ids, actions, lengths, winners):
+    """learn_from_winner for a play_games_batch result, with learn_batch"""
+    agent1.learn_batch(state_ids[:, 0::2], actions[:, 0::2], winners, (lengths + 1) // 2)
+    agent2.learn_batch(state_ids[:, 1::2], actions[:, 1::2], -winners, lengths // 2)
+
+
+def batched_selfplay(agent1, agent2, episodes, batch_size=4096, logger=None):
+    """
+    Generator yielding the winner of each self-play episode, played
+    batch_size games at a time. Both agents learn once per batch, so their
+    policy is fixed within a batch. Dense backend only.
+    """
+    played = 0
+    while played < episodes:
+        count = min(batch_size, episodes - played)
+        state_ids, actions, lengths, winners = play_games_batch(agent1, agent2, count)
+        learn_games_batch(agent1, agent2, state_ids, actions, lengths, winners)
+
+        if logger is not None:
+            for moves, length, winner in zip(actions.tolist(), lengths.tolist(), winners.tolist()):
+                logger.log_game(moves[:length], winner)
+
+        played += count
+        yield from winners.tolist()
 
 
 # --------------------------------------------------
@@ -75,16 +316,47 @@ def play_game(agent1, agent2, env: TicTacToeEnvironment, training=True):
 
 def train_agent(episodes=50000,
                 save_file="trained_agent.pkl",
-                plot_progress=True):
+                plot_progress=True,
+                dense=False,
+                symmetric=False,
+                workers=1,
+                seed=None,
+                log_dir=None,
+                batch_size=None,
+                checkpoint_dir=None,
+                checkpoint_every=5000,
+                resume=False):
+    """
+    Self-play training of agent1 (X) against agent2 (O).
+
+    With checkpoint_dir, both tables' changed rows and the loop state are
+    appended to a delta checkpoint log every checkpoint_every episodes and
+    at the end; resume=True continues from its latest checkpoint (tables,
+    epsilon, episode counter, win counts and RNG states). Without resume,
+    an existing log is moved aside and a new one started. Resuming is exact
+    for the sequential loop; with workers or batch_size, the tables may
+    already include the rest of the round in flight at the checkpoint.
+    """
+
+    if batch_size and workers <= 1 and not dense:
+        raise ValueError("batch_size requires the dense backend (dense=True)")
 
     print("Starting Q-Learning Training...")
     print(f"Episodes: {episodes}")
+    print(f"Workers: {workers}")
     print("-" * 50)
 
-    env = TicTacToeEnvironment()
+    if seed is not None:
+        random.seed(seed)
+        np.random.seed(seed)
+
+    env = TicTacToeEnvironment(record_history=log_dir is not None)
 
-    agent1 = QLearningAgent(player=1, epsilon=0.3)
-    agent2 = QLearningAgent(player=-1, epsilon=0.3)
+    # Every game is kept on disk for offline re-training (train_offline)
+    logger = TrajectoryLogger(log_dir) if log_dir else None
+
+    agent1 = QLearningAgent(player=1, epsilon=0.3, dense=dense, symmetric=symmetric)
+    agent2 = QLearningAgent(player=-1, epsilon=0.3, dense=dense, symmetric=symmetric)
 
     wins = {1: 0, -1: 0, 0: 0}
 
@@ -93,14 +365,64 @@ def train_agent(episodes=50000,
 
     checkpoint_interval = max(1, episodes // 20)
 
-    for episode in tqdm(range(episodes), desc="Training"):
+    first_episode = 0
+    checkpoints = None
+    if checkpoint_dir:
+        checkpoints = CheckpointLog(checkpoint_dir)
+        state = checkpoints.restore([agent1, agent2]) if resume else None
+        if state is not None:
+            first_episode = state["episode"]
+            agent1.epsilon, agent2.epsilon = state["epsilon"]
+            wins = state["wins"]
+            win_rate_history = state["win_rate_history"]
+            draw_rate_history = state["draw_rate_history"]
+            random.setstate(state["random_state"])
+            np.random.set_state(state["numpy_state"])
+            print(f"Resumed from {checkpoint_dir} at episode {first_episode}")
+        else:
+            previous = checkpoints.start_new()
+            if previous:
+                print(f"Started a new checkpoint log (previous run kept as {previous})")
+            checkpoints.track([agent1, agent2])
+
+    def save_checkpoint(episode):
+        checkpoints.save([agent1, agent2], {
+            "episode": episode,
+            "epsilon": (agent1.epsilon, agent2.epsilon),
+            "wins": dict(wins),
+            "win_rate_history": list(win_rate_history),
+            "draw_rate_history": list(draw_rate_history),
+            "random_state": random.getstate(),
+            "numpy_state": np.random.get_state()
+        })
+
+    results = None
+    if workers > 1:
+        results = parallel_selfplay(agent1, agent2, episodes - first_episode, workers,
+                                    seed=None if seed is None else seed + first_episode,
+                                    logger=logger)
+    elif batch_size:
+        # Vectorized episodes and TD updates (dense tables only)
+        results = batched_selfplay(agent1, agent2, episodes - first_episode, batch_size,
+                                   logger=logger)
+
+    # Imported here so short jobs (eval, export) don't pay for them
+    from tqdm import tqdm
+
+    start_time = time.perf_counter()
+
+    for episode in tqdm(range(first_episode, episodes), desc="Training",
+                        initial=first_episode, total=episodes):
 
         # Decay exploration
         if episode % 10000 == 0 and episode > 0:
             agent1.epsilon = max(0.05, agent1.epsilon * 0.95)
             agent2.epsilon = max(0.05, agent2.epsilon * 0.95)
 
-        winner = play_game(agent1, agent2, env, training=True)
+        if results is None:
+            winner = play_game(agent1, agent2, env, training=True, logger=logger)
+        else:
+            winner = next(results)
         wins[winner] += 1
 
         # ---- Logging ----
@@ -118,7 +440,22 @@ def train_agent(episodes=50000,
             print(f"  O wins: {wins[-1]}")
             print(f"  Draws: {wins[0]}")
             print(f"  Epsilon: {agent1.epsilon:.3f}")
-            print(f"  States learned: {len(agent1.q_table)}")
+            print(f"  States learned: {agent1.get_stats()['states_learned']}")
+
+            if metrics.ENABLED:
+                print("  Timings:")
+                print(metrics.summary())
+
+        if checkpoints is not None and (episode + 1) % checkpoint_every == 0:
+            save_checkpoint(episode + 1)
+
+    elapsed = time.perf_counter() - start_time
+    if checkpoints is not None and episodes % checkpoint_every != 0:
+        save_checkpoint(episodes)
+    if results is not None:
+        results.close()
+    if logger is not None:
+        logger.close()
 
     # -------- FINAL STATS --------
 
@@ -128,14 +465,18 @@ def train_agent(episodes=50000,
     print(f"X wins: {wins[1]}")
     print(f"O wins: {wins[-1]}")
     print(f"Draws: {wins[0]}")
-    print(f"States learned: {len(agent1.q_table)}")
+    print(f"States learned: {agent1.get_stats()['states_learned']}")
+    print(f"Throughput: {(episodes - first_episode) / max(elapsed, 1e-9):.0f} episodes/s")
 
-    agent1.save(save_file)
+    if save_file:
+        agent1.save(save_file)
 
     # -------- PLOT --------
 
     if plot_progress and len(win_rate_history) > 0:
 
+        import matplotlib.pyplot as plt
+
         plt.figure(figsize=(10, 5))
 
         plt.plot(win_rate_history, label="Win Rate")
@@ -154,31 +495,86 @@ def train_agent(episodes=50000,
 
 
 # --------------------------------------------------
-# TEST AGAINST RANDOM
+# OFFLINE TRAINING
 # --------------------------------------------------
 
-def test_agent(agent_file="trained_agent.pkl", games=1000):
+def train_offline(log_dir, save_file="trained_agent.pkl", dense=False,
+                  symmetric=False, alpha=0.5, gamma=0.9, batch_size=4096):
+    """
+    Train both sides from a trajectory log (train_agent(log_dir=...) or
+    the server's TICTACTOE_TRAJECTORY_DIR) without playing any game,
+    e.g. to try other hyperparameters on the same games.
+    """
 
-    print(f"\nTesting agent from {agent_file}...")
+    agent1 = QLearningAgent(player=1, alpha=alpha, gamma=gamma, dense=dense, symmetric=symmetric)
+    agent2 = QLearningAgent(player=-1, alpha=alpha, gamma=gamma, dense=dense, symmetric=symmetric)
 
-    env = TicTacToeEnvironment()
+    start_time = time.perf_counter()
+    games = 0
+    for batch in read_batches(log_dir, batch_size, cells=9):
+        agent1.learn_from_games(batch)
+        agent2.learn_from_games(batch)
+        games += len(batch)
+    elapsed = time.perf_counter() - start_time
 
-    agent = QLearningAgent(player=1)
-    agent.load(agent_file)
+    print(f"Replayed {games} games from {log_dir} in {elapsed:.2f}s "
+          f"({games / max(elapsed, 1e-9):.0f} games/s)")
+    print(f"States learned: {agent1.get_stats()['states_learned']}")
 
-    random_agent = RandomAgent()
+    if save_file:
+        agent1.save(save_file)
 
-    wins = {1: 0, -1: 0, 0: 0}
+    return agent1
 
-    for _ in tqdm(range(games), desc="Testing"):
 
-        winner = play_game(agent, random_agent, env, training=False)
-        wins[winner] += 1
+# --------------------------------------------------
+# SCALING REPORT
+# --------------------------------------------------
 
-    print("\nTest Results vs Random:")
-    print(f"Agent wins: {wins[1]}")
-    print(f"Random wins: {wins[-1]}")
-    print(f"Draws: {wins[0]}")
+def report_scaling(episodes=20000, worker_counts=(1, 2, 4, 8), seed=0,
+                   dense=True):
+    """Train with each worker count and print episodes/s and speedup"""
+
+    rates = {}
+    for workers in worker_counts:
+        start_time = time.perf_counter()
+        train_agent(episodes=episodes, save_file=None,
+                    plot_progress=False, dense=dense,
+                    workers=workers, seed=seed)
+        rates[workers] = episodes / (time.perf_counter() - start_time)
+
+    base = rates[worker_counts[0]]
+    print("\nSelf-play scaling")
+    print(f"{'workers':>8} {'episodes/s':>12} {'speedup':>8}")
+    for workers, rate in rates.items():
+        print(f"{workers:>8} {rate:>12.0f} {rate / base:>7.2f}x")
+
+    return rates
+
+
+# --------------------------------------------------
+# TEST AGAINST RANDOM
+# --------------------------------------------------
+
+def test_agent(agent_file="trained_agent.pkl", games=1000, opponent="random",
+               workers=1, sprt=None):
+    """
+    Match against an opponent spec (see tournament.make_agent) on both
+    colors; pass a tournament.SPRT to stop once the result is decided.
+    """
+    from tournament import run_match
+
+    print(f"\nTesting agent from {agent_file}...")
+
+    result = run_match(agent_file, opponent, max_games=games, workers=workers, sprt=sprt)
+
+    print(f"\nTest Results vs {opponent}:")
+    print(f"Agent wins: {result.wins}")
+    print(f"{opponent.capitalize()} wins: {result.losses}")
+    print(f"Draws: {result.draws}")
+    elo, low, high = result.elo()
+    print(f"Elo: {elo:+.0f} [{low:+.0f}, {high:+.0f}]")
+    return result
 
 
 # --------------------------------------------------
@@ -0,0 +1,184 @@
+"""
+Append-only binary log of played games, for offline re-training
+
+Chunk file layout:
+    header  8 bytes: magic b"TTTL", version, number of cells, reserved
+    games   one byte per move (cell index, < 0xFD) followed by one outcome
+            byte: 0xFD draw, 0xFE X won, 0xFF O won
+
+Games are self-delimiting, so a chunk is read with one scan for outcome
+bytes; a game cut short by a crash (no outcome byte) is skipped. A logger
+never reopens old chunks: every logger and every games_per_chunk games
+start a new file trajectories-NNNNNN.ttl in the log directory.
+"""
+
+import glob
+import os
+import struct
+import threading
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+
+MAGIC = b"TTTL"
+VERSION = 1
+_HEADER = struct.Struct("<4sBBH")
+
+OUTCOME_BASE = 0xFD
+_OUTCOME_BYTES = {0: 0xFD, 1: 0xFE, -1: 0xFF}
+_OUTCOME_WINNERS = (0, 1, -1)
+
+CHUNK_PATTERN = "trajectories-{:06d}.ttl"
+
+Game = Tuple[bytes, int]
+
+
+def chunk_files(directory: str) -> List[str]:
+    """Chunk files of a log directory, oldest first"""
+    return sorted(glob.glob(os.path.join(directory, "trajectories-*.ttl")))
+
+
+def _chunk_index(filename: str) -> int:
+    return int(os.path.basename(filename)[len("trajectories-"):-len(".ttl")])
+
+
+class TrajectoryLogger:
+    """
+    Buffers games and appends them to the current chunk every flush_every
+    games (and on flush/close). Thread-safe, so one logger can be shared by
+    server request threads.
+    """
+
+    def __init__(self, directory: str, games_per_chunk: int = 100000,
+                 cells: int = 9, flush_every: int = 1000):
+        if cells >= OUTCOME_BASE:
+            raise ValueError(f"at most {OUTCOME_BASE} cells fit in one byte per move")
+
+        self.directory = directory
+        self.games_per_chunk = games_per_chunk
+        self.cells = cells
+        self.flush_every = flush_every
+
+        os.makedirs(directory, exist_ok=True)
+        existing = chunk_files(directory)
+        self._next_chunk = _chunk_index(existing[-1]) + 1 if existing else 0
+
+        self._file = None
+        self._chunk_games = 0
+        self._buffer = bytearray()
+        self._buffered = 0
+        self._lock = threading.Lock()
+
+        self.games_logged = 0
+
+    def log_game(self, moves, winner: Optional[int]):
+        """
+        Args:
+            moves: cell indices in play order (bytes, bytearray or ints)
+            winner: 1, -1, 0 or None (draw)
+        """
+        with self._lock:
+            self._buffer += bytes(moves)
+            self._buffer.append(_OUTCOME_BYTES[winner or 0])
+            self._buffered += 1
+            self.games_logged += 1
+
+            self._chunk_games += 1
+            if self._chunk_games >= self.games_per_chunk:
+                self._write()
+                self._close_chunk()
+            elif self._buffered >= self.flush_every:
+                self._write()
+
+    def flush(self):
+        with self._lock:
+            self._write()
+
+    def close(self):
+        with self._lock:
+            self._write()
+            self._close_chunk()
+
+    def _write(self):
+        if not self._buffer:
+            return
+        if self._file is None:
+            filename = os.path.join(self.directory, CHUNK_PATTERN.format(self._next_chunk))
+            self._next_chunk += 1
+            self._file = open(filename, "wb")
+            self._file.write(_HEADER.pack(MAGIC, VERSION, self.cells, 0))
+        self._file.write(self._buffer)
+        self._file.flush()
+        self._buffer.clear()
+        self._buffered = 0
+
+    def _close_chunk(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._chunk_games = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def game_moves(env) -> bytes:
+    """
+    Flat moves of the current game of a TicTacToeEnvironment: the
+    step_fast buffer (record_history=True) or the step() move history
+    """
+    if env.history_length:
+        return bytes(env.history_buffer[:env.history_length])
+    if env.move_history or env.mnk or env.record_history:
+        return bytes(row * env.width + col for row, col, _ in env.move_history)
+    raise ValueError("games played with step_fast are only recorded with record_history=True")
+
+
+# --------------------------------------------------
+# READING
+# --------------------------------------------------
+
+def read_chunk(filename: str, cells: Optional[int] = None) -> Iterator[Game]:
+    """
+    Games of one chunk file as (moves bytes, winner) pairs. With cells
+    given, a chunk logged for another board size raises ValueError.
+    """
+    with open(filename, "rb") as f:
+        data = f.read()
+
+    if len(data) < _HEADER.size:
+        return
+    magic, version, chunk_cells, _ = _HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{filename}: not a version {VERSION} trajectory log")
+    if cells is not None and chunk_cells != cells:
+        raise ValueError(f"{filename}: games on {chunk_cells} cells, expected {cells}")
+
+    ends = np.flatnonzero(np.frombuffer(data, dtype=np.uint8, offset=_HEADER.size) >= OUTCOME_BASE)
+    start = _HEADER.size
+    for end in (ends + _HEADER.size).tolist():
+        yield data[start:end], _OUTCOME_WINNERS[data[end] - OUTCOME_BASE]
+        start = end + 1
+
+
+def read_games(directory: str, cells: Optional[int] = None) -> Iterator[Game]:
+    """Every logged game, oldest chunk first"""
+    for filename in chunk_files(directory):
+        yield from read_chunk(filename, cells)
+
+
+def read_batches(directory: str, batch_size: int = 4096,
+                 cells: Optional[int] = None) -> Iterator[List[Game]]:
+    """read_games grouped into lists of up to batch_size games"""
+    batch = []
+    for game in read_games(directory, cells):
+        batch.append(game)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -0,0 +1,380 @@
+"""
+Environnement vectorisé multi-processus
+
+N parties TicTacToeEnvironment réparties en K groupes, chacun tenu par un
+processus. Actions, états, récompenses, fins de partie et masques de coups
+passent par un seul bloc multiprocessing.shared_memory: à chaque pas, le
+processus principal n'envoie qu'un octet de commande par groupe et n'en
+reçoit qu'un en retour, sans sérialiser de tableau.
+
+Même interface et mêmes conventions que BatchTicTacToeEnvironment
+(réinitialisation automatique, mêmes clés de info), avec en plus
+info['action_mask'] et un mode asynchrone step_async / step_wait.
+"""
+
+import multiprocessing
+import traceback
+from multiprocessing import shared_memory
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+
+# Commandes envoyées aux processus (un octet)
+_STEP = b"s"
+_RESET = b"r"
+_CLOSE = b"c"
+_ERROR = b"e"
+
+
+def _layout(n: int, cells: int) -> Tuple[Dict[str, Tuple[int, np.dtype, tuple]], int]:
+    """
+    Position des tableaux dans le bloc partagé (alignés sur 64 octets).
+
+    Returns:
+        Tuple: ({nom: (offset, dtype, forme)}, taille totale en octets)
+    """
+    arrays = (
+        ("actions", np.int16, (n,)),
+        ("states", np.int8, (n, cells)),
+        ("rewards", np.float32, (n,)),
+        ("dones", np.bool_, (n,)),
+        ("masks", np.bool_, (n, cells)),
+        ("winners", np.int8, (n,)),
+        ("players", np.int8, (n,)),
+        ("invalid", np.bool_, (n,)),
+        ("draws", np.bool_, (n,)),
+        ("terminal_states", np.int8, (n, cells)),
+    )
+    layout = {}
+    offset = 0
+    for name, dtype, shape in arrays:
+        layout[name] = (offset, np.dtype(dtype), shape)
+        offset += -(-np.dtype(dtype).itemsize * int(np.prod(shape)) // 64) * 64
+    return layout, offset
+
+
+def _views(buffer, n: int, cells: int) -> Dict[str, np.ndarray]:
+    """Tableaux NumPy posés sur le bloc partagé (aucune copie)."""
+    layout, _ = _layout(n, cells)
+    return {
+        name: np.ndarray(shape, dtype=dtype, buffer=buffer, offset=offset)
+        for name, (offset, dtype, shape) in layout.items()
+    }
+
+
+def _worker(conn, shm_name: str, n: int, cells: int, start: int, stop: int,
+            mnk: Optional[Tuple[int, int, int]]):
+    """Processus: attache le bloc partagé et sert les commandes jusqu'à _CLOSE."""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        _serve(conn, _views(shm.buf, n, cells), start, stop, mnk)
+    finally:
+        conn.close()
+        try:
+            shm.close()
+        except BufferError:
+            pass  # vues encore référencées (sortie sur exception)
+
+
+def _serve(conn, buffers: Dict[str, np.ndarray], start: int, stop: int,
+           mnk: Optional[Tuple[int, int, int]]):
+    """
+    Joue les parties [start, stop) à chaque commande.
+
+    Sur le 3x3, les environnements avancent par step_fast et les états,
+    masques et gagnants se lisent en bloc dans les tables du graphe compilé.
+    """
+    from game import TicTacToeEnvironment
+    from mnk_board import MNKBoard
+
+    group = {name: array[start:stop] for name, array in buffers.items()}
+    if mnk is None:
+        envs = [TicTacToeEnvironment(compiled=True) for _ in range(stop - start)]
+        step = _step_compiled
+    else:
+        envs = [TicTacToeEnvironment(board=MNKBoard(*mnk)) for _ in range(stop - start)]
+        step = _step_mnk
+
+    while True:
+        command = conn.recv_bytes()
+        if command == _CLOSE:
+            return
+        try:
+            if command == _RESET:
+                for env in envs:
+                    env.reset()
+                group["states"][:] = 0
+                group["masks"][:] = True
+            else:
+                step(envs, group["actions"].tolist(), group)
+            conn.send_bytes(command)
+        except Exception:
+            conn.send_bytes(_ERROR + traceback.format_exc().encode())
+
+
+def _step_compiled(envs, actions, group):
+    graph = envs[0].graph
+    ids = [0] * len(envs)
+    before = [0] * len(envs)
+    rewards = [0.0] * len(envs)
+    dones = [False] * len(envs)
+    for j, env in enumerate(envs):
+        before[j] = env.state_id
+        state_id, reward, done = env.step_fast(actions[j])
+        ids[j] = state_id
+        rewards[j] = reward
+        if done:
+            dones[j] = True
+            env.reset()
+
+    ids = np.array(ids, dtype=np.intp)
+    dones = np.array(dones)
+    group["terminal_states"][:] = graph.boards[ids]
+    status = graph.status[ids]
+    group["winners"][:] = np.where(status == 2, 0, status)
+    group["draws"][:] = status == 2
+    group["players"][:] = graph.to_move[before]
+    group["invalid"][:] = np.array(rewards) == -10.0
+    ids[dones] = 0  # réinitialisation automatique: plateau vide
+    group["states"][:] = graph.boards[ids]
+    group["masks"][:] = graph.legal_mask[ids]
+    group["rewards"][:] = rewards
+    group["dones"][:] = dones
+
+
+def _step_mnk(envs, actions, group):
+    states = group["states"]
+    terminal_states = group["terminal_states"]
+    for j, env in enumerate(envs):
+        group["players"][j] = env.board.current_player
+        state, reward, done, info = env.step_flat(actions[j])
+        terminal_states[j] = state.ravel()
+        winner = env.get_winner()
+        group["winners"][j] = winner or 0
+        group["invalid"][j] = 'error' in info
+        group["draws"][j] = done and winner is None and 'error' not in info
+        group["rewards"][j] = reward
+        group["dones"][j] = done
+        if done:
+            env.reset()
+            states[j] = 0
+        else:
+            states[j] = terminal_states[j]
+    np.equal(states, 0, out=group["masks"])
+
+
+class SubprocTicTacToeEnvironment:
+    """
+    N parties de TicTacToeEnvironment jouées dans K processus.
+
+    Les parties terminées sont automatiquement réinitialisées après chaque step;
+    leur position finale est disponible dans info['terminal_state'].
+    À fermer avec close() (ou with ... as env:) pour libérer la mémoire partagée.
+    """
+
+    def __init__(self, n: int = 64, num_workers: Optional[int] = None,
+                 mnk: Optional[Tuple[int, int, int]] = None, copy: bool = True):
+        """
+        Initialise les processus et le bloc partagé.
+
+        Args:
+            n: Nombre de parties simultanées
+            num_workers: Nombre de processus (par défaut le nombre de CPU,
+                         au plus n)
+            mnk: (largeur, hauteur, k) pour des plateaux m,n,k; None = 3x3
+            copy: Si False, step_wait renvoie des vues sur la mémoire
+                  partagée, valables jusqu'au step_async suivant
+        """
+        self.n = n
+        self.num_workers = max(1, min(n, num_workers or multiprocessing.cpu_count()))
+        self.cells = mnk[0] * mnk[1] if mnk else 9
+        self.copy = copy
+        self.game_count = 0
+        self.waiting = False
+        self.closed = False
+
+        _, size = _layout(n, self.cells)
+        self._shm = shared_memory.SharedMemory(create=True, size=size)
+        self._buffers = _views(self._shm.buf, n, self.cells)
+
+        bounds = np.linspace(0, n, self.num_workers + 1).astype(int)
+        self._conns = []
+        self._processes = []
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            parent_conn, child_conn = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=_worker,
+                args=(child_conn, self._shm.name, n, self.cells, int(start), int(stop), mnk),
+                daemon=True
+            )
+            process.start()
+            child_conn.close()
+            self._conns.append(parent_conn)
+            self._processes.append(process)
+
+        self.reset()
+
+    # ---------- COMMANDES ----------
+
+    def _send(self, command: bytes):
+        dead = 0
+        for conn in self._conns:
+            try:
+                conn.send_bytes(command)
+            except OSError:
+                dead += 1
+        if dead:
+            raise RuntimeError(f"{dead} processus de l'environnement arrêté(s): à fermer (close)")
+
+    def _wait(self):
+        errors = []
+        for conn in self._conns:
+            try:
+                reply = conn.recv_bytes()
+            except (EOFError, OSError):
+                # Processus mort (tué, mémoire épuisée...): plus de réponse
+                errors.append("processus arrêté sans répondre")
+                continue
+            if reply.startswith(_ERROR):
+                errors.append(reply[len(_ERROR):].decode())
+        if errors:
+            raise RuntimeError("erreur dans un processus de l'environnement:\n" + errors[0])
+
+    def _out(self, array: np.ndarray) -> np.ndarray:
+        return array.copy() if self.copy else array
+
+    def reset(self) -> np.ndarray:
+        """
+        Réinitialise toutes les parties.
+
+        Returns:
+            np.ndarray: États initiaux (N, cells)
+        """
+        if self.waiting:
+            self.step_wait()
+        self._send(_RESET)
+        self._wait()
+        self.game_count += self.n
+        return self._out(self._buffers["states"])
+
+    def get_state(self) -> np.ndarray:
+        """
+        Retourne l'état de toutes les parties.
+
+        Returns:
+            np.ndarray: Copie des plateaux (N, cells)
+        """
+        return self._buffers["states"].copy()
+
+    def get_available_actions_mask(self) -> np.ndarray:
+        """
+        Retourne le masque des coups valides.
+
+        Returns:
+            np.ndarray: Booléens (N, cells), True si la case est vide
+        """
+        return self._buffers["masks"].copy()
+
+    def step_async(self, actions: np.ndarray):
+        """
+        Écrit les actions dans la mémoire partagée et lance le pas dans
+        tous les processus, sans attendre.
+
+        Args:
+            actions: Tableau (N,) d'indices de cases
+        """
+        if self.waiting:
+            raise RuntimeError("step_async déjà en cours: appeler step_wait")
+        self._buffers["actions"][:] = actions
+        self._send(_STEP)
+        self.waiting = True
+
+    def step_wait(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, Dict]:
+        """
+        Attend la fin du pas lancé par step_async.
+
+        Returns:
+            Tuple contenant:
+                - states (np.ndarray): Nouveaux états (N, cells), après réinitialisation auto
+                - rewards (np.ndarray): Récompense du joueur qui vient de jouer (N,)
+                - dones (np.ndarray): True si la partie s'est terminée à ce coup (N,)
+                - info (dict): 'winner' (N,) (0 si aucun), 'is_draw' (N,),
+                  'player' (N,) joueur ayant joué, 'invalid' (N,) coups invalides,
+                  'action_mask' (N, cells) coups valides des nouveaux états,
+                  'terminal_state' (N, cells)
+        """
+        if not self.waiting:
+            raise RuntimeError("aucun step_async en cours")
+        self._wait()
+        self.waiting = False
+
+        buffers = self._buffers
+        dones = self._out(buffers["dones"])
+        self.game_count += int(dones.sum())
+        info = {
+            'winner': self._out(buffers["winners"]),
+            'is_draw': self._out(buffers["draws"]),
+            'player': self._out(buffers["players"]),
+            'invalid': self._out(buffers["invalid"]),
+            'action_mask': self._out(buffers["masks"]),
+            'terminal_state': self._out(buffers["terminal_states"])
+        }
+        return self._out(buffers["states"]), self._out(buffers["rewards"]), dones, info
+
+    def step_flat(self, actions: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, Dict]:
+        """
+        Joue une action dans chaque partie (step_async puis step_wait).
+
+        Args:
+            actions: Tableau (N,) d'indices de cases
+
+        Returns:
+            Même résultat que step_wait
+        """
+        self.step_async(actions)
+        return self.step_wait()
+
+    # ---------- FERMETURE ----------
+
+    def close(self):
+        """Arrête les processus et libère la mémoire partagée."""
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            if self.waiting:
+                try:
+                    self._wait()
+                except RuntimeError:
+                    pass
+                self.waiting = False
+            for conn in self._conns:
+                try:
+                    conn.send_bytes(_CLOSE)
+                except OSError:
+                    pass
+            for process in self._processes:
+                process.join(timeout=5)
+                if process.is_alive():
+                    process.terminate()
+            for conn in self._conns:
+                conn.close()
+        finally:
+            # Le bloc partagé est libéré même si un processus est mort
+            self._buffers = None
+            try:
+                self._shm.close()
+            except BufferError:
+                pass  # vues copy=False encore tenues par l'appelant
+            self._shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __del__(self):
+        if not getattr(self, "closed", True):
+            self.close()